@@ -0,0 +1,39 @@
+from main import *
+import sys
+
+# Benchmark: Vector2 objects constructed per tick while playing the shipped level headless with scripted input,
+# and how often the scratchVectors pool ran dry. Game resets the pool every tick.
+#   python bench_alloc.py [ticks]
+
+def countConstructions(cls):
+    """Count the instances of cls created from now on. Returns a list holding the count."""
+    count = [0]
+    init = cls.__init__
+
+    def countedInit(self, *args, **kwargs):
+        count[0] += 1
+        init(self, *args, **kwargs)
+
+    cls.__init__ = countedInit
+    return count
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rng = random.Random(1)
+    constructions = countConstructions(Vector2)
+    keys = []
+    baseline = {}
+
+    def scriptedInput(tick):
+        global keys
+        if tick == 1:
+            # Setup and the first tick build the level; measure the ticks after them
+            baseline["constructions"] = constructions[0]
+            baseline["misses"] = scratchVectors.misses
+        if tick % 7 == 0:
+            keys = [key for key in ("a", "d", "space") if rng.random() < 0.4]
+        return keys
+
+    MyGame(headless=True).runHeadless(ticks + 1, inputs=scriptedInput)
+    print(f"{ticks} ticks: {(constructions[0] - baseline['constructions']) / ticks:.2f} Vector2 per tick, "
+          f"{scratchVectors.misses - baseline['misses']} scratch pool misses")
@@ -0,0 +1,43 @@
+from game import *
+import sys
+
+# Benchmark: CollisionManager.checkCollision queries per second as the number of collidables grows,
+# against testing every collidable like the manager did before the spatial hash.
+#   python bench_collision.py [seconds per measurement]
+
+def bruteForceCollision(collisionManager, obj, impact=Vector2(x=0, y=0)):
+    """checkCollision without the broad phase: every collidable is hit tested."""
+    for collidable in collisionManager.collidables:
+        if collidable is not obj and collidable.hitTest(obj):
+            if collidable.shouldCollide(obj, impact) and obj.shouldCollide(collidable, -impact):
+                return collidable
+    return None
+
+def queriesPerSecond(query, seconds):
+    queries = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        query()
+        queries += 1
+    return queries / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    setHeadless(True)
+    Sprite.hitTest = hitTestAABB
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    worldSize = 32 * 200
+
+    for count in (100, 1000, 10000):
+        rng = random.Random(0)
+        collisionManager = CollisionManager()
+        for _ in range(count):
+            collisionManager.add(Sprite("assets/player.png", rng.randrange(worldSize), rng.randrange(worldSize)))
+        probe = Sprite("assets/player.png")
+
+        def moveProbe():
+            probe.x = rng.randrange(worldSize)
+            probe.y = rng.randrange(worldSize)
+
+        hashed = queriesPerSecond(lambda: (moveProbe(), collisionManager.checkCollision(probe)), seconds)
+        brute = queriesPerSecond(lambda: (moveProbe(), bruteForceCollision(collisionManager, probe)), seconds)
+        print(f"{count:6d} collidables: {hashed:10.0f} queries/s spatial hash, {brute:10.0f} queries/s every collidable")
@@ -0,0 +1,36 @@
+from game import *
+import sys
+
+# Benchmark: one rotated, scaled sprite hit tested against n others with the batched Sprite.hitTestMany
+# against calling the scalar Sprite.hitTestOBB once per sprite, checking both give the same results.
+#   python bench_obb.py [repeats per measurement]
+
+def randomSprites(rng, count, size=400):
+    return [Sprite("assets/player.png", rng.uniform(0, size), rng.uniform(0, size), rng.uniform(0, 360),
+                   rng.uniform(0.5, 2), rng.uniform(0.5, 2)) for _ in range(count)]
+
+def bestTime(test, repeats):
+    """Best time of repeats calls of test, in milliseconds."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        test()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    setHeadless(True)
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(0)
+
+    for count in (10, 100, 1000):
+        sprites = randomSprites(rng, count)
+        probe = Sprite("assets/player.png", 200, 200, 30, 3, 3)
+        scalar = [sprite.hitTestOBB(probe) for sprite in sprites]
+        batched = probe.hitTestMany(sprites).tolist()
+        assert scalar == batched, count
+
+        scalarTime = bestTime(lambda: [sprite.hitTestOBB(probe) for sprite in sprites], repeats)
+        batchedTime = bestTime(lambda: probe.hitTestMany(sprites), repeats)
+        print(f"{count:5d} sprites, {sum(scalar):4d} hits: {scalarTime:8.3f} ms scalar, {batchedTime:8.3f} ms batched")
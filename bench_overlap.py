@@ -0,0 +1,45 @@
+from game import *
+from box import Box
+import sys
+
+# Benchmark: the worst case of a box wrapped into the bottom of a solid column of tiles, pushed out with
+# CollisionManager.resolveOverlap against moving it up a pixel at a time like Box.teleport did before.
+#   python bench_overlap.py [column height in tiles]
+
+def pixelSteps(collisionManager, obj):
+    """resolveOverlap(obj, 0, -1) the way Box.teleport did it: one collision query per pixel."""
+    startY = obj.y
+    steps = 0
+    while collisionManager.checkCollision(obj):
+        obj.y -= 1
+        steps += 1
+    obj.y = startY
+    return steps
+
+def timeQuery(query, repeats=5):
+    """Return the result of query and its best time of repeats runs, in milliseconds."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = query()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+if __name__ == "__main__":
+    setHeadless(True)
+    Sprite.hitTest = hitTestAABB
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    collisionManager = CollisionManager()
+    column = TileMap("assets/tile.png", 1, rows)
+    for row in range(rows):
+        column.setCell(0, row, 1)
+    collisionManager.add(column)
+    box = Box(collisionManager, 0, (rows - 1) * column.tileSize)
+    collisionManager.add(box)
+
+    analytic, analyticTime = timeQuery(lambda: collisionManager.resolveOverlap(box, 0, -1))
+    stepped, steppedTime = timeQuery(lambda: pixelSteps(collisionManager, box))
+    assert analytic == stepped, (analytic, stepped)
+    print(f"{rows} tile column, {analytic} px: {analyticTime:.2f} ms resolveOverlap, {steppedTime:.2f} ms pixel steps")
@@ -1,27 +1,128 @@
 from game import *
         
 class Box(AnimSprite):
+    # When True, move() skips over free space with one swept query instead of checking every pixel
+    sweptMovement = True
+    # Ticks a body has to stay still on a support before it sleeps, or None to never sleep
+    sleepAfter = 30
+
     def __init__(self, collisionManager, x=0, y=0, rotation=0, scaleX=1, scaleY=1):
         super().__init__("assets/player.png", 1, 1, x, y, rotation, scaleX, scaleY)
         self.collisionManager = collisionManager
+        self._world = None  # PhysicsWorld holding this box's state, if any
+        self._row = -1
 
         self.velocity = Vector2()        
         self.landed = False
 
+        # Sleeping bodies are skipped by update(); see sleep()
+        self.sleeping = False
+        self._stillTicks = 0
+        self._supports = []  # What a sleeping body rests on
+        self.onSleepChange = None  # Called with the body when it falls asleep or wakes up
+
+    # Setting the same position, like moveStep's x += 0, is not a move and must not wake anything
+    def _setX(self, value):
+        if value == self._x:
+            return
+        GameObject.x.fset(self, value)
+        if self._world is not None:
+            self._world.position[self._row, 0] = value
+        self._moved()
+
+    def _setY(self, value):
+        if value == self._y:
+            return
+        GameObject.y.fset(self, value)
+        if self._world is not None:
+            self._world.position[self._row, 1] = value
+        self._moved()
+
+    def _moved(self):
+        # Something moving a sleeping body (a push, a teleport) wakes it, and whatever sleeps on a body that moves
+        if self.sleeping:
+            self.wake()
+        manager = self._collisionManager
+        if manager is not None and manager._sleepers:
+            manager.wakeSleepers(self)
+
+    # Positions are written through to the PhysicsWorld row
+    x = property(GameObject.x.fget, _setX)
+    y = property(GameObject.y.fget, _setY)
+
+    @property
+    def velocity(self):
+        return self._velocity
+
+    @velocity.setter
+    def velocity(self, value):
+        if self._world is not None:
+            self._world.velocity[self._row] = (value.x, value.y)
+        else:
+            self._velocity = value
+
+    @property
+    def landed(self):
+        if self._world is not None:
+            return bool(self._world.landed[self._row])
+        return self._landed
+
+    @landed.setter
+    def landed(self, value):
+        if self._world is not None:
+            self._world.landed[self._row] = value
+        else:
+            self._landed = value
+
+    @property
+    def sleeping(self):
+        if self._world is not None:
+            return bool(self._world.sleeping[self._row])
+        return self._sleeping
+
+    @sleeping.setter
+    def sleeping(self, value):
+        if self._world is not None:
+            self._world.sleeping[self._row] = value
+        else:
+            self._sleeping = value
+
+    @property
+    def _stillTicks(self):
+        if self._world is not None:
+            return int(self._world.stillTicks[self._row])
+        return self._stillTicksValue
+
+    @_stillTicks.setter
+    def _stillTicks(self, value):
+        if self._world is not None:
+            self._world.stillTicks[self._row] = value
+        else:
+            self._stillTicksValue = value
+
     def moveStep(self, dx, dy):
         """Move the player and resolve collisions."""
-        previousX = self.x
-        previousY = self.y
-        self.x += dx
-        self.y += dy
-        collision = self.collisionManager.checkCollision(self, Vector2(dx, dy))
+        previousX = self._x
+        previousY = self._y
+        # Try the step without waking anything; only a step that is kept moves what sleeps on this body
+        self._place(previousX + dx, previousY + dy)
+        collision = self.collisionManager.checkCollision(self, scratchVectors.get(dx, dy))
         if collision:
             # Handle collision (e.g., stop movement)
-            self.x = previousX
-            self.y = previousY
+            self._place(previousX, previousY)
             return False
+        self._moved()
         return True
 
+    def _place(self, x, y):
+        """Set the position like the x and y setters, without waking sleepers."""
+        if x != self._x:
+            GameObject.x.fset(self, x)
+        if y != self._y:
+            GameObject.y.fset(self, y)
+        if self._world is not None:
+            self._world.position[self._row] = (x, y)
+
     def move(self, dx, dy):
         dx = int(dx)
         dy = int(dy)
@@ -36,21 +137,33 @@ class Box(AnimSprite):
             stepX = int(dx / abs(dx)) if dx != 0 else 0  # Step direction in x (±1 or 0)
             stepY = int(dy / abs(dy)) if dy != 0 else 0  # Step direction in y (±1 or 0)
     
-            for _ in range(abs(dx) if dx != 0 else abs(dy)):
+            steps = abs(dx) if dx != 0 else abs(dy)
+            while steps > 0:
+                if self.sweptMovement:
+                    # Jump over the steps where nothing can be hit, then resolve contact pixel by pixel
+                    freeSteps = self.collisionManager.getFreeSteps(self, stepX, stepY, steps)
+                    if freeSteps > 0:
+                        self.x += stepX * freeSteps
+                        self.y += stepY * freeSteps
+                        steps -= freeSteps
+                        continue
+
                 if not self.moveStep(stepX, stepY):
                     return False
+                steps -= 1
 
         return True
         
     def updateBoundaries(self):
-        if self.y > self.game.height:
-            self.teleport(self.x, self.y - self.game.height)
+        game = self.game
+        if self.y > game.worldHeight:
+            self.teleport(self.x, self.y - game.worldHeight)
             self.velocity.y = 0
             
         # Wrap the x position using self.teleport
         if self.x < 0:
-            self.teleport(self.game.width, self.y)
-        elif self.x > self.game.width:
+            self.teleport(game.worldWidth, self.y)
+        elif self.x > game.worldWidth:
             self.teleport(0, self.y)            
                 
     def updatePhysics(self):
@@ -69,11 +182,54 @@ class Box(AnimSprite):
         self.x = targetX
         self.y = targetY
 
-        while self.collisionManager.checkCollision(self, Vector2(0, 0)):
-            self.y -= 1  # Move upward to resolve collision
+        # Move upward to resolve collision
+        self.y -= self.collisionManager.resolveOverlap(self, 0, -1, scratchVectors.get(0, 0))
              
+    def updateLogic(self):
+        """Per-tick behaviour after physics. A PhysicsWorld steps the physics of all bodies first, then calls this."""
+        pass
+
     def update(self):
+        x = self._x
+        y = self._y
         self.updatePhysics()
+        self.updateLogic()
+
+        if self.sleepAfter is not None:
+            if self._x != x or self._y != y:
+                self._stillTicks = 0
+            else:
+                self._stillTicks += 1
+                # Sleep right after a blocked fall, with no speed left, so waking up resumes the resting cycle
+                if self._stillTicks >= self.sleepAfter and self.velocity.y == 0:
+                    self.sleep()
+
+    def sleep(self):
+        """Stop updating the body until something it rests on moves or goes away, or it is moved."""
+        manager = self.collisionManager
+        # One pixel lower, everything the body would land on is a support; the base setter doesn't wake anything
+        GameObject.y.fset(self, self._y + 1)
+        self._supports = manager.getContacts(self, scratchVectors.get(0, 1))
+        GameObject.y.fset(self, self._y - 1)
+        if not self._supports:
+            return  # Held up by nothing collidable, keep simulating it
+        for support in self._supports:
+            manager.addSleeper(support, self)
+        self.sleeping = True
+        if self.onSleepChange is not None:
+            self.onSleepChange(self)
+
+    def wake(self):
+        """Resume updating the body."""
+        if not self.sleeping:
+            return
+        self.sleeping = False
+        self._stillTicks = 0
+        for support in self._supports:
+            self.collisionManager.removeSleeper(support, self)
+        self._supports = []
+        if self.onSleepChange is not None:
+            self.onSleepChange(self)
             
     def shouldCollide(self, other, impact):
         if (impact.x != 0):
@@ -10,6 +10,17 @@ import sounddevice as sd
 import soundfile as sf
 import threading
 import time
+import json
+import os
+import struct
+import zlib
+import collections
+import hashlib
+import atexit
+import types
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from vector import *
 
 #set up bitmap font
 fontName, fontColumns, fontRows = "assets/font.png", 18, 6
@@ -38,295 +49,2308 @@ def hitTestAABB(self, other):
     Override of the default hitTest method for AABB collision using integers.
     Checks if this sprite's AABB intersects with another sprite's AABB.
     """
+    # World positions, from the cached world matrices
+    matrix_a = self._worldMatrix if not self._worldDirty else self.getWorldMatrix()
+    matrix_b = other._worldMatrix if not other._worldDirty else other.getWorldMatrix()
+
     # Calculate this sprite's AABB
-    left_a = int(self.x - self.originX)
-    right_a = int(self.x - self.originX + self.width)
-    top_a = int(self.y - self.originY)
-    bottom_a = int(self.y - self.originY + self.height)
+    left_a = int(matrix_a[4] - self.originX)
+    right_a = int(matrix_a[4] - self.originX + self.width)
+    top_a = int(matrix_a[5] - self.originY)
+    bottom_a = int(matrix_a[5] - self.originY + self.height)
+
+    # Calculate the other sprite's AABB
+    left_b = int(matrix_b[4] - other.originX)
+    right_b = int(matrix_b[4] - other.originX + other.width)
+    top_b = int(matrix_b[5] - other.originY)
+    bottom_b = int(matrix_b[5] - other.originY + other.height)
+
+    # Check for overlap
+    return not (right_a <= left_b or left_a >= right_b or bottom_a <= top_b or top_a >= bottom_b)
+    
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           hitTestOBBMany()
+#---------------------------------------------------------------------------------------------------------------------
+def _getAxesMany(corners):
+    """Unit edge normals of (..., 4, 2) corner arrays, computed the same way as Sprite._getAxes."""
+    edges = np.roll(corners, -1, axis=-2) - corners
+    normalX = -edges[..., 1]
+    normalY = edges[..., 0]
+    length = np.sqrt(normalX ** 2 + normalY ** 2)
+    return np.stack((normalX / length, normalY / length), axis=-1)
+
+def hitTestOBBMany(corners, otherCorners):
+    """
+    Separating axis test of one box against many, vectorized with NumPy.
+    corners holds the 4 world space corners of one box, otherCorners the corners of n boxes.
+    Returns a boolean array of length n, True where the boxes overlap, matching Sprite.hitTestOBB.
+    """
+    box = np.asarray(corners, dtype=np.float64)  # (4, 2)
+    others = np.asarray(otherCorners, dtype=np.float64).reshape(-1, 4, 2)  # (n, 4, 2)
+    count = len(others)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        axes = np.concatenate((np.broadcast_to(_getAxesMany(box), (count, 4, 2)), _getAxesMany(others)), axis=1)  # (n, 8, 2)
+
+    # Project every corner on every axis: (n, 8 axes, 4 corners)
+    axisX = axes[:, :, 0, None]
+    axisY = axes[:, :, 1, None]
+    projection1 = box[None, None, :, 0] * axisX + box[None, None, :, 1] * axisY
+    projection2 = others[:, None, :, 0] * axisX + others[:, None, :, 1] * axisY
+
+    # Pairwise minimum/maximum of the 4 corners is much faster than a reduction over such a short axis
+    min1 = np.minimum(np.minimum(projection1[..., 0], projection1[..., 1]), np.minimum(projection1[..., 2], projection1[..., 3]))
+    max1 = np.maximum(np.maximum(projection1[..., 0], projection1[..., 1]), np.maximum(projection1[..., 2], projection1[..., 3]))
+    min2 = np.minimum(np.minimum(projection2[..., 0], projection2[..., 1]), np.minimum(projection2[..., 2], projection2[..., 3]))
+    max2 = np.maximum(np.maximum(projection2[..., 0], projection2[..., 1]), np.maximum(projection2[..., 2], projection2[..., 3]))
+    separated = (max1 < min2) | (max2 < min1)
+    return ~separated.any(axis=1)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           sweepAABB()
+#---------------------------------------------------------------------------------------------------------------------
+def sweepAABB(bounds, obstacle, stepX, stepY, margin=2):
+    """
+    Return how many whole steps of (stepX, stepY) a box with the given bounds can take before it comes
+    within margin pixels of the obstacle box, or math.inf if it never reaches it. Boxes are (left, top, right, bottom).
+    The margin covers the integer truncation in hitTestAABB, so no hit test can succeed during the free steps.
+    """
+    left, top, right, bottom = bounds
+    obstacleLeft = obstacle[0] - margin
+    obstacleTop = obstacle[1] - margin
+    obstacleRight = obstacle[2] + margin
+    obstacleBottom = obstacle[3] + margin
+
+    if stepX != 0:
+        if bottom <= obstacleTop or top >= obstacleBottom:
+            return math.inf  # Passes above or below the obstacle
+        gap = obstacleLeft - right if stepX > 0 else left - obstacleRight
+        if gap < 0:
+            behind = left >= obstacleRight if stepX > 0 else right <= obstacleLeft
+            return math.inf if behind else 0
+        return int(gap // abs(stepX))
+
+    if stepY != 0:
+        if right <= obstacleLeft or left >= obstacleRight:
+            return math.inf  # Passes left or right of the obstacle
+        gap = obstacleTop - bottom if stepY > 0 else top - obstacleBottom
+        if gap < 0:
+            behind = top >= obstacleBottom if stepY > 0 else bottom <= obstacleTop
+            return math.inf if behind else 0
+        return int(gap // abs(stepY))
+
+    return math.inf
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           clearAABB()
+#---------------------------------------------------------------------------------------------------------------------
+def clearAABB(bounds, obstacle, stepX, stepY):
+    """
+    Return how many whole steps of (stepX, stepY) a box with the given bounds must take to stop overlapping
+    the obstacle box. Boxes are (left, top, right, bottom).
+    """
+    left, top, right, bottom = bounds
+    steps = math.inf
+    if stepX > 0:
+        steps = min(steps, math.ceil((obstacle[2] - left) / stepX))
+    elif stepX < 0:
+        steps = min(steps, math.ceil((right - obstacle[0]) / -stepX))
+    if stepY > 0:
+        steps = min(steps, math.ceil((obstacle[3] - top) / stepY))
+    elif stepY < 0:
+        steps = min(steps, math.ceil((bottom - obstacle[1]) / -stepY))
+    return max(0, steps) if steps != math.inf else 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class CollisionManager ***
+#---------------------------------------------------------------------------------------------------------------------
+class CollisionManager:
+    """
+    Keeps track of collidable objects and answers collision queries.
+    Objects are bucketed in a uniform grid (spatial hash) of cellSize pixels, so a query
+    only tests the objects in the cells its bounds overlap instead of every collidable.
+    """
+    def __init__(self, cellSize=64):
+        self.collidables = []  # List of GameObjects that can be collided with
+        self.cellSize = cellSize
+        self._cells = {}  # (cellX, cellY) -> set of objects overlapping that cell
+        self._cellRanges = {}  # object -> (cellLeft, cellTop, cellRight, cellBottom) it is stored in
+        self._order = {}  # object -> registration number, so candidates are tested in registration order
+        self._nextOrder = 0
+        self._unbounded = set()  # Objects without bounds, or too large to bucket, tested on every query
+        self.maxCellsPerObject = 256  # Objects covering more cells than this are kept in _unbounded instead
+        self._moved = set()  # Objects that moved since the last query
+        self.batchHitTestThreshold = 16  # OBB hit tests are done with Sprite.hitTestMany from this many candidates
+        self._sleepers = {}  # object -> sleeping bodies resting on it, woken when it moves or goes away
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def add(self, obj):
+        """Register a collidable object."""
+        if obj in self._order:
+            return
+        self.collidables.append(obj)
+        self._order[obj] = self._nextOrder
+        self._nextOrder += 1
+        obj._collisionManager = self
+        self._insert(obj)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def remove(self, obj):
+        """Unregister a collidable object."""
+        if obj in self._order:
+            self.wakeSleepers(obj)
+            self.collidables.remove(obj)
+            self._discard(obj)
+            self._moved.discard(obj)
+            del self._order[obj]
+            if obj._collisionManager is self:
+                obj._collisionManager = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def update(self, obj):
+        """
+        Re-bucket an object in the spatial hash.
+        Moves through x, y, rotation and scale are picked up automatically; call this after
+        changing anything else that affects the bounds (width, height, origin).
+        """
+        if obj in self._order:
+            self._moved.discard(obj)
+            self._discard(obj)
+            self._insert(obj)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _markMoved(self, obj):
+        """Called by GameObject when its transform changes; the object is re-bucketed lazily on the next query."""
+        self._moved.add(obj)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _cellRange(self, bounds):
+        """Return the range of cells covered by the bounds (left, top, right, bottom), widened by one pixel."""
+        left, top, right, bottom = bounds
+        cellSize = self.cellSize
+        return (int((left - 1) // cellSize), int((top - 1) // cellSize),
+                int((right + 1) // cellSize), int((bottom + 1) // cellSize))
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _bucketRange(self, obj):
+        """Return the range of cells obj is stored in, or None to keep it in _unbounded."""
+        bounds = obj.getBroadPhaseBounds()
+        if bounds is None:
+            return None
+        cellRange = self._cellRange(bounds)
+        cellLeft, cellTop, cellRight, cellBottom = cellRange
+        if (cellRight - cellLeft + 1) * (cellBottom - cellTop + 1) > self.maxCellsPerObject:
+            return None  # Like a whole-level TileMap: a set in every cell would cost more than testing it always
+        return cellRange
+
+    def _insert(self, obj):
+        cellRange = self._bucketRange(obj)
+        if cellRange is None:
+            self._unbounded.add(obj)
+            self._cellRanges[obj] = None
+            return
+
+        self._cellRanges[obj] = cellRange
+        cells = self._cells
+        cellLeft, cellTop, cellRight, cellBottom = cellRange
+        for cellY in range(cellTop, cellBottom + 1):
+            for cellX in range(cellLeft, cellRight + 1):
+                cell = cells.get((cellX, cellY))
+                if cell is None:
+                    cell = cells[(cellX, cellY)] = set()
+                cell.add(obj)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _discard(self, obj):
+        cellRange = self._cellRanges.pop(obj, None)
+        if cellRange is None:
+            self._unbounded.discard(obj)
+            return
+
+        cells = self._cells
+        cellLeft, cellTop, cellRight, cellBottom = cellRange
+        for cellY in range(cellTop, cellBottom + 1):
+            for cellX in range(cellLeft, cellRight + 1):
+                cell = cells.get((cellX, cellY))
+                if cell is not None:
+                    cell.discard(obj)
+                    if not cell:
+                        del cells[(cellX, cellY)]
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _flushMoved(self):
+        """Re-bucket every object that moved since the last query, if its cell range changed."""
+        # Swap in a new set instead of popping: set.pop scans for the next entry, which gets slow in a table
+        # that once held thousands of objects and now holds a few
+        while self._moved:
+            moved = self._moved
+            self._moved = set()
+            for obj in moved:
+                if self._bucketRange(obj) != self._cellRanges.get(obj):
+                    self._discard(obj)
+                    self._insert(obj)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getCandidates(self, obj):
+        """
+        Return the registered objects that may overlap obj, in registration order.
+        This is the broad phase: it never misses an overlap, but may return objects that don't touch obj.
+        """
+        self._flushMoved()
+
+        bounds = obj.getBounds()
+        if bounds is None:
+            return [collidable for collidable in self.collidables if collidable is not obj]
+
+        candidates = set(self._unbounded)
+        cells = self._cells
+        cellLeft, cellTop, cellRight, cellBottom = self._cellRange(bounds)
+        for cellY in range(cellTop, cellBottom + 1):
+            for cellX in range(cellLeft, cellRight + 1):
+                cell = cells.get((cellX, cellY))
+                if cell:
+                    candidates.update(cell)
+
+        candidates.discard(obj)
+        return sorted(candidates, key=self._order.__getitem__)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getFreeSteps(self, obj, stepX, stepY, maxSteps):
+        """
+        Swept broad phase: return how many steps of (stepX, stepY), up to maxSteps, obj can take without any
+        registered object coming close enough for a hit test to succeed. One query covers the whole sweep.
+        Moving obj by that many steps at once gives the same result as checking every step with checkCollision.
+        """
+        self._flushMoved()
+
+        bounds = obj.getBounds()
+        if bounds is None:
+            return 0
+
+        left, top, right, bottom = bounds
+        sweptBounds = (min(left, left + stepX * maxSteps), min(top, top + stepY * maxSteps),
+                       max(right, right + stepX * maxSteps), max(bottom, bottom + stepY * maxSteps))
+
+        candidates = set(self._unbounded)
+        cells = self._cells
+        cellLeft, cellTop, cellRight, cellBottom = self._cellRange(sweptBounds)
+        for cellY in range(cellTop, cellBottom + 1):
+            for cellX in range(cellLeft, cellRight + 1):
+                cell = cells.get((cellX, cellY))
+                if cell:
+                    candidates.update(cell)
+        candidates.discard(obj)
+
+        freeSteps = maxSteps
+        for candidate in candidates:
+            candidateBounds = candidate.getBounds()
+            if candidateBounds is None:
+                steps = candidate.getFreeSteps(bounds, stepX, stepY, freeSteps)
+            else:
+                steps = sweepAABB(bounds, candidateBounds, stepX, stepY)
+            if steps < freeSteps:
+                freeSteps = steps
+                if freeSteps <= 0:
+                    return 0
+        return freeSteps
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def resolveOverlap(self, obj, stepX=0, stepY=-1, impact=Vector2(x=0, y=0)):
+        """
+        Return how many steps of (stepX, stepY) obj has to move before checkCollision no longer finds a collision.
+        Instead of testing every pixel, each blocking object is skipped in one jump, so this costs one query
+        per object in the way. obj is left at its original position.
+        """
+        startX = obj.x
+        startY = obj.y
+        steps = 0
+        try:
+            while True:
+                blocker = self.checkCollision(obj, impact)
+                if blocker is None:
+                    return steps
+
+                bounds = obj.getBounds()
+                blockerBounds = blocker.getBounds()
+                if bounds is None:
+                    clearSteps = 1
+                elif blockerBounds is None:
+                    clearSteps = blocker.getClearSteps(obj, stepX, stepY, impact)
+                else:
+                    clearSteps = clearAABB(bounds, blockerBounds, stepX, stepY)
+
+                steps += max(1, clearSteps)
+                obj.x = startX + stepX * steps
+                obj.y = startY + stepY * steps
+        finally:
+            obj.x = startX
+            obj.y = startY
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def checkCollision(self, obj, impact=Vector2(x=0, y=0)):
+        """Check if the given object collides with any registered collidable."""
+        candidates = self.getCandidates(obj)
+        hits = self._hitTestMany(obj, candidates) if len(candidates) >= self.batchHitTestThreshold else None
+
+        for index, collidable in enumerate(candidates):
+            hit = hits[index] if hits is not None and hits[index] is not None else collidable.hitTest(obj)
+            if hit:
+                if (collidable.shouldCollide(obj, impact) and
+                        obj.shouldCollide(collidable, scratchVectors.get(-impact.x, -impact.y))):
+                    return collidable
+                hits = None  # shouldCollide may have moved objects, so test the rest one by one
+        return None    
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getContacts(self, obj, impact):
+        """
+        Return every registered object checkCollision would stop obj on, not only the first.
+        Only for impacts whose shouldCollide rules have no side effects, such as resting on something (0, 1).
+        """
+        contacts = []
+        for collidable in self.getCandidates(obj):
+            if (collidable.hitTest(obj) and collidable.shouldCollide(obj, impact) and
+                    obj.shouldCollide(collidable, scratchVectors.get(-impact.x, -impact.y))):
+                contacts.append(collidable)
+        return contacts
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def addSleeper(self, support, body):
+        """Remember that a sleeping body rests on support, so it is woken when support moves or is removed."""
+        self._sleepers.setdefault(support, []).append(body)
+
+    def removeSleeper(self, support, body):
+        sleepers = self._sleepers.get(support)
+        if sleepers is not None and body in sleepers:
+            sleepers.remove(body)
+            if not sleepers:
+                del self._sleepers[support]
+
+    def wakeSleepers(self, support):
+        """Wake the bodies sleeping on support."""
+        sleepers = self._sleepers.pop(support, None)
+        if sleepers:
+            for body in sleepers:
+                body.wake()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _hitTestMany(self, obj, candidates):
+        """
+        Batch the OBB hit tests of obj against the candidates. Returns a list with the hit result for each
+        candidate that uses Sprite.hitTestOBB, and None for the others, or None if batching isn't worth it.
+        """
+        if not isinstance(obj, Sprite):
+            return None
+        indices = [index for index, collidable in enumerate(candidates)
+                   if type(collidable).hitTest is Sprite.hitTestOBB]
+        if len(indices) < self.batchHitTestThreshold:
+            return None
+
+        mask = obj.hitTestMany([candidates[index] for index in indices])
+        hits = [None] * len(candidates)
+        for index, hit in zip(indices, mask.tolist()):
+            hits[index] = hit
+        return hits
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class AssetCache ***
+#---------------------------------------------------------------------------------------------------------------------
+class AssetCache:
+    """
+    Keeps decoded images (RGBA) and sounds (float32 PCM) under cachePath as .npy files named after a hash of the
+    source file's contents, and loads them memory-mapped, so a warm start skips PNG/OGG decoding and the GL upload
+    and the mixer read straight from the mapped pages. A source is rehashed when its mtime or size changes.
+    Entries least recently used are deleted once the cache holds more than maxBytes.
+    Enable it with setAssetCache(AssetCache()); loadTexture, Sound, TextureAtlas and AssetManager then go through it.
+    """
+    version = 1
+
+    def __init__(self, cachePath=".cache/assets", maxBytes=512 * 1024 * 1024):
+        self.cachePath = cachePath
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # AssetManager workers share the cache
+        self._dirty = False
+        self._index = {"version": self.version, "sources": {}, "entries": {}}
+        try:
+            with open(self._indexPath()) as file:
+                index = json.load(file)
+            if index.get("version") == self.version:
+                self._index = index
+        except (OSError, ValueError):
+            pass
+
+    def _indexPath(self):
+        return os.path.join(self.cachePath, "index.json")
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           load()
+#---------------------------------------------------------------------------------------------------------------------
+    def load(self, filename, kind, decode):
+        """
+        Return the array decode(filename) would, memory-mapped from the cache.
+        On a miss decode runs and its result is stored; kind tells apart different decodings of one file.
+        """
+        with self._lock:
+            key = f"{self._contentHash(filename)}-{kind}"
+            path = os.path.join(self.cachePath, key + ".npy")
+            entry = self._index["entries"].get(key)
+            if entry is not None:
+                try:
+                    data = np.load(path, mmap_mode="r")
+                except (OSError, ValueError):
+                    data = None
+                if data is not None:
+                    self.hits += 1
+                    entry["used"] = time.time()
+                    self._dirty = True  # Recency is written by flush(), not on every hit
+                    return data
+
+        # Decode outside the lock, so workers decode in parallel
+        data = np.ascontiguousarray(decode(filename))
+        with self._lock:
+            self.misses += 1
+            os.makedirs(self.cachePath, exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp.npy"
+            np.save(temporary, data)
+            os.replace(temporary, path)  # Readers never see a half-written entry
+            self._index["entries"][key] = {"bytes": os.path.getsize(path), "used": time.time()}
+            self._evict(keep=key)
+            self._dirty = True
+            self._flushLocked()
+            return np.load(path, mmap_mode="r")
+
+    def image(self, filename):
+        """Return the image as an RGBA uint8 array of shape (height, width, 4)."""
+        return self.load(filename, "rgba", lambda name: np.array(Image.open(name).convert("RGBA")))
+
+    def sound(self, filepath):
+        """Return (data, samplerate) with data a float32 array of shape (frames, channels)."""
+        data = self.load(filepath, "pcm", lambda name: sf.read(name, dtype='float32', always_2d=True)[0])
+        return data, sf.info(filepath).samplerate
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _contentHash(self, filename):
+        """Hash of the file's contents, reused while its mtime and size are unchanged."""
+        stat = os.stat(filename)
+        stamp = [stat.st_mtime, stat.st_size]
+        source = self._index["sources"].get(os.path.abspath(filename))
+        if source is not None and source["stamp"] == stamp:
+            return source["hash"]
+
+        digest = hashlib.sha1()
+        with open(filename, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        self._index["sources"][os.path.abspath(filename)] = {"stamp": stamp, "hash": digest.hexdigest()}
+        self._dirty = True
+        return digest.hexdigest()
+
+    def _evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in maxBytes."""
+        entries = self._index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        evicted = False
+        for key in sorted(entries, key=lambda key: entries[key]["used"]):
+            if total <= self.maxBytes:
+                break
+            if key == keep:
+                continue
+            total -= entries.pop(key)["bytes"]
+            evicted = True
+            try:
+                os.remove(os.path.join(self.cachePath, key + ".npy"))
+            except OSError:
+                pass
+
+        # Forget the sources whose hash no longer has any entry
+        if evicted:
+            hashes = {key.split("-", 1)[0] for key in entries}
+            sources = self._index["sources"]
+            for path in [path for path, source in sources.items() if source["hash"] not in hashes]:
+                del sources[path]
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           flush()
+#---------------------------------------------------------------------------------------------------------------------
+    def flush(self):
+        """Write the index, with the latest use times. Runs at exit for the cache set by setAssetCache."""
+        with self._lock:
+            self._flushLocked()
+
+    def _flushLocked(self):
+        if not self._dirty:
+            return
+        os.makedirs(self.cachePath, exist_ok=True)
+        temporary = f"{self._indexPath()}.{os.getpid()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self._index, file)
+        os.replace(temporary, self._indexPath())
+        self._dirty = False
+
+    def clear(self):
+        """Delete every entry."""
+        with self._lock:
+            for key in list(self._index["entries"]):
+                try:
+                    os.remove(os.path.join(self.cachePath, key + ".npy"))
+                except OSError:
+                    pass
+            self._index = {"version": self.version, "sources": {}, "entries": {}}
+            self._dirty = True
+            self._flushLocked()
+
+# Decoded-asset cache used by _readImage and _readSound, or None to always decode
+_asset_cache = None
+
+def setAssetCache(cache):
+    """Route image and sound decoding through an AssetCache, or None to turn it off."""
+    global _asset_cache
+    if _asset_cache is not None and _asset_cache is not cache:
+        _asset_cache.flush()  # Keep the use times of the cache being replaced
+    _asset_cache = cache
+
+def _flushAssetCache():
+    if _asset_cache is not None:
+        _asset_cache.flush()
+
+atexit.register(_flushAssetCache)
+
+def _readImage(filename):
+    """Decoded RGBA pixels of an image file, from the asset cache when there is one."""
+    if _asset_cache is not None:
+        return _asset_cache.image(filename)
+    return np.array(Image.open(filename).convert("RGBA"))
+
+def _readSound(filepath):
+    """(float32 frames x channels, sample rate) of an audio file, from the asset cache when there is one."""
+    if _asset_cache is not None:
+        return _asset_cache.sound(filepath)
+    return sf.read(filepath, dtype='float32', always_2d=True)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Sound ***
+#---------------------------------------------------------------------------------------------------------------------
+class Sound:
+    """
+    A fully decoded sound, played through the shared AudioMixer. Meant for short effects; see StreamingSound
+    for long music tracks.
+    """
+    def __init__(self, filepath, decode=True):
+        """
+        Load an audio file.
+        :param filepath: Path to the audio file (e.g., OGG, WAV).
+        :param decode: False to only read the header; play() does nothing until setData() is called with the
+            decoded file, as AssetManager.loadSound does from its workers.
+        """
+        self.filepath = filepath
+        self.data = None
+        self._resampled = {}  # Decoded data per mixer sample rate
+        self._voice = None  # Voice of the last play()
+        if decode:
+            self.setData(*_readSound(filepath))
+        else:
+            self.samplerate = sf.info(filepath).samplerate
+
+    def setData(self, data, samplerate):
+        """Set the decoded (frames x channels) float32 data of the sound and its sample rate."""
+        self.samplerate = samplerate
+        self._resampled = {samplerate: data}
+        self.data = data  # Set last: play() checks it
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           play()
+#---------------------------------------------------------------------------------------------------------------------
+    def play(self, volume=1.0, loop=False):
+        """
+        Play the loaded audio file, stopping the previous play of this sound. Other sounds keep playing.
+        :return: The Voice playing it, or None if all voices are busy.
+        """
+        self.stop()
+        if self.data is None:
+            return None  # Still loading in an AssetManager
+        self._voice = AudioMixer.shared().play(self, volume, loop)
+        return self._voice
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           stop()
+#---------------------------------------------------------------------------------------------------------------------
+    def stop(self):
+        """
+        Stop the currently playing sound.
+        """
+        if self._voice is not None:
+            self._voice.stop()
+            self._voice = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           is_playing()
+#---------------------------------------------------------------------------------------------------------------------
+    def is_playing(self):
+        """
+        Check if the sound is currently playing.
+        :return: Boolean indicating playback status.
+        """
+        return self._voice is not None and self._voice.isPlaying(self)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _prepare(self, mixer, voice):
+        """Called by AudioMixer.play before the voice starts: pick the data at the mixer's sample rate."""
+        mixer._checkChannels(self.filepath, self.data.shape[1])
+        data = self._resampled.get(mixer.samplerate)
+        if data is None:
+            # Linear resampling, done once per rate
+            frames = int(round(len(self.data) * mixer.samplerate / self.samplerate))
+            positions = np.linspace(0, len(self.data) - 1, frames)
+            data = np.stack([np.interp(positions, np.arange(len(self.data)), channel)
+                             for channel in self.data.T], axis=1).astype(np.float32)
+            self._resampled[mixer.samplerate] = data
+        voice.data = data
+
+    def _mix(self, voice, out, scratch, frames):
+        """
+        Called on the audio thread: add frames of the voice into out, using scratch for the scaled samples.
+        Returns False when the voice has finished.
+        """
+        data = voice.data
+        length = len(data)
+        if length == 0:
+            return False  # Nothing to play, and a looping voice would never fill the block
+        written = 0
+        while written < frames:
+            count = min(frames - written, length - voice.position)
+            if count > 0:
+                position = voice.position
+                np.multiply(data[position:position + count], voice.volume, out=scratch[:count])
+                np.add(out[written:written + count], scratch[:count], out=out[written:written + count])
+                voice.position = position + count
+                written += count
+            if voice.position >= length:
+                if not voice.loop:
+                    return False
+                voice.position = 0
+        return True
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class StreamingSound ***
+#---------------------------------------------------------------------------------------------------------------------
+class StreamingSound(Sound):
+    """
+    A sound decoded while it plays, for long music tracks. A background thread decodes blocks into a ring buffer
+    of bufferSeconds, so memory stays bounded whatever the length of the file and nothing blocks at load.
+    Looping restarts the file inside the decoder, so there is no gap. One StreamingSound plays one voice at a time;
+    a file at another sample rate than the mixer's is resampled by the decoder thread, block by block.
+    """
+    def __init__(self, filepath, bufferSeconds=2.0, blockFrames=8192):
+        self.filepath = filepath
+        info = sf.info(filepath)
+        self.samplerate = info.samplerate
+        self.channels = info.channels
+        self.frames = info.frames
+        self.bufferSeconds = bufferSeconds
+        self.blockFrames = blockFrames
+        self._voice = None
+
+        # Ring buffer at the mixer's rate, with monotonic frame counters; the frames between read and write are ready
+        self._allocateRing(self.samplerate)
+        self._readIndex = 0
+        self._writeIndex = 0
+        self._endIndex = None  # Write index at the end of the file when not looping
+        self._loop = False
+        self._seekFrame = None  # Requested file position, handled by the decoder thread
+        self._generation = 0  # Bumped by every seek, so blocks decoded before it are dropped
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.underruns = 0  # Callbacks that found the ring buffer empty before the end of the track
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           seek()
+#---------------------------------------------------------------------------------------------------------------------
+    def seek(self, seconds):
+        """Continue playback from the given time in the track. Buffered audio is dropped."""
+        with self._condition:
+            self._seekFrame = min(max(0, int(seconds * self.samplerate)), self.frames)
+            self._generation += 1
+            self._readIndex = self._writeIndex
+            self._endIndex = None
+            self._condition.notify_all()
+
+    def close(self):
+        """Stop playback and the decoder thread, and close the file."""
+        self.stop()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _allocateRing(self, rate):
+        self._rate = rate  # Sample rate of the ring buffer
+        self._ringBlock = int(np.ceil(self.blockFrames * rate / self.samplerate)) + 1  # Most frames a block makes
+        capacity = max(int(self.bufferSeconds * rate), 2 * self._ringBlock)
+        self._ring = np.zeros((capacity, self.channels), dtype=np.float32)
+
+    def _prepare(self, mixer, voice):
+        mixer._checkChannels(self.filepath, self.channels)
+        with self._condition:
+            if mixer.samplerate != self._rate:
+                self._allocateRing(mixer.samplerate)  # The seek below drops anything decoded for the old ring
+            self._loop = voice.loop
+        self.seek(0)
+        if self._thread is None:
+            self._closed = False
+            self._thread = threading.Thread(target=self._decodeThread, daemon=True)
+            self._thread.start()
+
+    def _decodeThread(self):
+        """Keep the ring buffer full, one block at a time, resampled to the rate of the ring."""
+        previous = None  # Last frame of the previous block, to interpolate across blocks
+        offset = 0.0  # File position of the next output frame, relative to the next block
+        with sf.SoundFile(self.filepath) as file:
+            while True:
+                with self._condition:
+                    while not self._closed and self._seekFrame is None and (
+                            self._endIndex is not None or
+                            self._writeIndex - self._readIndex > len(self._ring) - self._ringBlock):
+                        self._condition.wait()
+                    if self._closed:
+                        return
+                    seekFrame = self._seekFrame
+                    self._seekFrame = None
+                    generation = self._generation
+                    loop = self._loop
+                    step = self.samplerate / self._rate
+
+                # File work is done outside the lock, which the audio callback takes
+                if seekFrame is not None:
+                    file.seek(seekFrame)
+                    previous = None
+                    offset = 0.0
+                data = file.read(self.blockFrames, dtype="float32", always_2d=True)
+                if len(data) == 0:
+                    with self._condition:
+                        if generation != self._generation:
+                            continue
+                        if not loop:
+                            self._endIndex = self._writeIndex
+                    if loop:
+                        file.seek(0)  # Gapless: the next block follows straight on
+                    continue
+                if step != 1.0:
+                    data, previous, offset = _resampleBlock(data, previous, offset, step)
+
+                with self._condition:
+                    if generation != self._generation:
+                        continue  # A seek happened while decoding
+                    ring = self._ring
+                    capacity = len(ring)
+                    start = self._writeIndex % capacity
+                    first = min(len(data), capacity - start)
+                    ring[start:start + first] = data[:first]
+                    ring[:len(data) - first] = data[first:]
+                    self._writeIndex += len(data)
+
+    def _mix(self, voice, out, scratch, frames):
+        with self._condition:
+            ring = self._ring
+            capacity = len(ring)
+            available = self._writeIndex - self._readIndex
+            count = min(frames, available)
+            start = self._readIndex % capacity
+            first = min(count, capacity - start)
+            np.multiply(ring[start:start + first], voice.volume, out=scratch[:first])
+            np.multiply(ring[:count - first], voice.volume, out=scratch[first:count])
+            np.add(out[:count], scratch[:count], out=out[:count])
+            self._readIndex += count
+            finished = self._endIndex is not None and self._readIndex >= self._endIndex
+            if count < frames and not finished:
+                self.underruns += 1
+            self._condition.notify_all()
+        return not finished
+
+def _resampleBlock(data, previous, offset, step):
+    """
+    Linear resampling of one block of a stream, step input frames per output frame. offset is the input position
+    of the first output frame, -1 being previous, the last frame of the block before (None at the start).
+    Returns the resampled frames, and the previous and offset to pass with the next block.
+    """
+    if previous is not None:
+        data = np.concatenate((previous[None], data))
+        offset += 1
+    count = max(0, int((len(data) - 1 - offset) // step) + 1)
+    positions = offset + step * np.arange(count)
+    frames = np.arange(len(data))
+    out = np.stack([np.interp(positions, frames, channel) for channel in data.T], axis=1).astype(np.float32)
+    return out, data[-1].copy(), offset + step * count - len(data)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Voice ***
+#---------------------------------------------------------------------------------------------------------------------
+class Voice:
+    """
+    One playing sound in the AudioMixer. Voices are preallocated and reused; volume can change while playing.
+    AudioMixer.play starts a new generation of the voice and stop() asks for it to end, but only the audio thread
+    marks a generation done, so a voice is never handed out again while the callback may still be mixing it.
+    """
+    __slots__ = ("sound", "data", "position", "volume", "loop", "generation", "stopped", "done")
+
+    def __init__(self):
+        self.sound = None
+        self.data = None
+        self.position = 0
+        self.volume = 1.0
+        self.loop = False
+        self.generation = 0  # Bumped by the main thread for every play
+        self.stopped = 0  # Generation stop() was called for, written by the main thread
+        self.done = 0  # Generation the audio thread has finished, written by it only
+
+    @property
+    def active(self):
+        """True from play until the voice finishes or is stopped."""
+        generation = self.generation
+        return self.done != generation and self.stopped != generation
+
+    def stop(self):
+        self.stopped = self.generation
+
+    def isPlaying(self, sound=None):
+        """Return True if the voice is playing, and still playing sound if one is given."""
+        return self.active and (sound is None or self.sound is sound)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class NullOutputStream ***
+#---------------------------------------------------------------------------------------------------------------------
+class NullOutputStream:
+    """
+    Stands in for sounddevice.OutputStream when there is no audio device, in headless games and tests.
+    Nothing is played; pull() runs the callback like the device would and returns the mixed block.
+    """
+    def __init__(self, samplerate, channels, blocksize, callback):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.callback = callback
+        self.active = False
+        self._buffer = np.zeros((blocksize, channels), dtype=np.float32)
+
+    def start(self):
+        self.active = True
+
+    def stop(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+    def pull(self):
+        """Mix one block and return it. The array is reused by the next pull."""
+        self.callback(self._buffer, self.blocksize, None, None)
+        return self._buffer
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class AudioMixer ***
+#---------------------------------------------------------------------------------------------------------------------
+class AudioMixer:
+    """
+    Mixes any number of voices into one persistent, callback-driven output stream, instead of a thread and a
+    process-global sd.play per sound. The voices and mix buffers are allocated up front, so the callback only
+    does in-place NumPy work. Falls back to a NullOutputStream in headless mode or without an audio device.
+    """
+    _shared = None
+
+    def __init__(self, samplerate=44100, channels=2, blockSize=512, maxVoices=32, null=None):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blockSize = blockSize
+        self.volume = 1.0  # Master volume
+        self.voices = [Voice() for _ in range(maxVoices)]
+        self._scratch = np.zeros((blockSize, channels), dtype=np.float32)
+        self.stream = None
+        self.null = _headless if null is None else null
+
+    @classmethod
+    def shared(cls):
+        """Return the mixer used by Sound.play, creating and starting it on first use."""
+        if cls._shared is None:
+            cls._shared = AudioMixer()
+            cls._shared.start()
+        return cls._shared
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def start(self):
+        """Open and start the output stream."""
+        if self.stream is not None:
+            return
+        if not self.null:
+            try:
+                self.stream = sd.OutputStream(samplerate=self.samplerate, channels=self.channels, dtype="float32",
+                                              blocksize=self.blockSize, callback=self._callback)
+            except Exception:
+                self.null = True  # No usable audio device
+        if self.null:
+            self.stream = NullOutputStream(self.samplerate, self.channels, self.blockSize, self._callback)
+        self.stream.start()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if AudioMixer._shared is self:
+            AudioMixer._shared = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def play(self, sound, volume=1.0, loop=False):
+        """Start sound on a free voice and return the Voice, or None if all voices are busy."""
+        for voice in self.voices:
+            generation = voice.generation
+            # A NullOutputStream mixes in pull(), on this thread, so a stopped voice can't be in the middle of a mix
+            if voice.done == generation or (self.null and voice.stopped == generation):
+                voice.sound = sound
+                voice.position = 0
+                voice.volume = volume
+                voice.loop = loop
+                sound._prepare(self, voice)
+                voice.generation = generation + 1  # Set last: the audio thread starts mixing the new generation
+                return voice
+        return None
+
+    def stopAll(self):
+        for voice in self.voices:
+            voice.stop()
+
+    def _checkChannels(self, filepath, channels):
+        """Raise ValueError unless sounds with this many channels can be mixed: mono, or the mixer's count."""
+        if channels not in (1, self.channels):
+            raise ValueError(f"{filepath} has {channels} channels; the mixer plays mono or {self.channels} channels")
+
+    def activeVoices(self):
+        return sum(1 for voice in self.voices if voice.active)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _callback(self, outdata, frames, time, status):
+        """Audio thread: mix all active voices into outdata."""
+        outdata.fill(0)
+        if frames > len(self._scratch):
+            frames = len(self._scratch)  # Never happens with a fixed block size
+        scratch = self._scratch
+        for voice in self.voices:
+            generation = voice.generation
+            if voice.done == generation:
+                continue
+            if voice.stopped == generation or not voice.sound._mix(voice, outdata, scratch, frames):
+                voice.done = generation  # Only here is a voice freed
+        if self.volume != 1.0:
+            np.multiply(outdata, self.volume, out=outdata)
+        np.clip(outdata, -1.0, 1.0, out=outdata)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+class Input:
+    """
+    Singleton class to handle keyboard and mouse input.
+    GLFW key, mouse button and cursor callbacks write into fixed-size state arrays as events arrive;
+    update() copies that live state into the per-tick arrays that getKey and friends read, so a tick costs
+    two array copies instead of polling every key. Key names are resolved to codes once and cached.
+    """
+    _instance = None
+    _window = None  # Window the callbacks are installed on
+
+    # Live state written by the callbacks, and keys or buttons pressed since the last update()
+    _liveKeys = bytearray(glfw.KEY_LAST + 1)
+    _liveButtons = bytearray(glfw.MOUSE_BUTTON_LAST + 1)
+    _tappedKeys = []
+    _tappedButtons = []
+    _cursorX = 0
+    _cursorY = 0
+
+    # State as of the last update(), and the one before it for edge detection
+    _current_keys = bytearray(glfw.KEY_LAST + 1)
+    _previous_keys = bytearray(glfw.KEY_LAST + 1)
+    _current_buttons = bytearray(glfw.MOUSE_BUTTON_LAST + 1)
+    _previous_buttons = bytearray(glfw.MOUSE_BUTTON_LAST + 1)
+    mouseX = 0
+    mouseY = 0
+
+    # Every glfw.KEY_* constant by its lowercase name ("a", "space", "left_shift", "f1", "kp_0", ...)
+    _keyCodes = {name[4:].lower(): getattr(glfw, name) for name in dir(glfw)
+                 if name.startswith("KEY_") and name not in ("KEY_LAST", "KEY_UNKNOWN")}
+    _keyCodes["esc"] = glfw.KEY_ESCAPE
+    _buttonCodes = {"left": glfw.MOUSE_BUTTON_LEFT, "right": glfw.MOUSE_BUTTON_RIGHT,
+                    "middle": glfw.MOUSE_BUTTON_MIDDLE}
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(Input, cls).__new__(cls)
+        return cls._instance
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def _install(cls, window):
+        """Install the callbacks on the window and start from its current cursor position."""
+        cls._window = window
+        glfw.set_key_callback(window, cls._onKey)
+        glfw.set_mouse_button_callback(window, cls._onMouseButton)
+        glfw.set_cursor_pos_callback(window, cls._onCursor)
+        cls._cursorX, cls._cursorY = glfw.get_cursor_pos(window)
+
+    @classmethod
+    def _onKey(cls, window, key, scancode, action, mods):
+        if key < 0 or key > glfw.KEY_LAST:
+            return  # KEY_UNKNOWN
+        if action == glfw.PRESS:
+            cls._liveKeys[key] = 1
+            cls._tappedKeys.append(key)
+        elif action == glfw.RELEASE:
+            cls._liveKeys[key] = 0
+
+    @classmethod
+    def _onMouseButton(cls, window, button, action, mods):
+        if action == glfw.PRESS:
+            cls._liveButtons[button] = 1
+            cls._tappedButtons.append(button)
+        elif action == glfw.RELEASE:
+            cls._liveButtons[button] = 0
+
+    @classmethod
+    def _onCursor(cls, window, x, y):
+        cls._cursorX = x
+        cls._cursorY = y
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def update(cls, window):
+        """
+        Update the current key states and mouse position from the events received since the last call.
+        Should be called once per tick, after glfw.poll_events. A key pressed and released between two
+        updates still counts as held for one tick.
+        """
+        if window is not cls._window:
+            cls._install(window)
+
+        cls._previous_keys[:] = cls._current_keys
+        cls._current_keys[:] = cls._liveKeys
+        for key in cls._tappedKeys:
+            cls._current_keys[key] = 1
+        cls._tappedKeys.clear()
+
+        cls._previous_buttons[:] = cls._current_buttons
+        cls._current_buttons[:] = cls._liveButtons
+        for button in cls._tappedButtons:
+            cls._current_buttons[button] = 1
+        cls._tappedButtons.clear()
+
+        cls.mouseX = cls._cursorX
+        cls.mouseY = cls._cursorY
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def setKeys(cls, key_names, mouseX=None, mouseY=None, buttons=()):
+        """
+        Scripted replacement for update(): the given keys and mouse buttons are held this tick and all
+        others are up. Used by headless games, which have no window to poll.
+        """
+        cls._previous_keys[:] = cls._current_keys
+        cls._current_keys[:] = bytes(len(cls._current_keys))
+        for key_name in key_names:
+            cls._current_keys[cls._key_to_glfw_key(key_name)] = 1
+
+        cls._previous_buttons[:] = cls._current_buttons
+        cls._current_buttons[:] = bytes(len(cls._current_buttons))
+        for button in buttons:
+            cls._current_buttons[cls._buttonCode(button)] = 1
+
+        if mouseX is not None:
+            cls.mouseX = mouseX
+        if mouseY is not None:
+            cls.mouseY = mouseY
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def reset(cls):
+        """Release every key and button and forget the cursor, as at startup. The callbacks stay installed."""
+        for state in (cls._liveKeys, cls._liveButtons, cls._current_keys, cls._previous_keys,
+                      cls._current_buttons, cls._previous_buttons):
+            state[:] = bytes(len(state))
+        cls._tappedKeys.clear()
+        cls._tappedButtons.clear()
+        cls._cursorX = cls._cursorY = 0
+        cls.mouseX = cls.mouseY = 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def getKey(cls, key_name):
+        """Return True if the specified key is being held down."""
+        return cls._current_keys[cls._key_to_glfw_key(key_name)] == 1
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def getKeyDown(cls, key_name):
+        """Return True if the specified key was pressed this frame."""
+        key = cls._key_to_glfw_key(key_name)
+        return cls._current_keys[key] == 1 and cls._previous_keys[key] == 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def getKeyUp(cls, key_name):
+        """Return True if the specified key was released this frame."""
+        key = cls._key_to_glfw_key(key_name)
+        return cls._current_keys[key] == 0 and cls._previous_keys[key] == 1
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def getMouseButton(cls, button):
+        """Return True if the mouse button ("left", "right", "middle" or a GLFW button number) is held down."""
+        return cls._current_buttons[cls._buttonCode(button)] == 1
+
+    @classmethod
+    def getMouseButtonDown(cls, button):
+        """Return True if the mouse button was pressed this frame."""
+        button = cls._buttonCode(button)
+        return cls._current_buttons[button] == 1 and cls._previous_buttons[button] == 0
+
+    @classmethod
+    def getMouseButtonUp(cls, button):
+        """Return True if the mouse button was released this frame."""
+        button = cls._buttonCode(button)
+        return cls._current_buttons[button] == 0 and cls._previous_buttons[button] == 1
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @classmethod
+    def _key_to_glfw_key(cls, key_name):
+        """
+        Convert a key name to a GLFW key constant: the lowercase name of any glfw.KEY_* constant,
+        plus "esc". For example: "w" -> glfw.KEY_W, "left_shift" -> glfw.KEY_LEFT_SHIFT.
+        GLFW key numbers are passed through.
+        """
+        try:
+            return cls._keyCodes[key_name]
+        except KeyError:
+            if isinstance(key_name, int) and 0 <= key_name <= glfw.KEY_LAST:
+                return key_name
+            raise ValueError(f"Unknown key name: {key_name}")
+
+    @classmethod
+    def _buttonCode(cls, button):
+        try:
+            return cls._buttonCodes[button]
+        except KeyError:
+            if isinstance(button, int) and 0 <= button <= glfw.MOUSE_BUTTON_LAST:
+                return button
+            raise ValueError(f"Unknown mouse button: {button}")
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class InputRecorder ***
+#---------------------------------------------------------------------------------------------------------------------
+# Input recordings: a header, then one record per tick on which something changed, each starting with a varint
+# of ticks since the previous record and a flags byte. Keys are stored as the codes that toggled, buttons as a
+# bit mask, and the mouse as zigzag varint deltas when they are whole pixels, else as two doubles.
+_RECORDING_MAGIC = b"INPR\x01"
+_RECORD_KEYS = 1
+_RECORD_BUTTONS = 2
+_RECORD_MOUSE = 4
+_RECORD_MOUSE_FLOAT = 8
+_RECORD_CHECKSUM = 16
+_RECORD_END = 128
+
+def _writeVarint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+class InputRecorder:
+    """
+    Records the Input state of every tick to a compact binary stream. Call beginTick() after Input has been
+    updated and endTick() after the game's update; only changes are written, so held keys cost nothing.
+    With checksumEvery, endTick() also stores the given state checksum every that many ticks, which lets
+    InputPlayer detect a replay that diverges. The file is written as the game runs; close() finishes it.
+    """
+    def __init__(self, path, checksumEvery=0):
+        self.file = open(path, "wb") if isinstance(path, str) else path
+        self.file.write(_RECORDING_MAGIC)
+        self.checksumEvery = checksumEvery
+        self.tick = 0
+        self._lastRecordTick = 0
+        self._keys = bytearray(len(Input._current_keys))
+        self._buttons = 0
+        self._mouse = (0, 0)
+        self._record = bytearray()
+        self._flags = 0
+
+    def beginTick(self):
+        """Capture the changes in Input since the previous tick."""
+        record = self._record
+        flags = 0
+        if Input._current_keys != self._keys:
+            toggled = [code for code, (now, before) in enumerate(zip(Input._current_keys, self._keys)) if now != before]
+            flags |= _RECORD_KEYS
+            _writeVarint(record, len(toggled))
+            for code in toggled:
+                _writeVarint(record, code)
+            self._keys[:] = Input._current_keys
+
+        buttons = sum(1 << index for index, held in enumerate(Input._current_buttons[:8]) if held)
+        if buttons != self._buttons:
+            flags |= _RECORD_BUTTONS
+            record.append(buttons)
+            self._buttons = buttons
+
+        mouse = (Input.mouseX, Input.mouseY)
+        if mouse != self._mouse:
+            deltaX = mouse[0] - self._mouse[0]
+            deltaY = mouse[1] - self._mouse[1]
+            if deltaX == int(deltaX) and deltaY == int(deltaY):
+                flags |= _RECORD_MOUSE
+                _writeVarint(record, _zigzag(int(deltaX)))
+                _writeVarint(record, _zigzag(int(deltaY)))
+            else:
+                flags |= _RECORD_MOUSE | _RECORD_MOUSE_FLOAT
+                record += struct.pack("<dd", *mouse)
+            self._mouse = mouse
+        self._flags = flags
+
+    def checksumDue(self):
+        """Return True if endTick() should be given a checksum for the current tick."""
+        return self.checksumEvery > 0 and (self.tick + 1) % self.checksumEvery == 0
+
+    def endTick(self, checksum=None):
+        """Write this tick's record, if anything changed or a checksum is due."""
+        tick = self.tick
+        self.tick += 1
+        flags = self._flags
+        if checksum is not None:
+            flags |= _RECORD_CHECKSUM
+            self._record += struct.pack("<I", checksum & 0xFFFFFFFF)
+        if flags:
+            header = bytearray()
+            _writeVarint(header, tick - self._lastRecordTick)
+            header.append(flags)
+            self.file.write(header + self._record)
+            self._lastRecordTick = tick
+        self._record = bytearray()
+        self._flags = 0
+
+    def close(self):
+        """Write the end marker with the total length and close the file."""
+        end = bytearray()
+        _writeVarint(end, self.tick - self._lastRecordTick)
+        end.append(_RECORD_END)
+        self.file.write(end)
+        self.file.close()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class InputPlayer ***
+#---------------------------------------------------------------------------------------------------------------------
+class InputPlayer:
+    """
+    Plays an InputRecorder stream back into Input, reading the file in chunks as it goes.
+    beginTick() sets Input to the recorded state of the next tick and returns False once the recording is over;
+    endTick() returns the checksum recorded for that tick, or None.
+    """
+    def __init__(self, path, chunkSize=65536):
+        self.file = open(path, "rb") if isinstance(path, str) else path
+        self.chunkSize = chunkSize
+        self._buffer = b""
+        self._position = 0
+        if self._read(len(_RECORDING_MAGIC)) != _RECORDING_MAGIC:
+            raise ValueError("Not an input recording")
+        self.tick = 0
+        self._keys = bytearray(len(Input._current_keys))
+        self._buttons = bytearray(len(Input._current_buttons))
+        self._mouse = (0, 0)
+        self._checksum = None
+        self._nextTick, self._nextFlags = self._readHeader(0)
+
+    def _fill(self, count):
+        if self._position + count > len(self._buffer):
+            self._buffer = self._buffer[self._position:] + self.file.read(max(count, self.chunkSize))
+            self._position = 0
+            if count > len(self._buffer):
+                raise ValueError("Input recording is truncated")
+
+    def _read(self, count):
+        self._fill(count)
+        data = self._buffer[self._position:self._position + count]
+        self._position += count
+        return data
+
+    def _readVarint(self):
+        value = 0
+        shift = 0
+        while True:
+            self._fill(1)
+            byte = self._buffer[self._position]
+            self._position += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def _readHeader(self, fromTick):
+        delta = self._readVarint()
+        return fromTick + delta, self._read(1)[0]
+
+    def beginTick(self):
+        """Apply the recorded state of the next tick to Input. Returns False at the end of the recording."""
+        flags = 0
+        self._checksum = None
+        if self.tick == self._nextTick:
+            flags = self._nextFlags
+            if flags & _RECORD_END:
+                return False
+            if flags & _RECORD_KEYS:
+                for _ in range(self._readVarint()):
+                    code = self._readVarint()
+                    self._keys[code] ^= 1
+            if flags & _RECORD_BUTTONS:
+                mask = self._read(1)[0]
+                for index in range(8):
+                    self._buttons[index] = (mask >> index) & 1
+            if flags & _RECORD_MOUSE_FLOAT:
+                self._mouse = struct.unpack("<dd", self._read(16))
+            elif flags & _RECORD_MOUSE:
+                self._mouse = (self._mouse[0] + _unzigzag(self._readVarint()),
+                               self._mouse[1] + _unzigzag(self._readVarint()))
+            if flags & _RECORD_CHECKSUM:
+                self._checksum = struct.unpack("<I", self._read(4))[0]
+            self._nextTick, self._nextFlags = self._readHeader(self.tick)
+
+        Input._previous_keys[:] = Input._current_keys
+        Input._current_keys[:] = self._keys
+        Input._previous_buttons[:] = Input._current_buttons
+        Input._current_buttons[:] = self._buttons
+        Input.mouseX, Input.mouseY = self._mouse
+        return True
+
+    def endTick(self):
+        """Finish the tick and return its recorded checksum, or None."""
+        self.tick += 1
+        return self._checksum
+
+    def close(self):
+        self.file.close()
+
+# Texture cache to store loaded textures
+_texture_cache = {}
+
+# When True, no OpenGL calls are made for textures: sizes come from the image headers and IDs are 0
+_headless = False
+
+def setHeadless(value):
+    """
+    Switch texture loading to headless mode, see Game(headless=True). Switching empties the texture cache,
+    since its textures were loaded for the other mode.
+    """
+    global _headless
+    if value != _headless:
+        _texture_cache.clear()
+    _headless = value
+
+# AssetManager that loadTexture hands new images to, set by Game; None loads them on the spot
+_asset_manager = None
+
+def setAssetManager(manager):
+    """Route loadTexture, and so every Sprite, AnimSprite, Text and TileMap, through an AssetManager, or None."""
+    global _asset_manager
+    _asset_manager = manager
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+class Texture:
+    """
+    Class to hold texture data: OpenGL ID, width, and height.
+    A texture packed into a TextureAtlas shares the page's ID and covers uvRect (u0, v0, u1, v1) of it.
+    """
+    def __init__(self, texture_id, width, height, uvRect=(0.0, 0.0, 1.0, 1.0), premultipliedAlpha=False, ready=True):
+        self.texture_id = texture_id
+        self.width = width
+        self.height = height
+        self.uvRect = uvRect
+        self.premultipliedAlpha = premultipliedAlpha  # True for render textures, which hold premultiplied colors
+        self.ready = ready  # False while an AssetManager is still loading it; nothing using it is drawn until then
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def mapUV(self, u0, v0, u1, v1):
+        """Map texture coordinates of this texture (0 to 1) to coordinates on the GL texture it lives in."""
+        left, top, right, bottom = self.uvRect
+        width = right - left
+        height = bottom - top
+        return left + u0 * width, top + v0 * height, left + u1 * width, top + v1 * height
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+def _createGLTexture(img_data, width, height, wrap=GL_REPEAT):
+    """Upload RGBA pixel data to a new OpenGL texture and return its ID."""
+    # Generate OpenGL texture ID
+    tex_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+
+    # Set texture parameters
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, wrap)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, wrap)
+
+    # Upload texture data to OpenGL
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+    return tex_id
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+def loadTexture(filename):
+    """
+    Load a texture from a file.
+    If the texture has already been loaded, return the cached version. With an AssetManager set by
+    setAssetManager, the image is decoded in the background and the Texture is not ready until it is uploaded.
+    """
+    global _texture_cache
+
+    # Return cached texture if it exists
+    if filename in _texture_cache:
+        return _texture_cache[filename]
+
+    if _headless:
+        # Image.open only reads the header, so the pixels are never decoded
+        with Image.open(filename) as image:
+            texture = Texture(0, image.width, image.height)
+        _texture_cache[filename] = texture
+        return texture
+
+    if _asset_manager is not None:
+        return _asset_manager.loadTexture(filename)
+
+    # Load texture image
+    img_data = _readImage(filename)
+    height, width = img_data.shape[:2]
+
+    tex_id = _createGLTexture(img_data, width, height)
+
+    # Create a Texture object and cache it
+    texture = Texture(tex_id, width, height)
+    _texture_cache[filename] = texture
+
+    return texture
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class AssetManager ***
+#---------------------------------------------------------------------------------------------------------------------
+class AssetManager:
+    """
+    Loads textures and sounds in the background. loadTexture and loadSound return handles right away:
+    a Texture sized from the image header, which draws nothing until it is ready, and a Sound that
+    can't play until it is decoded. Decoding runs on a thread pool; the GL uploads are queued and done by
+    update() on the main thread, at most uploadBudget seconds per frame. Game makes one as Game.assets, routes
+    loadTexture through it with setAssetManager and calls update() every frame.
+    """
+    def __init__(self, workers=4, uploadBudget=0.004):
+        self.workers = workers
+        self.uploadBudget = uploadBudget
+        self.total = 0  # Assets requested
+        self.loaded = 0  # Assets ready to use
+        self.errors = []  # (filename, exception) of assets that failed to load
+        self._executor = None
+        self._uploads = collections.deque()  # (texture, pixels, wrap, views) decoded and waiting for update()
+        self._lock = threading.Lock()
 
-    # Calculate the other sprite's AABB
-    left_b = int(other.x - other.originX)
-    right_b = int(other.x - other.originX + other.width)
-    top_b = int(other.y - other.originY)
-    bottom_b = int(other.y - other.originY + other.height)
+    def _submit(self, function, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers)
+        self.total += 1
+        return self._executor.submit(function, *args)
 
-    # Check for overlap
-    return not (right_a <= left_b or left_a >= right_b or bottom_a <= top_b or top_a >= bottom_b)
-    
 #---------------------------------------------------------------------------------------------------------------------
-#                                                      *** class Vector2 ***
+#                                                           loadTexture()
 #---------------------------------------------------------------------------------------------------------------------
-class Vector2:
-    def __init__(self, x=0, y=0):
-        self.x = x
-        self.y = y
-    
+    def loadTexture(self, filename):
+        """Return a Texture handle for the image, shared with loadTexture(), and decode it in the background."""
+        global _texture_cache
+        if filename in _texture_cache:
+            return _texture_cache[filename]
+
+        with Image.open(filename) as image:
+            texture = Texture(0, image.width, image.height, ready=False)
+        _texture_cache[filename] = texture
+        self._submit(self._decodeTexture, filename, texture)
+        return texture
+
+    def _decodeTexture(self, filename, texture, wrap=GL_REPEAT, views=()):
+        try:
+            pixels = None if _headless else _readImage(filename)
+        except Exception as error:
+            with self._lock:
+                self.errors.append((filename, error))
+            return
+        self._uploads.append((texture, pixels, wrap, views))
+
+    def _loadAtlasPage(self, page, views, filename, pixels=None):
+        """Upload an atlas page, decoding it from filename first unless its pixels are given."""
+        if pixels is None:
+            self._submit(self._decodeTexture, filename, page, GL_CLAMP_TO_EDGE, views)
+        else:
+            self.total += 1
+            self._uploads.append((page, pixels, GL_CLAMP_TO_EDGE, views))
+
 #---------------------------------------------------------------------------------------------------------------------
-#                                                           
+#                                                           loadSound()
 #---------------------------------------------------------------------------------------------------------------------
-    def __neg__(self):
-        """Negate the vector."""
-        return Vector2(-self.x, -self.y)
+    def loadSound(self, filepath):
+        """Return a Sound handle and decode it in the background. Until then its play() does nothing."""
+        sound = Sound(filepath, decode=False)
+        self._submit(self._decodeSound, sound)
+        return sound
+
+    def _decodeSound(self, sound):
+        try:
+            data, samplerate = _readSound(sound.filepath)
+        except Exception as error:
+            with self._lock:
+                self.errors.append((sound.filepath, error))
+            return
+        sound.setData(data, samplerate)
+        with self._lock:
+            self.loaded += 1
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                           
+#                                                           update()
 #---------------------------------------------------------------------------------------------------------------------
-    def __repr__(self):
-        """String representation for debugging."""
-        return f"Vector2(x={self.x}, y={self.y})"    
-        
+    def update(self, scene=None):
+        """
+        Upload decoded textures on the main thread until the frame's upload budget is spent.
+        Objects of scene drawing an uploaded texture get invalidateCache(), so bitmaps cached without it are redone.
+        """
+        deadline = time.perf_counter() + self.uploadBudget
+        uploads = self._uploads
+        uploaded = set()
+        while uploads:
+            texture, pixels, wrap, views = uploads.popleft()
+            if pixels is not None:
+                texture.texture_id = _createGLTexture(pixels, texture.width, texture.height, wrap)
+            texture.ready = True
+            uploaded.add(texture)
+            for view in views:  # Atlas images on this page
+                view.texture_id = texture.texture_id
+                view.ready = True
+                uploaded.add(view)
+            with self._lock:
+                self.loaded += 1
+            if time.perf_counter() >= deadline:
+                break
+        if uploaded and scene is not None:
+            scene._texturesUploaded(uploaded)
+
+    def progress(self):
+        """Return the fraction of requested assets that are ready, from 0 to 1."""
+        return self.loaded / self.total if self.total else 1.0
+
+    def isDone(self):
+        return self.loaded + len(self.errors) >= self.total
+
+    def wait(self):
+        """Block until everything requested so far is loaded, uploading as textures arrive (a loading screen)."""
+        while not self.isDone():
+            self.update()
+            time.sleep(0.001)
+
 #---------------------------------------------------------------------------------------------------------------------
-#                                                      *** class CollisionManager ***
+#                                                      *** class TextureAtlas ***
 #---------------------------------------------------------------------------------------------------------------------
-class CollisionManager:
-    def __init__(self):
-        self.collidables = []  # List of GameObjects that can be collided with
+class TextureAtlas:
+    """
+    Packs several images into one or a few large atlas pages, so sprites using different images share a texture
+    and a SpriteBatch can draw them in one call. After load(), loadTexture returns a Texture for each packed
+    image that points at its sub-rectangle of a page.
+    The packing and the page images are saved under cachePath and reused while the source files are unchanged.
+    """
+    version = 1
+
+    def __init__(self, filenames, pageSize=1024, padding=1, cachePath=".cache/atlas"):
+        self.filenames = list(filenames)
+        self.pageSize = pageSize
+        self.padding = padding  # Edge pixels repeated around each image, so linear filtering doesn't bleed
+        self.cachePath = cachePath
+        self.layout = None
+        self.pages = []  # Texture per page
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def add(self, obj):
-        """Register a collidable object."""
-        self.collidables.append(obj)
+    def _sourceStamp(self, filename):
+        stat = os.stat(filename)
+        return [stat.st_mtime, stat.st_size]
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def remove(self, obj):
-        """Unregister a collidable object."""
-        if obj in self.collidables:
-            self.collidables.remove(obj)
+    def _loadLayout(self):
+        """Return the saved layout if it matches the current images and settings, otherwise None."""
+        layoutPath = os.path.join(self.cachePath, "atlas.json")
+        try:
+            with open(layoutPath) as file:
+                layout = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if not isinstance(layout, dict):
+            return None
+        images = layout.get("images")
+        pages = layout.get("pages")
+        if (layout.get("version") != self.version or layout.get("pageSize") != self.pageSize
+                or layout.get("padding") != self.padding or not isinstance(images, dict)
+                or not isinstance(pages, list) or sorted(images) != sorted(self.filenames)):
+            return None
+        for filename, entry in images.items():
+            if not os.path.exists(filename) or not isinstance(entry, dict) or entry.get("stamp") != self._sourceStamp(filename):
+                return None
+        for pageIndex in range(len(pages)):
+            if not os.path.exists(self._pagePath(pageIndex)):
+                return None
+        return layout
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def checkCollision(self, obj, impact=Vector2(x=0, y=0)):
-        """Check if the given object collides with any registered collidable."""
-        for collidable in self.collidables:
-            if collidable != obj and collidable.hitTest(obj) and collidable.shouldCollide(obj, impact) and obj.shouldCollide(collidable, -impact):
-                return collidable
-        return None    
+    def _pagePath(self, pageIndex):
+        return os.path.join(self.cachePath, f"atlas{pageIndex}.png")
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                      *** class Sound ***
+#                                                           
 #---------------------------------------------------------------------------------------------------------------------
-class Sound:
-    """
-    A class to handle loading, playing, and stopping sounds using sounddevice and soundfile.
-    """
-    def __init__(self, filepath):
+    def pack(self, sizes):
         """
-        Load an audio file.
-        :param filepath: Path to the audio file (e.g., OGG, WAV).
+        Shelf-pack rectangles given as {filename: (width, height)}.
+        Returns ({filename: (page, x, y)}, [(pageWidth, pageHeight), ...]). Rectangles include the padding.
         """
-        self.filepath = filepath
-        self.data, self.samplerate = sf.read(filepath, dtype='float32')
-        self._is_playing = False
-        self._lock = threading.Lock()
+        placements = {}
+        pages = []
+        currentPage = None  # Index of the shared page being filled
+        used = {}  # Shared page index -> (width, height) actually used
+        shelfX = shelfY = shelfHeight = 0
+        pageSize = self.pageSize
+
+        # Tallest first keeps the shelves tight
+        for filename in sorted(sizes, key=lambda name: (-sizes[name][1], -sizes[name][0], name)):
+            width, height = sizes[filename]
+            if width > pageSize or height > pageSize:
+                # Too big to share a page: give it a page of its own
+                pages.append((width, height))
+                placements[filename] = (len(pages) - 1, 0, 0)
+                continue
+
+            if shelfX + width > pageSize:
+                shelfX = 0
+                shelfY += shelfHeight
+                shelfHeight = 0
+            if currentPage is None or shelfY + height > pageSize:
+                pages.append((pageSize, pageSize))
+                currentPage = len(pages) - 1
+                shelfX = shelfY = shelfHeight = 0
+
+            placements[filename] = (currentPage, shelfX, shelfY)
+            shelfX += width
+            shelfHeight = max(shelfHeight, height)
+            usedWidth, usedHeight = used.get(currentPage, (0, 0))
+            used[currentPage] = (max(usedWidth, shelfX), max(usedHeight, shelfY + height))
+
+        # Shrink shared pages to the smallest power of two that holds their images
+        for page, (usedWidth, usedHeight) in used.items():
+            pages[page] = (min(pageSize, 1 << (usedWidth - 1).bit_length()),
+                           min(pageSize, 1 << (usedHeight - 1).bit_length()))
+
+        return placements, pages
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                           play()
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _build(self):
+        """Pack the images, compose the page images and save both. Returns (layout, page pixel arrays)."""
+        padding = self.padding
+        images = {filename: _readImage(filename) for filename in self.filenames}
+        sizes = {filename: (data.shape[1] + 2 * padding, data.shape[0] + 2 * padding) for filename, data in images.items()}
+        placements, pageSizes = self.pack(sizes)
+
+        pageData = [np.zeros((height, width, 4), dtype=np.uint8) for width, height in pageSizes]
+        layout = {"version": self.version, "pageSize": self.pageSize, "padding": padding,
+                  "pages": pageSizes, "images": {}}
+        for filename, data in images.items():
+            page, x, y = placements[filename]
+            height, width = data.shape[:2]
+            padded = np.pad(data, ((padding, padding), (padding, padding), (0, 0)), mode="edge")
+            pageData[page][y:y + height + 2 * padding, x:x + width + 2 * padding] = padded
+            layout["images"][filename] = {"stamp": self._sourceStamp(filename), "page": page,
+                                          "x": x + padding, "y": y + padding, "width": width, "height": height}
+
+        os.makedirs(self.cachePath, exist_ok=True)
+        for pageIndex, data in enumerate(pageData):
+            Image.fromarray(data).save(self._pagePath(pageIndex))
+        # Written last, so a complete layout file means the pages are there too
+        with open(os.path.join(self.cachePath, "atlas.json"), "w") as file:
+            json.dump(layout, file, indent=1)
+
+        return layout, pageData
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def play(self):
+    def load(self, assets=None):
         """
-        Play the loaded audio file.
+        Build or load the atlas, upload its pages and register a Texture for every image.
+        With an AssetManager, saved pages are decoded in the background and every page is uploaded by its update();
+        the Textures are registered right away and are not ready until then.
         """
-        with self._lock:
-            if self._is_playing:
-                self.stop()  # Ensure no overlapping playback
+        global _texture_cache
+
+        pageData = None
+        self.layout = self._loadLayout()
+        if self.layout is None:
+            self.layout, pageData = self._build()
+        background = assets is not None and not _headless
+        if pageData is None and not _headless and not background:
+            pageData = [_readImage(self._pagePath(pageIndex)) for pageIndex in range(len(self.layout["pages"]))]
+
+        self.pages = []
+        for pageIndex, (width, height) in enumerate(self.layout["pages"]):
+            textureId = 0
+            if not _headless and not background:
+                textureId = _createGLTexture(pageData[pageIndex], width, height, GL_CLAMP_TO_EDGE)
+            self.pages.append(Texture(textureId, width, height, ready=not background))
+
+        views = [[] for _ in self.pages]  # Image textures per page, given the page's ID once it is uploaded
+        for filename, entry in self.layout["images"].items():
+            page = self.pages[entry["page"]]
+            uvRect = (entry["x"] / page.width, entry["y"] / page.height,
+                      (entry["x"] + entry["width"]) / page.width, (entry["y"] + entry["height"]) / page.height)
+            texture = Texture(page.texture_id, entry["width"], entry["height"], uvRect, ready=not background)
+            _texture_cache[filename] = texture
+            views[entry["page"]].append(texture)
+
+        if background:
+            for pageIndex, page in enumerate(self.pages):
+                assets._loadAtlasPage(page, views[pageIndex], self._pagePath(pageIndex),
+                                      None if pageData is None else pageData[pageIndex])
+        return self
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class SpriteBatch ***
+#---------------------------------------------------------------------------------------------------------------------
+class SpriteBatch:
+    """
+    Collects textured quads in world space and draws each run of quads that share a texture
+    with a single glDrawArrays call, instead of a glBegin/glEnd and matrix push/pop per sprite.
+    Runs are kept in scene order so overlapping sprites still blend correctly.
+    With headless=True no GL calls are made; the counters still report what a frame would cost.
+    With record=True nothing is drawn either; every run is kept in runs so it can be replayed later.
+    """
+    def __init__(self, headless=False, record=False):
+        self.headless = headless
+        self.runs = [] if record else None  # Recorded (texture, vertices, texCoords) or (None, obj, matrix) runs
+        self._texture = None  # Texture of the run being collected
+        self._boundTextureId = None
+        self._premultiplied = None  # Blend mode currently set, None if unknown
+        self._vertices = []  # Flat x, y floats of the current run
+        self._texCoords = []  # Flat u, v floats of the current run
+        self._arrays = []  # (vertices, texCoords) NumPy chunks of the current run, added by addQuads
+
+        # Statistics for the last frame
+        self.drawCalls = 0
+        self.textureBinds = 0
+        self.quads = 0
 
-            self._is_playing = True
-            threading.Thread(target=self._play_thread, daemon=True).start()
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def begin(self):
+        """Start a frame."""
+        self.drawCalls = 0
+        self.textureBinds = 0
+        self.quads = 0
+        self.invalidateState()
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                        _play_thread()
+#                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def _play_thread(self):
-        """
-        Internal method to handle playback in a separate thread.
-        """
-        try:
-            sd.play(self.data, samplerate=self.samplerate)
-            sd.wait()  # Wait until playback finishes
-        finally:
-            with self._lock:
-                self._is_playing = False
+    def end(self):
+        """Draw what is left and finish the frame."""
+        self.flush()
+        if not self.headless and self.runs is None:
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+            glDisableClientState(GL_VERTEX_ARRAY)
+            if self._premultiplied is not None:
+                glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)  # Back to the default set up by Game
+        self._texture = None
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                           stop()
+#                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def stop(self):
+    def invalidateState(self):
+        """Forget the GL state the batch has set, after something else may have changed it."""
+        self._boundTextureId = None
+        self._premultiplied = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _setTexture(self, texture):
+        # Textures packed in the same atlas page share an ID and can go in the same run
+        if self._texture is None or texture.texture_id != self._texture.texture_id:
+            self.flush()
+            self._texture = texture
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def addQuad(self, texture, matrix, left, top, right, bottom, u0, v0, u1, v1):
         """
-        Stop the currently playing sound.
+        Add the local rectangle (left, top, right, bottom), transformed by matrix, textured with (u0, v0) at the
+        top-left corner and (u1, v1) at the bottom-right corner.
         """
-        with self._lock:
-            if self._is_playing:
-                sd.stop()
-                self._is_playing = False
+        if not texture.ready:
+            return
+        self._setTexture(texture)
+        a, b, c, d, tx, ty = matrix
+        self._vertices.extend((
+            a * left + c * top + tx, b * left + d * top + ty,
+            a * right + c * top + tx, b * right + d * top + ty,
+            a * right + c * bottom + tx, b * right + d * bottom + ty,
+            a * left + c * bottom + tx, b * left + d * bottom + ty))
+        self._texCoords.extend((u0, v0, u1, v0, u1, v1, u0, v1))
+        self.quads += 1
 
 #---------------------------------------------------------------------------------------------------------------------
-#                                                           is_playing()
+#                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def is_playing(self):
+    def addQuads(self, texture, matrix, vertices, texCoords):
         """
-        Check if the sound is currently playing.
-        :return: Boolean indicating playback status.
+        Add many quads at once. vertices holds the local corners as an (n * 4, 2) array in
+        top-left, top-right, bottom-right, bottom-left order; texCoords has the same shape.
         """
-        with self._lock:
-            return self._is_playing
+        if len(vertices) == 0 or not texture.ready:
+            return
+        self._setTexture(texture)
+        if self._vertices:
+            self._arrays.append((np.array(self._vertices, dtype=np.float32).reshape(-1, 2),
+                                 np.array(self._texCoords, dtype=np.float32).reshape(-1, 2)))
+            self._vertices = []
+            self._texCoords = []
+
+        a, b, c, d, tx, ty = matrix
+        world = np.empty((len(vertices), 2), dtype=np.float32)
+        world[:, 0] = vertices[:, 0] * a + vertices[:, 1] * c + tx
+        world[:, 1] = vertices[:, 0] * b + vertices[:, 1] * d + ty
+        self._arrays.append((world, texCoords))
+        self.quads += len(vertices) // 4
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-class Input:
-    """Singleton class to handle keyboard and mouse input."""
-    _instance = None
-    _current_keys = set()
-    _previous_keys = set()
-    mouseX = 0
-    mouseY = 0
+    def flush(self):
+        """Draw the quads collected so far."""
+        if self._vertices:
+            self._arrays.append((np.array(self._vertices, dtype=np.float32).reshape(-1, 2),
+                                 np.array(self._texCoords, dtype=np.float32).reshape(-1, 2)))
+            self._vertices = []
+            self._texCoords = []
+        if not self._arrays:
+            return
+
+        if len(self._arrays) == 1:
+            vertices, texCoords = self._arrays[0]
+        else:
+            vertices = np.concatenate([chunk[0] for chunk in self._arrays])
+            texCoords = np.concatenate([chunk[1] for chunk in self._arrays])
+        self._arrays = []
+
+        if self.runs is not None:
+            self.runs.append((self._texture, vertices, texCoords))
+            return
+
+        textureId = self._texture.texture_id
+        if textureId != self._boundTextureId:
+            self._boundTextureId = textureId
+            self.textureBinds += 1
+            if not self.headless:
+                glBindTexture(GL_TEXTURE_2D, textureId)
+
+        self.drawCalls += 1
+        if not self.headless:
+            premultiplied = self._texture.premultipliedAlpha
+            if premultiplied != self._premultiplied:
+                self._premultiplied = premultiplied
+                if premultiplied:
+                    glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+                else:
+                    # Alpha accumulates correctly when drawing into a RenderTexture; same colors as the default
+                    glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+            # Enabled per draw, since rendering a nested RenderTexture in between may have disabled them
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glVertexPointer(2, GL_FLOAT, 0, np.ascontiguousarray(vertices, dtype=np.float32))
+            glTexCoordPointer(2, GL_FLOAT, 0, np.ascontiguousarray(texCoords, dtype=np.float32))
+            glDrawArrays(GL_QUADS, 0, len(vertices))
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(Input, cls).__new__(cls)
-        return cls._instance
+    def drawImmediate(self, obj, matrix):
+        """Draw an object that only has an immediate mode draw() at the given world matrix."""
+        self.flush()
+        self._texture = None
+        if self.runs is not None:
+            self.runs.append((None, obj, matrix))
+            return
+        self.invalidateState()  # draw() may bind any texture
+        self.drawCalls += 1
+        if not self.headless:
+            a, b, c, d, tx, ty = matrix
+            glPushMatrix()
+            glMultMatrixf((a, b, 0, 0, c, d, 0, 0, 0, 0, 1, 0, tx, ty, 0, 1))
+            obj.draw()
+            glPopMatrix()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class RenderTexture ***
+#---------------------------------------------------------------------------------------------------------------------
+class RenderTexture:
+    """An offscreen framebuffer with a texture attached, to render into a Texture instead of the window."""
+    _maxSize = None  # GL_MAX_TEXTURE_SIZE, queried once
+
+    def __init__(self, width, height):
+        tex_id = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+
+        self.framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, tex_id, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+
+        self.texture = Texture(tex_id, width, height, premultipliedAlpha=True)
+        self._viewport = None  # GL state found by begin(), put back by end()
+        self._clearColor = None
+        self._framebuffer = 0
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
     @classmethod
-    def update(cls, window):
+    def maxSize(cls):
+        """Return the largest width or height a RenderTexture can have."""
+        if cls._maxSize is None:
+            cls._maxSize = int(glGetIntegerv(GL_MAX_TEXTURE_SIZE))
+        return cls._maxSize
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def begin(self, left, top, right, bottom):
         """
-        Update the current key states and mouse position.
-        Should be called once per frame.
+        Start rendering the area (left, top, right, bottom) into the texture, cleared to transparent.
+        The top-left of the area ends up at texture coordinate (0, 0), like an image loaded from a file.
         """
-        # Update mouse position
-        cls.mouseX, cls.mouseY = glfw.get_cursor_pos(window)
+        self._viewport = glGetIntegerv(GL_VIEWPORT)
+        self._clearColor = glGetFloatv(GL_COLOR_CLEAR_VALUE)
+        self._framebuffer = int(glGetIntegerv(GL_FRAMEBUFFER_BINDING))  # Not 0 when nested in another RenderTexture
+        glBindFramebuffer(GL_FRAMEBUFFER, self.framebuffer)
+        glViewport(0, 0, self.texture.width, self.texture.height)
 
-        # Swap key states
-        cls._previous_keys = cls._current_keys.copy()
-        cls._current_keys.clear()
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        gluOrtho2D(left, right, top, bottom)  # Framebuffer row 0 is the top of the area
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
 
-        # Check which keys are pressed this frame
-        for key in range(glfw.KEY_SPACE, glfw.KEY_LAST):
-            if glfw.get_key(window, key) == glfw.PRESS:
-                cls._current_keys.add(key)
+        glClearColor(0.0, 0.0, 0.0, 0.0)
+        glClear(GL_COLOR_BUFFER_BIT)
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    @classmethod
-    def getKey(cls, key_name):
-        """Return True if the specified key is being held down."""
-        key = cls._key_to_glfw_key(key_name)
-        return key in cls._current_keys
+    def end(self):
+        """Go back to rendering where begin() found it, the window or another framebuffer."""
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopMatrix()
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer)
+        glViewport(*self._viewport)
+        glClearColor(*self._clearColor)
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    @classmethod
-    def getKeyDown(cls, key_name):
-        """Return True if the specified key was pressed this frame."""
-        key = cls._key_to_glfw_key(key_name)
-        return key in cls._current_keys and key not in cls._previous_keys
+    def delete(self):
+        """Free the framebuffer and texture."""
+        glDeleteFramebuffers(1, [self.framebuffer])
+        glDeleteTextures([self.texture.texture_id])
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    @classmethod
-    def getKeyUp(cls, key_name):
-        """Return True if the specified key was released this frame."""
-        key = cls._key_to_glfw_key(key_name)
-        return key not in cls._current_keys and key in cls._previous_keys
+class GameObject:
+    """
+    Base class for all game objects.
+    Handles position, rotation, scale, matrix transformations, and parent-child relationships.
+    """
+    def __init__(self, x=0, y=0, rotation=0, scaleX=1, scaleY=1):
+        self._collisionManager = None  # CollisionManager this object is registered with, if any
+        self._x = x
+        self._y = y
+        self._rotation = rotation
+        self._scaleX = scaleX
+        self._scaleY = scaleY
+        self._localMatrix = None  # Cached makeMatrix() of the transform above
+        self._localDirty = True
+        self._worldMatrix = None  # Cached parent world matrix * local matrix
+        self._worldDirty = True  # Invariant: if this is True, it is True for all descendants too
+        self.children = []  # List to store child GameObjects
+        self.parent = None  # Reference to the parent GameObject
+        self._game = None  # Cached reference to the Game object
+
+        # Render-to-texture caching of this subtree, see cacheAsBitmap
+        self._cacheAsBitmap = False
+        self._bitmapDirty = True
+        self._bitmap = None  # Texture holding the subtree, None to render it normally
+        self._bitmapBounds = None  # Local (left, top, right, bottom) covered by the bitmap
+        self._renderTexture = None
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    @staticmethod
-    def _key_to_glfw_key(key_name):
-        """
-        Convert a string key name to a GLFW key constant.
-        For example: "w" -> glfw.KEY_W
-        """
-        if len(key_name) == 1 and key_name.isalpha():
-            return getattr(glfw, f"KEY_{key_name.upper()}")
-        elif key_name == "space":
-            return glfw.KEY_SPACE
-        elif key_name == "esc":
-            return glfw.KEY_ESCAPE
-        else:
-            raise ValueError(f"Unknown key name: {key_name}")
+    def _transformChanged(self):
+        """Called whenever x, y, rotation or scale changes."""
+        self._localDirty = True
+        self._invalidateWorld()
 
-# Texture cache to store loaded textures
-_texture_cache = {}
+        # Moving this object changes the bitmaps cached by its ancestors, but not its own
+        node = self.parent
+        while node is not None:
+            if node._cacheAsBitmap:
+                node._bitmapDirty = True
+            node = node.parent
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-class Texture:
-    """Class to hold texture data: OpenGL ID, width, and height."""
-    def __init__(self, texture_id, width, height):
-        self.texture_id = texture_id
-        self.width = width
-        self.height = height
+    def _invalidateWorld(self):
+        """Mark the world matrix of this object and all its descendants as out of date."""
+        if self._worldDirty:
+            return  # Descendants are already dirty, and the CollisionManager already knows
+        self._worldDirty = True
+        if self._collisionManager is not None:
+            self._collisionManager._markMoved(self)
+        for child in self.children:
+            child._invalidateWorld()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-def loadTexture(filename):
-    """
-    Load a texture from a file.
-    If the texture has already been loaded, return the cached version.
-    """
-    global _texture_cache
-
-    # Return cached texture if it exists
-    if filename in _texture_cache:
-        return _texture_cache[filename]
+    def getLocalMatrix(self):
+        """Return the cached affine matrix of this object's own translation, rotation and scale."""
+        if self._localDirty:
+            self._localMatrix = makeMatrix(self._x, self._y, self._rotation, self._scaleX, self._scaleY)
+            self._localDirty = False
+        return self._localMatrix
 
-    # Load texture image
-    image = Image.open(filename).convert("RGBA")  # Ensure RGBA format
-    img_data = np.array(image)
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getWorldMatrix(self):
+        """
+        Return the cached affine matrix from this object's local space to world space, including all parents.
+        It is only recomputed after this object or one of its ancestors has moved.
+        """
+        if self._worldDirty:
+            local = self.getLocalMatrix()
+            self._worldMatrix = local if self.parent is None else multiplyMatrix(self.parent.getWorldMatrix(), local)
+            self._worldDirty = False
+        return self._worldMatrix
 
-    # Generate OpenGL texture ID
-    tex_id = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, tex_id)
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def localToWorld(self, x, y):
+        """Transform a point from this object's local space to world space."""
+        a, b, c, d, tx, ty = self.getWorldMatrix()
+        return a * x + c * y + tx, b * x + d * y + ty
 
-    # Set texture parameters
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def worldToLocal(self, x, y):
+        """Transform a point from world space to this object's local space. Returns None if the object is scaled to zero."""
+        inverse = invertMatrix(self.getWorldMatrix())
+        if inverse is None:
+            return None
+        a, b, c, d, tx, ty = inverse
+        return a * x + c * y + tx, b * x + d * y + ty
 
-    # Upload texture data to OpenGL
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width, image.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def invalidateCache(self):
+        """
+        Mark the cached bitmaps of this object and its ancestors as out of date.
+        Moves and addChild/removeChild do this automatically; call it after changing what an object draws
+        in another way, like setting an AnimSprite's currentFrame.
+        """
+        node = self
+        while node is not None:
+            if node._cacheAsBitmap:
+                node._bitmapDirty = True
+            node = node.parent
 
-    # Create a Texture object and cache it
-    texture = Texture(tex_id, image.width, image.height)
-    _texture_cache[filename] = texture
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    @property
+    def cacheAsBitmap(self):
+        """
+        When True, this object and its children are rendered once into an offscreen texture, which is then
+        drawn as a single quad until something in the subtree changes. Meant for static content like tiles.
+        The bitmap is rendered at one pixel per local unit, so it gets resampled if the subtree is scaled.
+        """
+        return self._cacheAsBitmap
 
-    return texture
+    @cacheAsBitmap.setter
+    def cacheAsBitmap(self, value):
+        self._cacheAsBitmap = value
+        self._bitmapDirty = True
+        if not value:
+            self._releaseBitmap()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-class GameObject:
-    """
-    Base class for all game objects.
-    Handles position, rotation, scale, matrix transformations, and parent-child relationships.
-    """
-    def __init__(self, x=0, y=0, rotation=0, scaleX=1, scaleY=1):
-        self.x = x
-        self.y = y
-        self.rotation = rotation
-        self.scaleX = scaleX
-        self.scaleY = scaleY
-        self.children = []  # List to store child GameObjects
-        self.parent = None  # Reference to the parent GameObject
-        self._game = None  # Cached reference to the Game object
+    @property
+    def x(self):
+        return self._x
+
+    @x.setter
+    def x(self, value):
+        self._x = value
+        self._transformChanged()
+
+    @property
+    def y(self):
+        return self._y
+
+    @y.setter
+    def y(self, value):
+        self._y = value
+        self._transformChanged()
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self._rotation = value
+        self._transformChanged()
+
+    @property
+    def scaleX(self):
+        return self._scaleX
+
+    @scaleX.setter
+    def scaleX(self, value):
+        self._scaleX = value
+        self._transformChanged()
+
+    @property
+    def scaleY(self):
+        return self._scaleY
+
+    @scaleY.setter
+    def scaleY(self, value):
+        self._scaleY = value
+        self._transformChanged()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -369,7 +2393,10 @@ class GameObject:
         if child not in self.children:
             self.children.append(child)
             child.parent = self
+            child._worldDirty = False  # Force the propagation below: the parent changed
+            child._invalidateWorld()
             self._invalidateGameCache()  # Invalidate cached game reference
+            self.invalidateCache()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -379,7 +2406,11 @@ class GameObject:
         if child in self.children:
             self.children.remove(child)
             child.parent = None
+            child._worldDirty = False  # Force the propagation below: the parent changed
+            child._invalidateWorld()
+            child._releaseBitmaps()  # Its GL objects would live as long as the detached subtree otherwise
             self._invalidateGameCache()  # Invalidate cached game reference
+            self.invalidateCache()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -388,29 +2419,158 @@ class GameObject:
         """Remove all children from this GameObject."""
         for child in self.children:
             child.parent = None  # Clear parent reference for each child
+            child._worldDirty = False  # Force the propagation below: the parent changed
+            child._invalidateWorld()
+            child._releaseBitmaps()
         self.children = []  # Clear the children list
         self._invalidateGameCache()  # Invalidate cached game reference
+        self.invalidateCache()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def render(self):
+        """Render this GameObject and its children."""
+        glPushMatrix()
+
+        # Apply transformations, from the cached local matrix
+        a, b, c, d, tx, ty = self.getLocalMatrix()
+        glMultMatrixf((a, b, 0, 0, c, d, 0, 0, 0, 0, 1, 0, tx, ty, 0, 1))
+
+        if self._cacheAsBitmap:
+            if self._bitmapDirty:
+                self._updateBitmap(False)
+            if self._bitmap is not None:
+                self._drawBitmap()
+                glPopMatrix()
+                return
+
+        # Draw self
+        self.draw()
+
+        # Render children
+        for child in self.children:
+            child.render()
+
+        glPopMatrix()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def renderBatched(self, batch, parentMatrix=None):
+        """
+        Render this GameObject and its children into a SpriteBatch, using the cached world matrices.
+        With a parentMatrix the subtree is rendered relative to that matrix instead of to the world.
+        """
+        if parentMatrix is None:
+            matrix = self.getWorldMatrix()
+        else:
+            matrix = multiplyMatrix(parentMatrix, self.getLocalMatrix())
+
+        if self._cacheAsBitmap:
+            if self._bitmapDirty:
+                batch.flush()
+                self._updateBitmap(batch.headless)
+                batch.invalidateState()
+            if self._bitmap is not None:
+                batch.addQuad(self._bitmap, matrix, *self._bitmapBounds, 0, 0, 1, 1)
+                return
+
+        self.drawBatched(batch, matrix)
+        childMatrix = None if parentMatrix is None else matrix
+        for child in self.children:
+            child.renderBatched(batch, childMatrix)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _updateBitmap(self, headless):
+        """Render this subtree into its RenderTexture. Leaves _bitmap None if it can't be cached."""
+        self._bitmapDirty = False
+        self._bitmap = None
+
+        # Record the subtree in local space first, to find the area it covers
+        recorder = SpriteBatch(headless, record=True)
+        recorder.begin()
+        self.drawBatched(recorder, IDENTITY_MATRIX)
+        for child in self.children:
+            child.renderBatched(recorder, IDENTITY_MATRIX)
+        recorder.end()
+
+        # Objects drawn in immediate mode have unknown bounds, so they can't be cached
+        runs = recorder.runs
+        if not runs or any(texture is None for texture, vertices, texCoords in runs):
+            self._releaseBitmap()
+            return
+
+        vertices = np.concatenate([run[1] for run in runs])
+        left, top = np.floor(vertices.min(axis=0))
+        right, bottom = np.ceil(vertices.max(axis=0))
+        width = int(right - left)
+        height = int(bottom - top)
+        self._bitmapBounds = (float(left), float(top), float(right), float(bottom))
+
+        if headless:
+            self._bitmap = Texture(None, width, height, premultipliedAlpha=True)
+            return
+        if width <= 0 or height <= 0 or max(width, height) > RenderTexture.maxSize():
+            self._releaseBitmap()
+            return
+
+        renderTexture = self._renderTexture
+        if renderTexture is None or (renderTexture.texture.width, renderTexture.texture.height) != (width, height):
+            self._releaseBitmap()
+            renderTexture = self._renderTexture = RenderTexture(width, height)
+
+        renderTexture.begin(*self._bitmapBounds)
+        replay = SpriteBatch()
+        replay.begin()
+        for texture, vertices, texCoords in runs:
+            replay.addQuads(texture, IDENTITY_MATRIX, vertices, texCoords)
+        replay.end()
+        renderTexture.end()
+        self._bitmap = renderTexture.texture
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _drawBitmap(self):
+        """Draw the cached bitmap in immediate mode, in local space."""
+        left, top, right, bottom = self._bitmapBounds
+        glBindTexture(GL_TEXTURE_2D, self._bitmap.texture_id)
+        glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)  # The bitmap holds premultiplied colors
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(left, top)
+        glTexCoord2f(1, 0); glVertex2f(right, top)
+        glTexCoord2f(1, 1); glVertex2f(right, bottom)
+        glTexCoord2f(0, 1); glVertex2f(left, bottom)
+        glEnd()
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def render(self):
-        """Render this GameObject and its children."""
-        glPushMatrix()
-
-        # Apply transformations
-        glTranslatef(self.x, self.y, 0)
-        glRotatef(self.rotation, 0, 0, 1)
-        glScalef(self.scaleX, self.scaleY, 1)
-
-        # Draw self
-        self.draw()
-
-        # Render children
+    def _releaseBitmap(self):
+        """Free the RenderTexture of the cached bitmap."""
+        if self._renderTexture is not None:
+            self._renderTexture.delete()
+            self._renderTexture = None
+        self._bitmap = None
+
+    def _texturesUploaded(self, textures):
+        """Invalidate the cached bitmaps holding objects of this subtree that draw one of textures."""
+        if getattr(self, "texture", None) in textures:
+            self.invalidateCache()
         for child in self.children:
-            child.render()
+            child._texturesUploaded(textures)
 
-        glPopMatrix()
+    def _releaseBitmaps(self):
+        """Free the cached bitmaps of this subtree. They are rendered again if it is added back to the scene."""
+        if self._cacheAsBitmap:
+            self._releaseBitmap()
+            self._bitmapDirty = True
+        for child in self.children:
+            child._releaseBitmaps()
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -418,6 +2578,17 @@ class GameObject:
     def draw(self):
         """To be implemented by subclasses."""
         pass
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def drawBatched(self, batch, matrix):
+        """
+        Add this object's quads to the SpriteBatch. Subclasses that override draw() should override this too;
+        by default a custom draw() is run in immediate mode, which interrupts the batch.
+        """
+        if type(self).draw is not GameObject.draw:
+            batch.drawImmediate(self, matrix)
         
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -432,6 +2603,43 @@ class GameObject:
     def hitTestPoint(self, x, y):
         """Default hitTestPoint method. Always returns False."""
         return False
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getBounds(self):
+        """
+        Return the world space bounding box as (left, top, right, bottom), used by the CollisionManager broad phase.
+        None means unbounded: the object is tested against every query.
+        """
+        return None
+
+    def getBroadPhaseBounds(self):
+        """
+        The area the CollisionManager buckets the object in; by default getBounds(). Objects that do their own
+        sweeps (getBounds() None) but still cover a known area can return it, so far away queries skip them.
+        """
+        return self.getBounds()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getFreeSteps(self, bounds, stepX, stepY, maxSteps):
+        """
+        Used by CollisionManager.getFreeSteps for objects without bounds: return how many steps the box
+        (left, top, right, bottom) can take before this object could hit it. The default of 0 is always safe.
+        """
+        return 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getClearSteps(self, other, stepX, stepY, impact):
+        """
+        Used by CollisionManager.resolveOverlap for objects without bounds: return how many steps other
+        can move while this object keeps blocking it. The default of 1 is always safe.
+        """
+        return 1
         
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -460,21 +2668,38 @@ class Sprite(GameObject):
         # Origin point (pivot for transformations)
         self.originX = originX if originX is not None else self.width // 2
         self.originY = originY if originY is not None else self.height // 2
+
+        self._cornersKey = None  # (world matrix, width, height, originX, originY) the cached corners belong to
+        self._corners = None
         
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
     def draw(self):
         """Draw the textured quad."""
+        if not self.texture.ready:
+            return
         glTranslatef(-self.originX, -self.originY, 0)
         glBindTexture(GL_TEXTURE_2D, self.texture.texture_id)
 
+        left, top, right, bottom = self.texture.uvRect
         glBegin(GL_QUADS)
-        glTexCoord2f(0, 0); glVertex2f(0, 0)
-        glTexCoord2f(1, 0); glVertex2f(self.texture.width, 0)
-        glTexCoord2f(1, 1); glVertex2f(self.texture.width, self.texture.height)
-        glTexCoord2f(0, 1); glVertex2f(0, self.texture.height)
+        glTexCoord2f(left, top); glVertex2f(0, 0)
+        glTexCoord2f(right, top); glVertex2f(self.texture.width, 0)
+        glTexCoord2f(right, bottom); glVertex2f(self.texture.width, self.texture.height)
+        glTexCoord2f(left, bottom); glVertex2f(0, self.texture.height)
         glEnd()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def drawBatched(self, batch, matrix):
+        """Add the textured quad to the SpriteBatch. A subclass's own draw() is run in immediate mode instead."""
+        if type(self).draw is not Sprite.draw:
+            batch.drawImmediate(self, matrix)
+            return
+        batch.addQuad(self.texture, matrix, -self.originX, -self.originY,
+                      self.texture.width - self.originX, self.texture.height - self.originY, *self.texture.uvRect)
         
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -482,10 +2707,12 @@ class Sprite(GameObject):
     def getCorners(self):
         """
         Calculate the 4 corners of the sprite in world space.
-        Returns a list of (x, y) tuples.
+        Returns a list of (x, y) tuples, cached until the sprite moves or changes size; don't modify it.
         """
-        hw = self.width / 2
-        hh = self.height / 2
+        matrix = self._worldMatrix if not self._worldDirty else self.getWorldMatrix()
+        key = (matrix, self.width, self.height, self.originX, self.originY)
+        if key == self._cornersKey:
+            return self._corners
 
         # Local corners relative to the origin
         local_corners = [
@@ -495,15 +2722,35 @@ class Sprite(GameObject):
             (-self.originX, self.height - 1 - self.originY)   # Bottom-left
         ]
 
-        # Transform corners to world space
-        world_corners = [transform_point(x, y, self.x, self.y, self.rotation, self.scaleX, self.scaleY)
-                         for x, y in local_corners]
+        # Transform corners to world space with the cached world matrix
+        a, b, c, d, tx, ty = matrix
+        world_corners = [(a * x + c * y + tx, b * x + d * y + ty) for x, y in local_corners]
+        self._cornersKey = key
+        self._corners = world_corners
         return world_corners        
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def hitTest(self, other):
+    def getBounds(self):
+        """Return the world space axis aligned bounding box of the sprite as (left, top, right, bottom)."""
+        left = -self.originX
+        top = -self.originY
+        a, b, c, d, tx, ty = self._worldMatrix if not self._worldDirty else self.getWorldMatrix()
+        if a == 1 and b == 0 and c == 0 and d == 1:
+            return (tx + left, ty + top, tx + left + self.width, ty + top + self.height)
+
+        corners = [(a * x + c * y + tx, b * x + d * y + ty)
+                   for x, y in ((left, top), (left + self.width, top),
+                                (left + self.width, top + self.height), (left, top + self.height))]
+        xs = [corner[0] for corner in corners]
+        ys = [corner[1] for corner in corners]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def hitTestOBB(self, other):
         """
         Test for collision with another Sprite using OBB collision detection.
         Returns True if colliding, False otherwise.
@@ -523,6 +2770,31 @@ class Sprite(GameObject):
             if not self._overlap_on_axis(axis, corners1, corners2):
                 return False  # Separating axis found, no collision
         return True  # No separating axis, collision detected
+
+    hitTest = hitTestOBB
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def hitTestMany(self, others):
+        """
+        OBB test against many Sprites at once with NumPy. Returns a boolean array with the same
+        result as hitTestOBB for each of the others.
+        """
+        if len(others) == 0:
+            return np.zeros(0, dtype=bool)
+
+        # Build all corners from the cached world matrices in one go, with the same arithmetic as getCorners
+        params = np.array([other.getWorldMatrix() + (-other.originX, -other.originY,
+                                                     other.width - 1 - other.originX, other.height - 1 - other.originY)
+                           for other in others], dtype=np.float64)
+        a, b, c, d, tx, ty, left, top, right, bottom = params.T
+        localX = np.stack((left, right, right, left), axis=1)
+        localY = np.stack((top, top, bottom, bottom), axis=1)
+        corners = np.empty((len(others), 4, 2), dtype=np.float64)
+        corners[:, :, 0] = a[:, None] * localX + c[:, None] * localY + tx[:, None]
+        corners[:, :, 1] = b[:, None] * localX + d[:, None] * localY + ty[:, None]
+        return hitTestOBBMany(self.getCorners(), corners)
         
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -530,28 +2802,13 @@ class Sprite(GameObject):
     def hitTestPoint(self, x, y):
         """
         Check if a point (x, y) in screen space intersects this Sprite.
-        Considers the Sprite's position, rotation, and scale.
+        Considers the Sprite's position, rotation, and scale, and those of its parents.
         """
-        # Step 1: Translate point to local space
-        # Undo the transformations: Translate -> Rotate -> Scale (in reverse order)
-
-        # Move the point relative to the sprite's position
-        localX = x - self.x
-        localY = y - self.y
-
-        # Undo rotation
-        angle_rad = -math.radians(self.rotation)  # Negative because we reverse rotation
-        cos_theta = math.cos(angle_rad)
-        sin_theta = math.sin(angle_rad)
-
-        rotatedX = localX * cos_theta - localY * sin_theta
-        rotatedY = localX * sin_theta + localY * cos_theta
-
-        # Undo scaling
-        if self.scaleX != 0:
-            rotatedX /= self.scaleX
-        if self.scaleY != 0:
-            rotatedY /= self.scaleY
+        # Step 1: Transform the point to local space with the inverse of the cached world matrix
+        local = self.worldToLocal(x, y)
+        if local is None:
+            return False
+        rotatedX, rotatedY = local
 
         # Step 2: Account for origin offset and check bounds
         # The sprite's rectangle is defined by the top-left (0, 0) to (width, height)
@@ -626,7 +2883,7 @@ class AnimSprite(Sprite):
 #---------------------------------------------------------------------------------------------------------------------
     def draw(self):
         """Override the draw method to render a specific frame of the sliced texture."""
-        if 0 <= self.currentFrame < self.maxFrames:
+        if 0 <= self.currentFrame < self.maxFrames and self.texture.ready:
             # Calculate the column and row for the current frame
             col = self.currentFrame % self.columns
             row = self.currentFrame // self.columns
@@ -636,6 +2893,7 @@ class AnimSprite(Sprite):
             right = (col + 1) * self.frameWidth / self.texture.width
             top = ((row + 1) * self.frameHeight / self.texture.height)
             bottom = (row * self.frameHeight / self.texture.height)
+            left, bottom, right, top = self.texture.mapUV(left, bottom, right, top)
 
             # Adjust for the origin offset
             glTranslatef(-self.originX, -self.originY, 0)
@@ -655,6 +2913,27 @@ class AnimSprite(Sprite):
             glTexCoord2f(left, top)
             glVertex2f(0, self.frameHeight)  # Bottom-left
             glEnd()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def drawBatched(self, batch, matrix):
+        """Add the current frame to the SpriteBatch. A subclass's own draw() is run in immediate mode instead."""
+        if type(self).draw is not AnimSprite.draw:
+            batch.drawImmediate(self, matrix)
+            return
+        if 0 <= self.currentFrame < self.maxFrames:
+            col = self.currentFrame % self.columns
+            row = self.currentFrame // self.columns
+
+            left = col * self.frameWidth / self.texture.width
+            right = (col + 1) * self.frameWidth / self.texture.width
+            top = ((row + 1) * self.frameHeight / self.texture.height)
+            bottom = (row * self.frameHeight / self.texture.height)
+            left, bottom, right, top = self.texture.mapUV(left, bottom, right, top)
+
+            batch.addQuad(self.texture, matrix, -self.originX, -self.originY,
+                          self.frameWidth - self.originX, self.frameHeight - self.originY, left, bottom, right, top)
             
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -671,8 +2950,8 @@ class Text(AnimSprite):
         self.value = text    # Text to render
         self.charWidth = self.texture.width / 18
         self.charHeight = self.texture.height / 6
-        self.width = self.charWidth * len(text)
-        self.height = self.charHeight
+        self._glyphs = None  # (vertices, texCoords) of the glyph quads, rebuilt when the text changes
+        self.width, self.height = self.measure(text)
         self.originX = originX if originX is not None else self.width // 2
         self.originY = originY if originY is not None else self.height // 2
 
@@ -687,9 +2966,70 @@ class Text(AnimSprite):
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
     @text.setter
-    def text(self, charID):
-        self.width = self.charWidth * len(new_text)
-        self.value = new_text
+    def text(self, new_text):
+        if new_text != self.value:
+            self.value = new_text
+            self.width, self.height = self.measure(new_text)
+            self._glyphs = None
+            self.invalidateCache()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def measure(self, text=None):
+        """Return the (width, height) the text takes up without drawing it. Lines are separated by newlines."""
+        lines = (self.value if text is None else text).split("\n")
+        return self.charWidth * max(len(line) for line in lines), self.charHeight * len(lines)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _buildGlyphs(self):
+        """Lay out the glyph quads of the text, relative to its top-left corner, with NumPy."""
+        lefts = []
+        tops = []
+        charIDs = []
+        for lineIndex, line in enumerate(self.value.split("\n")):
+            left = 0
+            for char in line:
+                ascii_value = ord(char)
+                if 32 <= ascii_value <= 126:
+                    lefts.append(left)
+                    tops.append(lineIndex * self.charHeight)
+                    charIDs.append(ascii_value - 32)
+                    left += self.charWidth
+
+        lefts = np.array(lefts, dtype=np.float32)
+        tops = np.array(tops, dtype=np.float32)
+        charIDs = np.array(charIDs, dtype=np.int32)
+        vertices = np.empty((len(charIDs), 4, 2), dtype=np.float32)
+        vertices[:, 0, 0] = lefts
+        vertices[:, 0, 1] = tops
+        vertices[:, 1, 0] = lefts + self.frameWidth
+        vertices[:, 1, 1] = tops
+        vertices[:, 2, 0] = lefts + self.frameWidth
+        vertices[:, 2, 1] = tops + self.frameHeight
+        vertices[:, 3, 0] = lefts
+        vertices[:, 3, 1] = tops + self.frameHeight
+
+        # Same frame coordinates as drawCharacter, mapped into the texture's (atlas) rectangle
+        u0, v0, u1, v1 = self.texture.uvRect
+        uScale = (u1 - u0) * self.frameWidth / self.texture.width
+        vScale = (v1 - v0) * self.frameHeight / self.texture.height
+        uvLefts = u0 + (charIDs % self.columns) * uScale
+        uvBottoms = v0 + (charIDs // self.columns) * vScale
+        texCoords = np.empty((len(charIDs), 4, 2), dtype=np.float32)
+        texCoords[:, 0, 0] = uvLefts
+        texCoords[:, 0, 1] = uvBottoms
+        texCoords[:, 1, 0] = uvLefts + uScale
+        texCoords[:, 1, 1] = uvBottoms
+        texCoords[:, 2, 0] = uvLefts + uScale
+        texCoords[:, 2, 1] = uvBottoms + vScale
+        texCoords[:, 3, 0] = uvLefts
+        texCoords[:, 3, 1] = uvBottoms + vScale
+
+        self._glyphs = (vertices.reshape(-1, 2), texCoords.reshape(-1, 2))
+        return self._glyphs
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -706,6 +3046,7 @@ class Text(AnimSprite):
             right = (col + 1) * self.frameWidth / self.texture.width
             top = ((row + 1) * self.frameHeight / self.texture.height)
             bottom = (row * self.frameHeight / self.texture.height)
+            left, bottom, right, top = self.texture.mapUV(left, bottom, right, top)
 
             # Render the textured quad using the calculated texture coordinates
             glBegin(GL_QUADS)
@@ -722,22 +3063,484 @@ class Text(AnimSprite):
             glVertex2f(0, self.frameHeight)  # Bottom-left
             glEnd()
             
-            glTranslatef(14, 0, 0)
+            glTranslatef(self.charWidth, 0, 0)
             
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
     def draw(self):
+        """Draw all glyphs with a single glDrawArrays call."""
+        vertices, texCoords = self._glyphs if self._glyphs is not None else self._buildGlyphs()
+        if len(vertices) == 0 or not self.texture.ready:
+            return
+
         # Adjust for the origin offset
         glTranslatef(-self.originX, -self.originY, 0)
         glBindTexture(GL_TEXTURE_2D, self.texture.texture_id)
-                
-        for char in self.value:
-            # Map character to its ASCII value
-            ascii_value = ord(char)
-            if 32 <= ascii_value <= 126:
-                char_index = ascii_value - 32
-                self.drawCharacter(char_index)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 0, vertices)
+        glTexCoordPointer(2, GL_FLOAT, 0, texCoords)
+        glDrawArrays(GL_QUADS, 0, len(vertices))
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def drawBatched(self, batch, matrix):
+        """Add the cached glyph quads to the SpriteBatch. A subclass's own draw() is run in immediate mode instead."""
+        if type(self).draw is not Text.draw:
+            batch.drawImmediate(self, matrix)
+            return
+        vertices, texCoords = self._glyphs if self._glyphs is not None else self._buildGlyphs()
+        matrix = multiplyMatrix(matrix, (1.0, 0.0, 0.0, 1.0, -self.originX, -self.originY))
+        batch.addQuads(self.texture, matrix, vertices, texCoords)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class TileMap ***
+#---------------------------------------------------------------------------------------------------------------------
+class TileMap(GameObject):
+    """
+    A static grid of tiles stored as one byte per cell (0 = empty) instead of one Sprite per tile.
+    The map registers with the CollisionManager as a single collidable and finds the cells overlapping
+    a bounding box by index arithmetic. Collision is axis aligned; rotation and scale only affect drawing.
+    """
+    def __init__(self, texture_path, columns, rows, tileSize=32, x=0, y=0, originX=None, originY=None):
+        super().__init__(x, y)
+        self.texture = loadTexture(texture_path)
+        self.columns = columns
+        self.rows = rows
+        self.tileSize = tileSize
+        self.width = columns * tileSize
+        self.height = rows * tileSize
+        self.cells = bytearray(columns * rows)  # Row-major cell types
+        self._quadCache = None  # (vertices, texCoords) of the non-empty cells, rebuilt after setCell
+
+        # Offset of the map's top-left corner; defaults to half a tile, matching a centered Sprite per cell
+        self.originX = originX if originX is not None else tileSize // 2
+        self.originY = originY if originY is not None else tileSize // 2
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getCell(self, column, row):
+        """Return the cell type at (column, row), or 0 outside the map."""
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.cells[row * self.columns + column]
+        return 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def setCell(self, column, row, value):
+        """Set the cell type at (column, row)."""
+        self.cells[row * self.columns + column] = value
+        self._quadCache = None
+        self.invalidateCache()
+        if self._collisionManager is not None:
+            self._collisionManager.wakeSleepers(self)  # Bodies resting on the map may have lost their support
+
+    def setCells(self, grid):
+        """Set every cell at once from a (rows, columns) array of cell types."""
+        np.frombuffer(self.cells, dtype=np.uint8)[:] = np.asarray(grid, dtype=np.uint8).reshape(-1)
+        self._quadCache = None
+        self.invalidateCache()
+        if self._collisionManager is not None:
+            self._collisionManager.wakeSleepers(self)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _getMapCorner(self):
+        """Return the world position of the map's top-left corner. Only the translation of the map is used."""
+        matrix = self._worldMatrix if not self._worldDirty else self.getWorldMatrix()
+        return matrix[4] - self.originX, matrix[5] - self.originY
+
+    def getBroadPhaseBounds(self):
+        """The map's rectangle, so the CollisionManager only tests the map against queries that reach it."""
+        left, top = self._getMapCorner()
+        return (left, top, left + self.width, top + self.height)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getCellsInRect(self, left, top, right, bottom):
+        """
+        Return (column, row, cellType) for every non-empty cell overlapping the world space rectangle,
+        in row-major order. Right and bottom are exclusive.
+        """
+        mapLeft, mapTop = self._getMapCorner()
+        tileSize = self.tileSize
+
+        firstColumn = max(0, math.floor((left - mapLeft) / tileSize))
+        lastColumn = min(self.columns - 1, math.ceil((right - mapLeft) / tileSize) - 1)
+        firstRow = max(0, math.floor((top - mapTop) / tileSize))
+        lastRow = min(self.rows - 1, math.ceil((bottom - mapTop) / tileSize) - 1)
+
+        found = []
+        cells = self.cells
+        for row in range(firstRow, lastRow + 1):
+            offset = row * self.columns
+            for column in range(firstColumn, lastColumn + 1):
+                cellType = cells[offset + column]
+                if cellType:
+                    found.append((column, row, cellType))
+        return found
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _getOverlappingCells(self, other):
+        """Return the non-empty cells overlapping other's bounding box, truncated to integers like hitTestAABB."""
+        bounds = other.getBounds()
+        if bounds is None:
+            return []
+        left, top, right, bottom = bounds
+        return self.getCellsInRect(int(left), int(top), int(right), int(bottom))
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def hitTest(self, other):
+        """Return True if any non-empty cell overlaps other."""
+        return len(self._getOverlappingCells(other)) > 0
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def shouldCollide(self, other, impact):
+        """Return True if any overlapping cell wants to collide with other."""
+        for column, row, cellType in self._getOverlappingCells(other):
+            if self.shouldCollideCell(column, row, cellType, other, impact):
+                return True
+        return False
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getFreeSteps(self, bounds, stepX, stepY, maxSteps):
+        """Return how many steps the box can take before it comes near a non-empty cell."""
+        left, top, right, bottom = bounds
+        margin = 2
+        sweptLeft = min(left, left + stepX * maxSteps) - margin
+        sweptTop = min(top, top + stepY * maxSteps) - margin
+        sweptRight = max(right, right + stepX * maxSteps) + margin
+        sweptBottom = max(bottom, bottom + stepY * maxSteps) + margin
+
+        mapLeft, mapTop = self._getMapCorner()
+        tileSize = self.tileSize
+        freeSteps = maxSteps
+        for column, row, cellType in self.getCellsInRect(sweptLeft, sweptTop, sweptRight, sweptBottom):
+            cellLeft = mapLeft + column * tileSize
+            cellTop = mapTop + row * tileSize
+            steps = sweepAABB(bounds, (cellLeft, cellTop, cellLeft + tileSize, cellTop + tileSize), stepX, stepY, margin)
+            if steps < freeSteps:
+                freeSteps = steps
+                if freeSteps <= 0:
+                    return 0
+        return freeSteps
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def getClearSteps(self, other, stepX, stepY, impact):
+        """Return how many steps other can move while it still overlaps one of the cells blocking it."""
+        bounds = other.getBounds()
+        mapLeft, mapTop = self._getMapCorner()
+        tileSize = self.tileSize
+        clearSteps = math.inf
+        for column, row, cellType in self._getOverlappingCells(other):
+            if self.shouldCollideCell(column, row, cellType, other, impact):
+                cellLeft = mapLeft + column * tileSize
+                cellTop = mapTop + row * tileSize
+                clearSteps = min(clearSteps, clearAABB(bounds, (cellLeft, cellTop, cellLeft + tileSize, cellTop + tileSize), stepX, stepY))
+        return clearSteps if clearSteps != math.inf else 1
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def shouldCollideCell(self, column, row, cellType, other, impact):
+        """Per-cell collision filter. To be overridden by subclasses; by default every non-empty cell is solid."""
+        return True
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def draw(self):
+        """Draw all non-empty cells with a single texture bind."""
+        if not self.texture.ready:
+            return
+        glTranslatef(-self.originX, -self.originY, 0)
+        glBindTexture(GL_TEXTURE_2D, self.texture.texture_id)
+
+        tileSize = self.tileSize
+        cells = self.cells
+        u0, v0, u1, v1 = self.texture.uvRect
+        glBegin(GL_QUADS)
+        for row in range(self.rows):
+            offset = row * self.columns
+            top = row * tileSize
+            for column in range(self.columns):
+                if cells[offset + column]:
+                    left = column * tileSize
+                    glTexCoord2f(u0, v0); glVertex2f(left, top)
+                    glTexCoord2f(u1, v0); glVertex2f(left + tileSize, top)
+                    glTexCoord2f(u1, v1); glVertex2f(left + tileSize, top + tileSize)
+                    glTexCoord2f(u0, v1); glVertex2f(left, top + tileSize)
+        glEnd()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def drawBatched(self, batch, matrix):
+        """
+        Add all non-empty cells to the SpriteBatch; the local quads are built with NumPy once per change.
+        A subclass's own draw() is run in immediate mode instead.
+        """
+        if type(self).draw is not TileMap.draw:
+            batch.drawImmediate(self, matrix)
+            return
+        if self._quadCache is None:
+            tileSize = self.tileSize
+            indices = np.flatnonzero(np.frombuffer(self.cells, dtype=np.uint8))
+            lefts = (indices % self.columns) * tileSize - self.originX
+            tops = (indices // self.columns) * tileSize - self.originY
+
+            vertices = np.empty((len(indices), 4, 2), dtype=np.float32)
+            vertices[:, 0, 0] = lefts
+            vertices[:, 0, 1] = tops
+            vertices[:, 1, 0] = lefts + tileSize
+            vertices[:, 1, 1] = tops
+            vertices[:, 2, 0] = lefts + tileSize
+            vertices[:, 2, 1] = tops + tileSize
+            vertices[:, 3, 0] = lefts
+            vertices[:, 3, 1] = tops + tileSize
+
+            u0, v0, u1, v1 = self.texture.uvRect
+            texCoords = np.tile(np.array([[u0, v0], [u1, v0], [u1, v1], [u0, v1]], dtype=np.float32), (len(indices), 1))
+            self._quadCache = (vertices.reshape(-1, 2), texCoords)
+
+        batch.addQuads(self.texture, matrix, *self._quadCache)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class FrameProfiler ***
+#---------------------------------------------------------------------------------------------------------------------
+class FrameProfiler:
+    """
+    Times the phases of every frame of Game.run (poll_events, Input.update, update, assets, render, swap_buffers,
+    sleep) into preallocated ring buffers holding the last capacity phases and frameCapacity frame times.
+    While disabled the loop only checks enabled once per phase. instrumentClasses() also times update, draw and
+    drawBatched of every GameObject class. exportChromeTrace() writes the buffer for chrome://tracing or Perfetto,
+    and showOverlay() puts frame time percentiles on screen with a Text.
+    """
+    def __init__(self, capacity=65536, frameCapacity=1024):
+        self.enabled = False
+        self.capacity = capacity
+        self.frameCapacity = frameCapacity
+        self.clock = time.perf_counter
+        self.names = []  # Phase names, indexed by the ids in the buffer
+        self._nameIds = {}
+        self._eventNames = array("H", bytes(2 * capacity))
+        self._eventFrames = array("I", bytes(4 * capacity))
+        self._starts = array("d", bytes(8 * capacity))
+        self._ends = array("d", bytes(8 * capacity))
+        self._depths = array("H", bytes(2 * capacity))  # 0 for the phases of the loop, 1 + nesting for instrumented calls
+        self._depth = 0  # Instrumented calls running now
+        self.eventCount = 0  # Phases recorded so far; the buffer keeps the last capacity of them
+        self._frameTimes = array("d", bytes(8 * frameCapacity))
+        self.frame = 0  # Frames ended so far
+        self._frameStart = 0.0
+        self._origin = self.clock()  # Time 0 of the trace
+        self._patched = []  # (class, method name, original function) replaced by instrumentClasses()
+        self.overlay = None  # Text showing summary(), see showOverlay()
+        self.overlayEvery = 30  # Frames between overlay refreshes, so rebuilding its glyphs doesn't skew the timings
+
+    def _nameId(self, name):
+        nameId = self._nameIds.get(name)
+        if nameId is None:
+            nameId = self._nameIds[name] = len(self.names)
+            self.names.append(name)
+        return nameId
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           record()
+#---------------------------------------------------------------------------------------------------------------------
+    def record(self, name, start):
+        """Record a phase that began at start, a clock() time, and ends now. Returns now, to start the next phase."""
+        nameId = self._nameIds.get(name)
+        if nameId is None:
+            nameId = self._nameId(name)
+        return self._record(nameId, start)
+
+    def _record(self, nameId, start):
+        end = self.clock()
+        index = self.eventCount % self.capacity
+        self._eventNames[index] = nameId
+        self._eventFrames[index] = self.frame
+        self._starts[index] = start
+        self._ends[index] = end
+        self._depths[index] = self._depth
+        self.eventCount += 1
+        return end
+
+    def beginFrame(self, start=None):
+        self._frameStart = self.clock() if start is None else start
+
+    def endFrame(self):
+        """Record the whole frame, and refresh the overlay every overlayEvery frames."""
+        end = self.record("frame", self._frameStart)
+        self._frameTimes[self.frame % self.frameCapacity] = end - self._frameStart
+        self.frame += 1
+        if self.overlay is not None and self.frame % self.overlayEvery == 0:
+            self.overlay.text = self.summary()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def frameTimes(self):
+        """Return the buffered frame times in seconds, oldest first."""
+        times = np.frombuffer(self._frameTimes, dtype=np.float64)
+        if self.frame <= self.frameCapacity:
+            return times[:self.frame].copy()
+        return np.roll(times, -(self.frame % self.frameCapacity))
+
+    def percentiles(self, percents=(50, 90, 99)):
+        """Return the given percentiles of the buffered frame times, in milliseconds."""
+        times = self.frameTimes()
+        if len(times) == 0:
+            return [0.0] * len(percents)
+        return (np.percentile(times, percents) * 1000).tolist()
+
+    def phaseTimes(self, depth=0):
+        """
+        Return {phase name: mean milliseconds per frame} over the buffered phases recorded at depth: 0 for the
+        phases of the loop and the whole "frame", 1 for the outermost instrumented calls, 2 for the instrumented
+        calls inside those, and so on. Phases at one depth don't contain each other, so nothing is counted twice.
+        """
+        count = min(self.eventCount, self.capacity)
+        names = np.frombuffer(self._eventNames, dtype=np.uint16)[:count]
+        durations = (np.frombuffer(self._ends, dtype=np.float64)[:count] -
+                     np.frombuffer(self._starts, dtype=np.float64)[:count])
+        frames = np.frombuffer(self._eventFrames, dtype=np.uint32)[:count]
+        frameCount = max(1, len(np.unique(frames)))
+        atDepth = np.frombuffer(self._depths, dtype=np.uint16)[:count] == depth
+        totals = np.bincount(names[atDepth], weights=durations[atDepth], minlength=len(self.names))
+        return {self.names[nameId]: float(totals[nameId]) * 1000 / frameCount for nameId in np.flatnonzero(totals)}
+
+    def summary(self):
+        """A few lines for the overlay: frame time percentiles and the slowest phases of the loop."""
+        p50, p90, p99 = self.percentiles((50, 90, 99))
+        lines = [f"frame p50 {p50:.1f} p90 {p90:.1f} p99 {p99:.1f} ms"]
+        phases = sorted(((time, name) for name, time in self.phaseTimes().items() if name != "frame"), reverse=True)
+        lines += [f"{name} {time:.2f}" for time, name in phases[:4]]
+        return "\n".join(lines)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           instrumentClasses()
+#---------------------------------------------------------------------------------------------------------------------
+    def instrumentClasses(self, methods=("update", "draw", "drawBatched")):
+        """
+        Time the given methods of every GameObject subclass, recorded as "<class of the object>.<method>".
+        The methods are wrapped, so nothing is added to them until this is called; see removeInstrumentation().
+        """
+        self.removeInstrumentation()
+        classes = []
+        pending = list(GameObject.__subclasses__())
+        while pending:
+            cls = pending.pop()
+            classes.append(cls)
+            pending.extend(cls.__subclasses__())
+        for cls in classes:
+            for methodName in methods:
+                original = cls.__dict__.get(methodName)
+                if isinstance(original, types.FunctionType):
+                    setattr(cls, methodName, self._timed(original, methodName))
+                    self._patched.append((cls, methodName, original))
+
+    def _timed(self, original, methodName):
+        profiler = self
+        nameIds = {}  # Class of the object -> phase name id
+
+        def timed(obj, *args, **kwargs):
+            if not profiler.enabled:
+                return original(obj, *args, **kwargs)
+            start = profiler.clock()
+            profiler._depth += 1
+            try:
+                return original(obj, *args, **kwargs)
+            finally:
+                nameId = nameIds.get(type(obj))
+                if nameId is None:
+                    nameId = nameIds[type(obj)] = profiler._nameId(f"{type(obj).__name__}.{methodName}")
+                profiler._record(nameId, start)
+                profiler._depth -= 1
+
+        timed.__wrapped__ = original
+        return timed
+
+    def removeInstrumentation(self):
+        """Put back the methods wrapped by instrumentClasses()."""
+        for cls, methodName, original in reversed(self._patched):
+            setattr(cls, methodName, original)
+        self._patched = []
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           exportChromeTrace()
+#---------------------------------------------------------------------------------------------------------------------
+    def exportChromeTrace(self, path):
+        """Write the buffered phases as Chrome trace event JSON, which chrome://tracing and Perfetto open."""
+        count = min(self.eventCount, self.capacity)
+        first = self.eventCount - count
+        events = []
+        for eventIndex in range(first, self.eventCount):
+            index = eventIndex % self.capacity
+            start = self._starts[index]
+            events.append({"name": self.names[self._eventNames[index]], "ph": "X", "pid": 1, "tid": 1,
+                           "ts": (start - self._origin) * 1e6, "dur": (self._ends[index] - start) * 1e6,
+                           "args": {"frame": self._eventFrames[index], "depth": self._depths[index]}})
+        # Enclosing phases first when they start together, as the trace viewers expect
+        events.sort(key=lambda event: (event["ts"], -event["dur"]))
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+    def showOverlay(self, visible=True, x=4, y=4):
+        """Show or hide the overlay, drawn in screen space on top of the scene by Game.render."""
+        if not visible:
+            self.overlay = None
+            return
+        if self.overlay is None:
+            self.overlay = Text(self.summary(), x=x, y=y, originX=0, originY=0)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Camera ***
+#---------------------------------------------------------------------------------------------------------------------
+class Camera:
+    """
+    The part of the world shown on screen. x, y is the world position of the view's top-left corner;
+    Game.render shifts the whole scene by it. Streaming and culling code uses getBounds() to find what is near.
+    """
+    def __init__(self, width, height, x=0, y=0):
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
+
+    def getBounds(self, margin=0):
+        """Return the (left, top, right, bottom) world rectangle in view, grown by margin on every side."""
+        return (self.x - margin, self.y - margin, self.x + self.width + margin, self.y + self.height + margin)
+
+    def follow(self, x, y, worldWidth=None, worldHeight=None):
+        """Center the view on the world position (x, y), kept inside the world when its size is given."""
+        left = x - self.width // 2
+        top = y - self.height // 2
+        if worldWidth is not None:
+            left = min(max(left, 0), max(0, worldWidth - self.width))
+        if worldHeight is not None:
+            top = min(max(top, 0), max(0, worldHeight - self.height))
+        self.x = int(left)  # Whole pixels, so tiles don't shimmer
+        self.y = int(top)
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -750,13 +3553,35 @@ class Game(GameObject):
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
-    def __init__(self, width=800, height=600, title="Game"):
+    def __init__(self, width=800, height=600, title="Game", targetFps=60, tickRate=60, headless=False):
         super().__init__()
         self.width = width
         self.height = height
+        self.worldWidth = width  # Size of the playfield; bodies wrap around its edges
+        self.worldHeight = height
+        self.camera = Camera(width, height)
         self.title = title
         self.window = None
         self.collisionManager = CollisionManager()
+        self.useSpriteBatch = True  # Render through the SpriteBatch instead of immediate mode per object
+
+        # Without a window or GL context: textures are sized from image headers and rendering only counts
+        self.headless = headless
+        setHeadless(headless)
+        self.spriteBatch = SpriteBatch(headless=headless)
+        self.ticks = 0  # update() calls so far
+        self.assets = AssetManager()  # Background loading; its uploads run once per frame
+        setAssetManager(self.assets)  # New textures of Sprites and the rest load through it
+        self.profiler = FrameProfiler()  # Per-phase frame timings, off until profiler.enabled is set
+        self.inputRecorder = None  # InputRecorder capturing every tick, see recordInput()
+
+        # Main loop timing, see run()
+        self.targetFps = targetFps  # Rendered frames per second; None or 0 renders as fast as possible
+        self.tickRate = tickRate  # update() calls per second when fixedTimestep is True
+        self.fixedTimestep = True  # False calls update() once per rendered frame, like a variable step loop
+        self.maxTicksPerFrame = 5  # Catch-up limit; time beyond it is dropped instead of piling up
+        self.vsync = False  # Pace frames with the monitor's refresh (swap interval 1) instead of sleeping
+        self.interpolationAlpha = 1.0  # Fraction of a tick between the last update() and this render
 
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
@@ -795,40 +3620,261 @@ class Game(GameObject):
         """To be overridden by subclasses."""
         pass
 
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def render(self, alpha=1.0):
+        """
+        Render the scene, batched unless useSpriteBatch is False. alpha is how far the time of this frame is
+        between the last tick and the next one (0 to 1), for games that interpolate positions between ticks.
+        """
+        camera = self.camera
+        shifted = (camera.x or camera.y) and not self.headless
+        if shifted:
+            glPushMatrix()
+            glTranslatef(-camera.x, -camera.y, 0)
+
+        if self.useSpriteBatch:
+            self.spriteBatch.begin()
+            self.renderBatched(self.spriteBatch)
+            self.spriteBatch.end()
+        else:
+            super().render()
+
+        if shifted:
+            glPopMatrix()
+
+        overlay = self.profiler.overlay
+        if overlay is not None:
+            if self.useSpriteBatch:
+                self.spriteBatch.begin()
+                overlay.renderBatched(self.spriteBatch)
+                self.spriteBatch.end()
+            else:
+                overlay.render()
+
 #---------------------------------------------------------------------------------------------------------------------
 #                                                           
 #---------------------------------------------------------------------------------------------------------------------
 
     def run(self):
-        """Main loop of the game."""
-        self.setupWindow()
-        self.setup()
-    
-        target_fps = 60
-        frame_duration = 1.0 / target_fps
-    
-        while not glfw.window_should_close(self.window):
-            start_time = time.time()
-    
-            glfw.poll_events()
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-    
+        """
+        Main loop of the game. With fixedTimestep, update() runs at tickRate on an accumulator of real time,
+        several times per frame when rendering falls behind (up to maxTicksPerFrame) and not at all when it
+        runs ahead; render() gets the leftover fraction of a tick as its interpolation alpha.
+        Frames are paced to targetFps by sleeping and then spinning on perf_counter, or by vsync.
+        A headless game runs runHeadless() instead.
+        """
+        if self.headless:
+            self.runHeadless()
+            return
+
+        # Close the recording even if the game crashes, so it still ends with its end marker
+        try:
+            self.setupWindow()
+            self.setup()
+            glfw.swap_interval(1 if self.vsync else 0)
+
+            clock = time.perf_counter
+            tickDuration = 1.0 / self.tickRate
+            previousTime = clock()
+            accumulator = 0.0
+
+            profiler = self.profiler
+            while not glfw.window_should_close(self.window):
+                frameStart = clock()
+                accumulator += frameStart - previousTime
+                previousTime = frameStart
+                profiling = profiler.enabled
+                if profiling:
+                    profiler.beginFrame(frameStart)
+
+                glfw.poll_events()
+                if profiling:
+                    profiler.record("poll_events", frameStart)
+
+                if self.fixedTimestep:
+                    ticks = 0
+                    while accumulator >= tickDuration and ticks < self.maxTicksPerFrame:
+                        self._tick()
+                        accumulator -= tickDuration
+                        ticks += 1
+                    if accumulator >= tickDuration:
+                        accumulator %= tickDuration  # Too far behind: drop the backlog rather than spiral
+                    self.interpolationAlpha = accumulator / tickDuration
+                else:
+                    self._tick()
+                    accumulator = 0.0
+                    self.interpolationAlpha = 1.0
+
+                phaseStart = clock()
+                self.assets.update(self)
+                if profiling:
+                    phaseStart = profiler.record("assets", phaseStart)
+                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+                self.render(self.interpolationAlpha)
+                if profiling:
+                    phaseStart = profiler.record("render", phaseStart)
+                glfw.swap_buffers(self.window)
+                if profiling:
+                    phaseStart = profiler.record("swap_buffers", phaseStart)
+
+                if self.targetFps and not self.vsync:
+                    self._waitUntil(frameStart + 1.0 / self.targetFps)
+                if profiling:
+                    profiler.record("sleep", phaseStart)
+                    profiler.endFrame()
+
+                if Input.getKey("esc"):
+                    break
+        finally:
+            self.stopRecording()
+            glfw.terminate()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _tick(self):
+        """Run one update() with fresh input."""
+        profiler = self.profiler
+        if not profiler.enabled:
             Input.update(self.window)
-            self.update()
-            self.render()
-    
-            glfw.swap_buffers(self.window)
-    
-            # Calculate the time taken for the frame
-            end_time = time.time()
-            elapsed_time = end_time - start_time
-    
-            # Sleep to maintain frame rate
-            if elapsed_time < frame_duration:
-                time.sleep(frame_duration - elapsed_time)
-                
-            if Input.getKey("esc"):
-                break
-                    
-        glfw.terminate()
+            self._update()
+            return
+        start = profiler.clock()
+        Input.update(self.window)
+        start = profiler.record("Input.update", start)
+        self._update()
+        profiler.record("update", start)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def step(self, keys=()):
+        """Run one update() of a headless game with the given key names held."""
+        Input.setKeys(keys)
+        self._update()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _update(self):
+        """Run update() on the Input state set for this tick, with fresh scratch vectors, and record it."""
+        recorder = self.inputRecorder
+        if recorder is not None:
+            recorder.beginTick()
+        scratchVectors.reset()
+        self.update()
+        self.ticks += 1
+        if recorder is not None:
+            recorder.endTick(self.stateChecksum() if recorder.checksumDue() else None)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def recordInput(self, path, checksumEvery=60):
+        """
+        Record the input of every following tick to path, with a stateChecksum() every checksumEvery ticks
+        (0 for none). The recording is finished when the game loop ends, or by stopRecording().
+        """
+        self.stopRecording()
+        self.inputRecorder = InputRecorder(path, checksumEvery)
+
+    def stopRecording(self):
+        if self.inputRecorder is not None:
+            self.inputRecorder.close()
+            self.inputRecorder = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def runReplay(self, path):
+        """
+        Call setup() and replay an input recording as fast as possible, without rendering.
+        Returns the first tick whose stateChecksum() differs from the recorded one, or None if the replay
+        matched (or had no checksums) all the way through.
+        """
+        self.setup()
+        player = InputPlayer(path)
+        try:
+            while player.beginTick():
+                scratchVectors.reset()
+                self.update()
+                self.ticks += 1
+                expected = player.endTick()
+                if expected is not None and self.stateChecksum() != expected:
+                    return player.tick - 1
+        finally:
+            player.close()
+        return None
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def stateChecksum(self):
+        """Return a CRC32 of the transforms of every object in the scene, to compare runs tick by tick."""
+        values = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            values += (node._x, node._y, node._rotation, node._scaleX, node._scaleY)
+            stack.extend(reversed(node.children))
+        return zlib.crc32(struct.pack(f"<{len(values)}d", *values))
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def runHeadless(self, ticks=None, inputs=None, render=False):
+        """
+        Call setup() and then step as fast as possible, without a window or frame pacing.
+        inputs gives the keys held on each tick: a sequence of key name collections, indexed by tick,
+        or a function of the tick number. Runs for ticks steps, until a sequence of inputs runs out,
+        or until "esc" is held. With render=True every tick is also rendered into the headless SpriteBatch,
+        so its counters can be inspected.
+        """
+        if ticks is None and inputs is not None and not callable(inputs):
+            ticks = len(inputs)
+
+        # Close the recording even if the game crashes, so it still ends with its end marker
+        try:
+            self.setup()
+            tick = 0
+            while ticks is None or tick < ticks:
+                if inputs is None:
+                    keys = ()
+                elif callable(inputs):
+                    keys = inputs(tick)
+                else:
+                    keys = inputs[tick]
+                profiling = self.profiler.enabled
+                if profiling:
+                    self.profiler.beginFrame()
+                self.assets.update(self)
+                if profiling:
+                    start = self.profiler.clock()
+                self.step(keys)
+                if profiling:
+                    start = self.profiler.record("update", start)
+                if render:
+                    self.render()
+                    if profiling:
+                        self.profiler.record("render", start)
+                if profiling:
+                    self.profiler.endFrame()
+                if Input.getKey("esc"):
+                    break
+                tick += 1
+        finally:
+            self.stopRecording()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def _waitUntil(self, deadline):
+        """Sleep until shortly before the deadline, then spin, since time.sleep can overshoot by a millisecond or more."""
+        remaining = deadline - time.perf_counter()
+        if remaining > 0.002:
+            time.sleep(remaining - 0.002)
+        while time.perf_counter() < deadline:
+            pass
 
@@ -2,86 +2,146 @@ from game import *
 from box import *
 from player import *
 from tile import *
+from physics import *
+from levelpack import *
+from world import *
 import random
 
 # Define constants
 tileSize = 32
 
 class Level(GameObject):
-    def __init__(self, collisionManager):
+    def __init__(self, collisionManager, usePhysicsWorld=False, chunkSize=None):
         super().__init__()
         self.collisionManager = collisionManager
         self.updatables = []
         self.currentLevel = 0
+        self.levels = None  # LevelPack, or any list of levels
+        # When True, boxes and the player keep their state in a PhysicsWorld that steps them in batches
+        self.usePhysicsWorld = usePhysicsWorld
+        self.physicsWorld = None
+        # When set, the level is a ChunkedWorld of chunkSize x chunkSize tile chunks streamed around the camera
+        self.chunkSize = chunkSize
+        self.world = None
+        self.player = None
+        # Bodies that aren't sleeping, rebuilt when one falls asleep or wakes; counted every update()
+        self._awake = []
+        self._awakeDirty = True
+        self._worldState = None
+        self.activeCount = 0
+        self.sleepingCount = 0
 
     def loadLevel(self, levelData):
+        """Load a LevelData (or a grid of cell codes) and register its tiles and bodies."""
         self.clearLevel()  # Ensure any existing tiles are removed
-        """Load level and register collidable tiles."""
-        tileSize = 32
-        for rowIndex, row in enumerate(levelData):
-            for colIndex, cell in enumerate(row):
-                if cell == 1:  # Tile
-                    tile = Tile(self.collisionManager, x=colIndex * tileSize, y=rowIndex * tileSize)
-                    self.addChild(tile)
-                    self.collisionManager.add(tile)  # Register tile with CollisionManager
-                if cell == 2:
-                    box = Box(self.collisionManager, x=colIndex * tileSize, y=rowIndex * tileSize)
-                    self.addChild(box)
-                    self.collisionManager.add(box)  # Register tile with CollisionManager
-                    self.updatables.append(box)
-                if cell == 3:
-                    self.player = Player(self.collisionManager, x=colIndex * tileSize, y=rowIndex * tileSize)
-                    self.addChild(self.player)                    
-                    self.collisionManager.add(self.player)  # Register tile with CollisionManager
-                    self.updatables.append(self.player)
+        if not isinstance(levelData, LevelData):
+            levelData = LevelData.fromCells(levelData)
+        game = self.game
+        if game is not None:
+            game.worldWidth = levelData.columns * tileSize
+            game.worldHeight = levelData.rows * tileSize
+        if self.chunkSize:
+            self.loadChunkedLevel(levelData)
+            return
+        self.tiles = TileLayer(levelData.columns, levelData.rows, tileSize)
+        self.tiles.cacheAsBitmap = True  # Tiles never move, so draw them from a single texture
+        self.tiles.setCells(levelData.grid)
+        self.addChild(self.tiles)
+        self.collisionManager.add(self.tiles)  # Register all tiles with CollisionManager as one collidable
+        for kind, column, row in levelData.entities.tolist():  # Row-major, like the cells they came from
+            if kind == CELL_BOX:
+                box = Box(self.collisionManager, x=column * tileSize, y=row * tileSize)
+                box.onSleepChange = self._sleepChanged
+                self.addChild(box)
+                self.collisionManager.add(box)  # Register box with CollisionManager
+                self.updatables.append(box)
+            elif kind == CELL_PLAYER:
+                self.player = Player(self.collisionManager, x=column * tileSize, y=row * tileSize)
+                self.addChild(self.player)                    
+                self.collisionManager.add(self.player)  # Register player with CollisionManager
+                self.updatables.append(self.player)
+        self._awakeDirty = True
+
+        if self.usePhysicsWorld:
+            self.physicsWorld = PhysicsWorld(self.collisionManager, self.tiles, self)
+            for updatable in self.updatables:
+                self.physicsWorld.add(updatable)
+
+    def loadChunkedLevel(self, levelData):
+        """Load the level as a ChunkedWorld, starting with the chunks around the player's spawn."""
+        if self.usePhysicsWorld:
+            raise ValueError("A PhysicsWorld needs the whole level in one TileLayer; it can't be used with chunkSize")
+        self.world = ChunkedWorld(self.collisionManager, levelData, self.spawn, self.chunkSize, tileSize)
+        self.addChild(self.world)
+        self.updatables = self.world.bodies  # Only bodies in loaded chunks are updated
+        start = self.world.findEntity(CELL_PLAYER) or (0, 0)
+        self.streamChunks(start[0] * tileSize, start[1] * tileSize)
+
+    def spawn(self, kind, column, row):
+        """Create and register the body for an entity of the level, see ChunkedWorld."""
+        if kind == CELL_BOX:
+            body = Box(self.collisionManager, x=column * tileSize, y=row * tileSize)
+        elif kind == CELL_PLAYER:
+            body = self.player = Player(self.collisionManager, x=column * tileSize, y=row * tileSize)
+        else:
+            return None
+        body.onSleepChange = self._sleepChanged
+        self.addChild(body)
+        self.collisionManager.add(body)
+        return body
+
+    def streamChunks(self, x, y):
+        """Center the camera on (x, y) and load the chunks around it."""
+        camera = self.game.camera if self.game is not None else Camera(640, 480)
+        camera.follow(x, y, self.world.width, self.world.height)
+        self.world.stream(*camera.getBounds())
 
     def clearLevel(self):
         """Clear the current level by removing all tiles."""
+        if self.world is not None:
+            self.world.clear()
+            self.world = None
+        for child in self.children:
+            self.collisionManager.remove(child)
+        if self.physicsWorld is not None:
+            for updatable in self.updatables:
+                self.physicsWorld.remove(updatable)
+            self.physicsWorld = None
+        self.updatables = []
         self.removeAllChildren()  # Use the GameObject's removeAllChildren method
         
     def nextLevel(self):
-        self.loadLevel(self.levelData[self.currentLevel])
+        self.loadLevel(self.levels[self.currentLevel])
         self.currentLevel += 1
 
     def setup(self):
-        """Setup the level by loading it."""
-        # Create a 20x15 grid with mostly zeros and a few random ones
-        self.levelData = [
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 0, 3, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 2, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
-            [0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]],
-            #------------------------------------------------------------
-            [[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 2, 0, 3, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 2, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0],
-            [0, 0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 1, 0, 0, 0, 0, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]],
-            #------------------------------------------------------------
-        ]
+        """Setup the level by loading the first level of the pack."""
+        self.levels = sharedPack("assets/levels.lvl")  # Not closed: chunked worlds read their grid from it
         self.nextLevel()
         
+    def _sleepChanged(self, body):
+        self._awakeDirty = True
+
     def update(self):
-        for updatable in self.updatables:
-            updatable.update()
+        # Sleeping bodies cost nothing here; one woken during the loop runs from the next tick
+        if self._awakeDirty:
+            self._awake = [updatable for updatable in self.updatables if not updatable.sleeping]
+            self._awakeDirty = False
+        awake = self._awake
+        if self.physicsWorld is not None:
+            self.physicsWorld.step()
+            for updatable in awake:
+                updatable.updateLogic()
+            self.physicsWorld.updateSleep()
+        else:
+            for updatable in awake:
+                updatable.update()
+
+        if self.world is not None and self.player is not None:
+            self.streamChunks(self.player.x, self.player.y)
+            worldState = (self.world.loads, self.world.drops, len(self.world.bodies))
+            if worldState != self._worldState:  # Bodies were spawned, parked or brought back
+                self._worldState = worldState
+                self._awakeDirty = True
+        self.activeCount = len(awake)
+        self.sleepingCount = len(self.updatables) - len(awake)
@@ -0,0 +1,145 @@
+import mmap
+import os
+import struct
+import sys
+import zlib
+import numpy as np
+
+# Cell codes of the level grids, as written by hand in the level sources
+CELL_EMPTY = 0
+CELL_TILE = 1
+CELL_BOX = 2
+CELL_PLAYER = 3
+
+# One row per entity: its cell code and cell position, in row-major order
+entityDtype = np.dtype([("kind", "<u1"), ("column", "<i4"), ("row", "<i4")])
+
+_PACK_MAGIC = b"LVLP\x01"
+_PACK_HEADER = struct.Struct("<5sI")  # magic, level count
+_PACK_ENTRY = struct.Struct("<QIIIIII")  # grid offset, columns, rows, stored grid bytes, compressed, entity count, pad
+_ENTITY_KINDS = (CELL_BOX, CELL_PLAYER)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class LevelData ***
+#---------------------------------------------------------------------------------------------------------------------
+class LevelData:
+    """
+    One level: grid is a (rows, columns) uint8 array of tile types, entities an entityDtype array of the
+    boxes and player to spawn. Levels read from an uncompressed LevelPack keep their grid in the mapped file.
+    """
+    def __init__(self, grid, entities):
+        self.grid = grid
+        self.entities = entities
+
+    @classmethod
+    def fromCells(cls, cells):
+        """Split a grid of cell codes (nested lists or an array) into the tile grid and the entity table."""
+        cells = np.asarray(cells, dtype=np.uint8)
+        rows, columns = np.nonzero(np.isin(cells, _ENTITY_KINDS))
+        entities = np.empty(len(rows), dtype=entityDtype)
+        entities["kind"] = cells[rows, columns]
+        entities["column"] = columns
+        entities["row"] = rows
+        grid = np.where(cells == CELL_TILE, CELL_TILE, CELL_EMPTY).astype(np.uint8)
+        return cls(grid, entities)
+
+    @property
+    def columns(self):
+        return self.grid.shape[1]
+
+    @property
+    def rows(self):
+        return self.grid.shape[0]
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class LevelPack ***
+#---------------------------------------------------------------------------------------------------------------------
+class LevelPack:
+    """
+    A file of levels with an index up front. Opening a pack maps the file and reads the index only;
+    pack[n] then seeks straight to level n, so the others are never parsed or decompressed.
+    File layout: header, one index entry per level, then per level its grid bytes (zlib-compressed or raw)
+    followed by its entity table.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _PACK_HEADER.unpack_from(self._map, 0)
+        if magic != _PACK_MAGIC:
+            raise ValueError(f"{path} is not a level pack")
+        self._index = [_PACK_ENTRY.unpack_from(self._map, _PACK_HEADER.size + i * _PACK_ENTRY.size)
+                       for i in range(count)]
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, index):
+        """Read level index from the mapped file."""
+        offset, columns, rows, gridBytes, compressed, entityCount, _ = self._index[index]
+        if compressed:
+            grid = np.frombuffer(zlib.decompress(self._map[offset:offset + gridBytes]), dtype=np.uint8)
+        else:
+            grid = np.frombuffer(self._map, dtype=np.uint8, count=gridBytes, offset=offset)
+        entities = np.frombuffer(self._map, dtype=entityDtype, count=entityCount, offset=offset + gridBytes)
+        return LevelData(grid.reshape(rows, columns), entities)
+
+    def close(self):
+        # Arrays handed out by __getitem__ may still view the map; it is freed once they are gone
+        self._map = None
+        self._file.close()
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    @staticmethod
+    def write(path, levels, compress=True):
+        """Write levels (LevelData, or grids of cell codes) to a pack file."""
+        levels = [level if isinstance(level, LevelData) else LevelData.fromCells(level) for level in levels]
+        blobs = []
+        for level in levels:
+            grid = np.ascontiguousarray(level.grid, dtype=np.uint8).tobytes()
+            if compress:
+                grid = zlib.compress(grid, 9)
+            blobs.append((grid, np.ascontiguousarray(level.entities, dtype=entityDtype).tobytes()))
+
+        offset = _PACK_HEADER.size + len(levels) * _PACK_ENTRY.size
+        with open(path, "wb") as file:
+            file.write(_PACK_HEADER.pack(_PACK_MAGIC, len(levels)))
+            for level, (grid, entities) in zip(levels, blobs):
+                file.write(_PACK_ENTRY.pack(offset, level.columns, level.rows, len(grid), int(compress),
+                                            len(level.entities), 0))
+                offset += len(grid) + len(entities)
+            for grid, entities in blobs:
+                file.write(grid)
+                file.write(entities)
+
+# Packs opened by sharedPack, by absolute path
+_sharedPacks = {}
+
+def sharedPack(path):
+    """
+    Return a LevelPack of path that is opened once and shared by every caller, so games made one after another
+    don't each keep the file open. It stays open for the life of the process; don't close it.
+    """
+    key = os.path.abspath(path)
+    pack = _sharedPacks.get(key)
+    if pack is None:
+        pack = _sharedPacks[key] = LevelPack(path)
+    return pack
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+def readLevelSource(path):
+    """Read a level source file: one line of cell code digits per row."""
+    with open(path) as file:
+        return [[int(cell) for cell in line.strip()] for line in file if line.strip()]
+
+if __name__ == "__main__":
+    # Build a pack from level sources: python levelpack.py assets/levels.lvl assets/levels/*.txt
+    if len(sys.argv) < 3:
+        print("usage: python levelpack.py <pack> <level source>...")
+        sys.exit(1)
+    LevelPack.write(sys.argv[1], [readLevelSource(path) for path in sys.argv[2:]])
+    print(f"Wrote {len(sys.argv) - 2} levels to {sys.argv[1]}")
@@ -4,19 +4,27 @@ from level import *
 Sprite.hitTest = hitTestAABB
 
 class MyGame(Game):
-    def __init__(self):
-        super().__init__(width=640, height=480, title="Game")
+    def __init__(self, headless=False):
+        super().__init__(width=640, height=480, title="Game", headless=headless)
 
     def setup(self):                
+        # Decoded images and sounds are kept on disk, so later launches skip decoding
+        setAssetCache(AssetCache())
+
+        # Pack the sprite images into one texture so the whole scene draws with few binds; the pages load in the background
+        TextureAtlas(["assets/tile.png", "assets/player.png", fontName]).load(self.assets)
+
         self.level = Level(self.collisionManager)
+        self.addChild(self.level)  # Before setup, so loading the level can size the game's world
         self.level.setup()
-        self.addChild(self.level)
         
         self.text = Text("Hello world", x=0, y=0, rotation=0, scaleX=1, scaleY=1, originX=0, originY=0)
         self.addChild(self.text)    
         
-        sound = Sound("assets/snowland.ogg")
-        sound.play()            
+        if not self.headless:
+            # Streamed, so the track is not decoded into memory up front
+            self.music = StreamingSound("assets/Snowland.ogg")
+            self.music.play()
         
     def update(self):
         """Update and test for collisions."""        
@@ -0,0 +1,361 @@
+from box import *
+from tile import *
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class BodyVelocity ***
+#---------------------------------------------------------------------------------------------------------------------
+class BodyVelocity(Vector2):
+    """
+    The velocity of a Box inside a PhysicsWorld: a Vector2 whose x and y read and write the body's row, so the
+    in-place operators and set() update the world while the others return plain Vector2s.
+    """
+    __slots__ = ("_body",)
+
+    def __init__(self, body):
+        self._body = body  # Vector2.__init__ would write zeros into the row
+
+    @property
+    def x(self):
+        body = self._body
+        return float(body._world.velocity[body._row, 0])
+
+    @x.setter
+    def x(self, value):
+        body = self._body
+        body._world.velocity[body._row, 0] = value
+
+    @property
+    def y(self):
+        body = self._body
+        return float(body._world.velocity[body._row, 1])
+
+    @y.setter
+    def y(self, value):
+        body = self._body
+        body._world.velocity[body._row, 1] = value
+
+    def __repr__(self):
+        return f"Vector2({self.x}, {self.y})"
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class PhysicsWorld ***
+#---------------------------------------------------------------------------------------------------------------------
+class PhysicsWorld:
+    """
+    Optional struct-of-arrays store for Box bodies. Positions, velocities, landed and sleep state live in NumPy
+    arrays, one row per body, and the Box objects read and write their row. step() runs Box.updatePhysics for
+    every awake body: bodies that cannot touch another body this tick get gravity and one-way tile landing in a
+    few array passes; the rest fall back to updatePhysics one by one, in the order they were added.
+    updateSleep() then puts bodies to sleep like Box.update, so settled stacks cost nothing until woken.
+
+    The batched pass assumes what the level builds: unrotated, unscaled bodies that are children of one
+    container, and a TileLayer as the only other collidable. Anything else makes step() fall back for all bodies.
+    Size, origin and sleepAfter are read when a body is added.
+
+    Only bodies clear of other bodies are batched. Stacks that are still settling go one by one until they
+    sleep, since the outcome of bodies pushing on each other depends on their update order.
+    """
+    def __init__(self, collisionManager, tiles, container, capacity=64):
+        self.collisionManager = collisionManager
+        self.tiles = tiles
+        self.container = container
+        self.bodies = []
+        self.position = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.landed = np.zeros(capacity, dtype=bool)
+        self.sleeping = np.zeros(capacity, dtype=bool)
+        self.stillTicks = np.zeros(capacity, dtype=np.int64)
+        self.sleepAfter = np.zeros(capacity)  # Box.sleepAfter, inf for bodies that never sleep
+        self.size = np.zeros((capacity, 2))    # Width and height
+        self.origin = np.zeros((capacity, 2))  # originX and originY
+
+        # Bodies stepped by the batched pass and one by one in the last step()
+        self.batchedCount = 0
+        self.fallbackCount = 0
+        self._previous = None  # Positions and awake mask at the start of the last step(), for updateSleep()
+        self._awake = None
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def add(self, body):
+        """Move the body's state into a new row. The body must be a child of the world's container."""
+        if body._world is not None:
+            return
+        if body.parent is not self.container:
+            raise ValueError("PhysicsWorld bodies must be children of the world's container")
+        row = len(self.bodies)
+        if row == len(self.position):
+            self._grow(row * 2)
+
+        velocity = body.velocity
+        self.position[row] = (body.x, body.y)
+        self.velocity[row] = (velocity.x, velocity.y)
+        self.landed[row] = body.landed
+        self.sleeping[row] = body.sleeping
+        self.stillTicks[row] = body._stillTicks
+        self.sleepAfter[row] = np.inf if body.sleepAfter is None else body.sleepAfter
+        self.size[row] = (body.width, body.height)
+        self.origin[row] = (body.originX, body.originY)
+        self.bodies.append(body)
+
+        body._world = self
+        body._row = row
+        body._velocity = BodyVelocity(body)
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def remove(self, body):
+        """Copy the body's row back into the body and fill the hole with the last row."""
+        if body._world is not self:
+            return
+        row = body._row
+        body._velocity = Vector2(float(self.velocity[row, 0]), float(self.velocity[row, 1]))
+        body._landed = bool(self.landed[row])
+        body._sleeping = bool(self.sleeping[row])
+        body._stillTicksValue = int(self.stillTicks[row])
+        body._world = None
+        body._row = -1
+
+        last = len(self.bodies) - 1
+        moved = self.bodies.pop()
+        if row != last:
+            for array in (self.position, self.velocity, self.landed, self.sleeping, self.stillTicks, self.sleepAfter,
+                          self.size, self.origin):
+                array[row] = array[last]
+            self.bodies[row] = moved
+            moved._row = row
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _grow(self, capacity):
+        for name in ("position", "velocity", "landed", "sleeping", "stillTicks", "sleepAfter", "size", "origin"):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _canBatch(self):
+        """Return True if the scene is simple enough for the batched pass."""
+        collisionManager = self.collisionManager
+        if not isinstance(self.tiles, TileLayer) or self.tiles not in collisionManager._order:
+            return False
+        # Every body is registered, so anything else registered besides the tiles is unknown to the batch
+        if len(collisionManager.collidables) != len(self.bodies) + 1:
+            return False
+        if self.container.game is None:
+            return False
+        a, b, c, d, tx, ty = self.container.getWorldMatrix()
+        if not (a == 1 and b == 0 and c == 0 and d == 1):
+            return False
+        return all(body._rotation == 0 and body._scaleX == 1 and body._scaleY == 1 for body in self.bodies)
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def step(self):
+        """Run one tick of Box.updatePhysics for all awake bodies. A body woken during the tick runs from the next."""
+        count = len(self.bodies)
+        awake = ~self.sleeping[:count]
+        self._previous = self.position[:count].copy()
+        self._awake = awake
+        self.batchedCount = 0
+        self.fallbackCount = int(awake.sum())
+        if self.fallbackCount == 0:
+            return
+        if not self._canBatch():
+            for body in [self.bodies[row] for row in np.flatnonzero(awake).tolist()]:
+                body.updatePhysics()
+            return
+
+        bodies = self.bodies
+        position = self.position[:count]
+        velocity = self.velocity[:count]
+        width = self.size[:count, 0]
+        height = self.size[:count, 1]
+        containerMatrix = self.container.getWorldMatrix()
+        left = position[:, 0] - self.origin[:count, 0] + containerMatrix[4]
+        top = position[:, 1] - self.origin[:count, 1] + containerMatrix[5]
+        dy = np.trunc(velocity[:, 1])  # Box.move truncates like int()
+
+        # Bodies off the pixel grid go one by one
+        simple = (left == np.floor(left)) & (top == np.floor(top))
+
+        stop = self._sweepTiles(left, top, width, height, position[:, 1], dy)
+        blocked = stop < dy
+        newY = position[:, 1] + np.where(blocked, stop, dy)
+
+        # Bodies that leave the world wrap around through teleport, which needs the collision queries
+        game = self.container.game
+        inside = (newY <= game.worldHeight) & (position[:, 0] >= 0) & (position[:, 0] <= game.worldWidth)
+        isolated = self._findIsolated(left, top, left + width, top + height, dy)
+
+        # teleport pushes a wrapping body upward for as long as it overlaps something, so everything in the
+        # columns above where it lands has to go one by one as well, in order with the wrapping body
+        margin = 2
+        for row in np.flatnonzero(~inside & awake).tolist():
+            targetY = newY[row] - game.worldHeight if newY[row] > game.worldHeight else position[row, 1]
+            bottom = targetY - self.origin[row, 1] + height[row] + containerMatrix[5] + margin
+            targetX = (game.worldWidth if position[row, 0] < 0 else 0 if position[row, 0] > game.worldWidth
+                       else position[row, 0])
+            for columnX in (position[row, 0], targetX):
+                columnLeft = columnX - self.origin[row, 0] + containerMatrix[4] - margin
+                columnRight = columnLeft + width[row] + 2 * margin
+                isolated &= ~((left < columnRight) & (columnLeft < left + width) & (np.minimum(top, top + dy) < bottom))
+        batched = simple & inside & isolated & awake  # Sleeping bodies still count as obstacles in isolated
+        rows = np.flatnonzero(batched)
+
+        # Same outcome as Box.updatePhysics: a blocked body stops next to the tile and loses its speed
+        blocked &= batched
+        moved = batched & ~blocked
+        self.landed[:count] |= blocked & (velocity[:, 1] > 0)
+        velocity[blocked, 1] = 0
+        velocity[moved, 1] += 1
+
+        changed = rows[newY[rows] != position[rows, 1]]
+        position[changed, 1] = newY[changed]
+        self._syncBodies(changed)
+
+        self.batchedCount = len(rows)
+        self.fallbackCount -= len(rows)
+        for row in np.flatnonzero(~batched & awake).tolist():
+            bodies[row].updatePhysics()
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def updateSleep(self):
+        """
+        Count how many ticks each body stayed still and put to sleep the ones Box.update would. Call it after
+        step() and the bodies' updateLogic, which may move them too.
+        """
+        count = len(self.bodies)
+        if self._previous is None or len(self._previous) != count:
+            return  # Bodies were added or removed since step()
+        awake = self._awake & ~self.sleeping[:count]
+        still = (self.position[:count] == self._previous).all(axis=1)
+        stillTicks = self.stillTicks[:count]
+        stillTicks[awake & ~still] = 0
+        stillTicks[awake & still] += 1
+        ready = awake & still & (stillTicks >= self.sleepAfter[:count]) & (self.velocity[:count, 1] == 0)
+        bodies = self.bodies
+        for row in np.flatnonzero(ready).tolist():
+            bodies[row].sleep()
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _sweepTiles(self, left, top, width, height, y, dy):
+        """
+        Return, per body, the number of pixels it can fall before a tile stops it, or dy when nothing does.
+        A cell stops the body at the first step k where they overlap and TileLayer.shouldCollideCell agrees,
+        i.e. tiles.y + row * tileSize >= y + k + height - 1. Upward moves never hit a one-way tile.
+        """
+        tiles = self.tiles
+        tileSize = tiles.tileSize
+        mapLeft, mapTop = tiles._getMapCorner()
+        grid = np.frombuffer(tiles.cells, dtype=np.uint8).reshape(tiles.rows, tiles.columns)
+        stop = dy.copy()
+
+        falling = np.flatnonzero(dy > 0)
+        if len(falling) == 0:
+            return stop
+        left = left[falling]
+        top = top[falling]
+        width = width[falling]
+        height = height[falling]
+        y = y[falling]
+        fall = dy[falling]
+
+        firstColumn = np.floor((left - mapLeft) / tileSize).astype(np.int64)
+        lastColumn = np.ceil((left + width - mapLeft) / tileSize).astype(np.int64) - 1
+        firstRow = np.floor((top + 1 - mapTop) / tileSize).astype(np.int64)
+        lastRow = np.ceil((top + fall + height - mapTop) / tileSize).astype(np.int64) - 1
+
+        first = np.full(len(falling), np.inf)
+        for rowOffset in range(int((lastRow - firstRow).max()) + 1):
+            row = firstRow + rowOffset
+            cellTop = mapTop + row * tileSize
+            # Steps at which the body overlaps this row, limited by the one-way rule
+            fromStep = np.maximum(1, cellTop - top - height + 1)
+            toStep = np.minimum(np.minimum(fall, cellTop + tileSize - top - 1),
+                                tiles.y + row * tileSize - y - height + 1)
+            candidate = (row <= lastRow) & (row >= 0) & (row < tiles.rows) & (fromStep <= toStep)
+            if not candidate.any():
+                continue
+            solid = np.zeros(len(falling), dtype=bool)
+            for columnOffset in range(int((lastColumn - firstColumn).max()) + 1):
+                column = firstColumn + columnOffset
+                inside = candidate & (column <= lastColumn) & (column >= 0) & (column < tiles.columns)
+                solid[inside] |= grid[row[inside], column[inside]] != 0
+            first = np.where(solid, np.minimum(first, fromStep), first)
+
+        hit = first <= fall
+        stop[falling[hit]] = first[hit] - 1
+        return stop
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _findIsolated(self, left, top, right, bottom, dy, margin=2):
+        """
+        Return a mask of the bodies whose swept box this tick, widened by the margin, overlaps no other body's.
+        Boxes are hashed by their top-left corner into cells at least as big as the largest box, so only
+        the 3x3 neighbouring cells need to be compared.
+        """
+        count = len(left)
+        left = left - margin
+        right = right + margin
+        top = np.minimum(top, top + dy) - margin
+        bottom = np.maximum(bottom, bottom + dy) + margin
+
+        cellWidth = float((right - left).max())
+        cellHeight = float((bottom - top).max())
+        cellX = np.floor(left / cellWidth).astype(np.int64)
+        cellY = np.floor(top / cellHeight).astype(np.int64)
+        cellX -= cellX.min() - 1  # Leave room for the neighbours of the outermost cells
+        cellY -= cellY.min() - 1
+        stride = int(cellY.max()) + 2
+        keys = cellX * stride + cellY
+
+        order = np.argsort(keys, kind="stable")
+        sortedKeys = keys[order]
+        touching = np.zeros(count, dtype=bool)
+        for offsetX in (-1, 0, 1):
+            for offsetY in (-1, 0, 1):
+                # Querying in sorted order keeps searchsorted fast
+                neighbourKeys = sortedKeys + (offsetX * stride + offsetY)
+                start = np.searchsorted(sortedKeys, neighbourKeys, "left")
+                counts = np.searchsorted(sortedKeys, neighbourKeys, "right") - start
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                # Expand every body into one pair per body in the neighbouring cell
+                first = np.repeat(order, counts)
+                within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                second = order[np.repeat(start, counts) + within]
+                overlap = ((first != second) & (left[first] < right[second]) & (left[second] < right[first]) &
+                           (top[first] < bottom[second]) & (top[second] < bottom[first]))
+                touching[first[overlap]] = True
+        return ~touching
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _syncBodies(self, rows):
+        """
+        Write new positions from the arrays into the bodies like Box's y setter, so the CollisionManager
+        re-buckets them lazily, cached matrices and bitmaps are invalidated and sleepers wake. The rows
+        already hold the positions, so only the GameObject part of the setter and the wake hook are run.
+        """
+        bodies = self.bodies
+        setY = GameObject.y.fset
+        for row, bodyY in zip(rows.tolist(), self.position[rows, 1].tolist()):
+            body = bodies[row]
+            setY(body, bodyY)
+            body._moved()
@@ -1,13 +1,12 @@
 from box import *
         
 class Player(Box):
+    sleepAfter = None  # Moved by input at any time, so it never sleeps
+
     def __init__(self, collisionManager, x=0, y=0, rotation=0, scaleX=1, scaleY=1):
         super().__init__(collisionManager, x, y, rotation, scaleX, scaleY)
 
-    def update(self):
-            
-        self.updatePhysics()
-                    
+    def updateLogic(self):
         if self.landed:
             if Input.getKey("space"):
                 self.landed = False
@@ -0,0 +1,168 @@
+from main import *
+import multiprocessing
+from multiprocessing import shared_memory
+import sys
+
+# Event types in SimulationResults.events
+EVENT_LANDED = 1  # A body's landed flag turned on
+EVENT_JUMPED = 2  # A body's landed flag turned off
+EVENT_WRAPPED = 3  # A body moved more than half the world in one tick, wrapping around an edge
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class SimulationResults ***
+#---------------------------------------------------------------------------------------------------------------------
+class SimulationResults:
+    """
+    What SimulationRunner.run returns, one row per simulation:
+    positions (simulations, frames, maxBodies, 2) and landed (simulations, frames, maxBodies) are sampled every
+    recordEvery ticks, bodyCount says how many bodies each simulation had, and events (simulations, maxEvents, 3)
+    holds (tick, body, event type) rows, eventCount of them per simulation.
+    """
+    _fields = (("positions", np.float32), ("landed", np.bool_), ("bodyCount", np.int32),
+               ("events", np.int32), ("eventCount", np.int32))
+
+    def __init__(self, simulations, frames, maxBodies, maxEvents):
+        self.shapes = {"positions": (simulations, frames, maxBodies, 2), "landed": (simulations, frames, maxBodies),
+                       "bodyCount": (simulations,), "events": (simulations, maxEvents, 3),
+                       "eventCount": (simulations,)}
+        self._memory = {}
+        for name, dtype in self._fields:
+            size = max(1, int(np.prod(self.shapes[name])) * np.dtype(dtype).itemsize)
+            self._memory[name] = shared_memory.SharedMemory(create=True, size=size)
+            array = np.ndarray(self.shapes[name], dtype=dtype, buffer=self._memory[name].buf)
+            array[...] = 0
+            setattr(self, name, array)
+
+    def _handles(self):
+        """Shared memory names and shapes, small enough to send to every worker."""
+        return {name: (self._memory[name].name, self.shapes[name], dtype) for name, dtype in self._fields}
+
+    def detach(self):
+        """Copy the results out of shared memory and free it."""
+        for name, dtype in self._fields:
+            setattr(self, name, np.array(getattr(self, name)))
+            self._memory[name].close()
+            self._memory[name].unlink()
+        self._memory = {}
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class SimulationRunner ***
+#---------------------------------------------------------------------------------------------------------------------
+class SimulationRunner:
+    """
+    Runs many headless playthroughs of the game's Level in a multiprocessing pool. Every simulation gets its
+    own game in a worker process and a list of inputs, one collection of held key names per tick.
+    Workers write straight into shared memory NumPy buffers, so only the inputs are pickled.
+    A worker runs several simulations in turn; the engine's global state is reset before each one.
+    maxBodies must cover the level's bodies, or run() raises ValueError.
+    """
+    def __init__(self, processes=None, recordEvery=1, maxBodies=16, maxEvents=1024):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.recordEvery = recordEvery
+        self.maxBodies = maxBodies
+        self.maxEvents = maxEvents
+
+    def run(self, inputs, ticks=None):
+        """
+        Run one simulation per entry of inputs and return their SimulationResults.
+        Every simulation runs for ticks ticks, or for as many ticks as its inputs have.
+        """
+        if ticks is None:
+            ticks = max(len(simulationInputs) for simulationInputs in inputs)
+        frames = (ticks + self.recordEvery - 1) // self.recordEvery
+        results = SimulationResults(len(inputs), frames, self.maxBodies, self.maxEvents)
+        jobs = [(results._handles(), index, simulationInputs, ticks, self.recordEvery)
+                for index, simulationInputs in enumerate(inputs)]
+        try:
+            if self.processes == 1:
+                for job in jobs:
+                    _runSimulation(job)
+            else:
+                with multiprocessing.Pool(self.processes) as pool:
+                    chunkSize = max(1, len(jobs) // (self.processes * 4))
+                    for _ in pool.imap_unordered(_runSimulation, jobs, chunkSize):
+                        pass
+        except BaseException:
+            results.detach()
+            raise
+        results.detach()
+        return results
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+def _runSimulation(job):
+    """Worker: step one headless game and write its states and events into the shared buffers."""
+    handles, index, inputs, ticks, recordEvery = job
+    memory = {}
+    arrays = {}
+    for name, (memoryName, shape, dtype) in handles.items():
+        memory[name] = shared_memory.SharedMemory(name=memoryName)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=memory[name].buf)
+    try:
+        # Input, the scratch vectors and the asset cache are global; start from a clean slate like a new process
+        Input.reset()
+        scratchVectors.reset()
+        setAssetCache(None)
+        game = MyGame(headless=True)
+        game.setup()
+        bodies = list(game.level.updatables)
+        maxBodies = arrays["positions"].shape[2]
+        if len(bodies) > maxBodies:
+            raise ValueError(f"The level has {len(bodies)} bodies, more than maxBodies={maxBodies}")
+        positions = arrays["positions"][index]
+        landed = arrays["landed"][index]
+        events = arrays["events"][index]
+        arrays["bodyCount"][index] = len(bodies)
+
+        eventCount = 0
+        previous = [(body.x, body.y, body.landed) for body in bodies]
+        for tick in range(ticks):
+            game.step(inputs[tick] if tick < len(inputs) else ())
+
+            current = [(body.x, body.y, body.landed) for body in bodies]
+            for bodyIndex, ((x, y, isLanded), (oldX, oldY, wasLanded)) in enumerate(zip(current, previous)):
+                event = 0
+                if abs(x - oldX) > game.worldWidth / 2 or abs(y - oldY) > game.worldHeight / 2:
+                    event = EVENT_WRAPPED
+                elif isLanded != wasLanded:
+                    event = EVENT_LANDED if isLanded else EVENT_JUMPED
+                if event and eventCount < len(events):
+                    events[eventCount] = (tick, bodyIndex, event)
+                    eventCount += 1
+            previous = current
+
+            if tick % recordEvery == 0:
+                frame = tick // recordEvery
+                for bodyIndex, (x, y, isLanded) in enumerate(current):
+                    positions[frame, bodyIndex] = (x, y)
+                    landed[frame, bodyIndex] = isLanded
+        arrays["eventCount"][index] = eventCount
+    finally:
+        arrays.clear()
+        positions = landed = events = None
+        for block in memory.values():
+            block.close()
+
+if __name__ == "__main__":
+    # Benchmark: simulations per second for a growing number of worker processes
+    import time
+    random.seed(1)
+    simulations = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    inputs = []
+    for _ in range(simulations):
+        simulationInputs = []
+        for tick in range(ticks):
+            if tick % 7 == 0:
+                keys = [key for key in ("a", "d", "space") if random.random() < 0.4]
+            simulationInputs.append(keys)
+        inputs.append(simulationInputs)
+
+    processes = 1
+    while processes <= multiprocessing.cpu_count():
+        start = time.perf_counter()
+        SimulationRunner(processes, recordEvery=10).run(inputs)
+        elapsed = time.perf_counter() - start
+        print(f"{processes} processes: {simulations / elapsed:.1f} simulations/s, {simulations * ticks / elapsed:.0f} ticks/s")
+        processes *= 2
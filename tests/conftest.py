@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tests import the game modules from the repository root and load assets relative to it
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+os.chdir(root)
@@ -0,0 +1,46 @@
+import numpy as np
+import soundfile as sf
+from PIL import Image
+from game import *
+
+def test_load_sound_decodes_in_the_background(tmp_path):
+    path = str(tmp_path / "effect.wav")
+    sf.write(path, np.full((1024, 2), 0.25, dtype=np.float32), 22050)
+    assets = AssetManager()
+    sound = assets.loadSound(path)
+    assert sound.samplerate == 22050
+    assets.wait()
+    assert sound.data.shape == (1024, 2)
+    assert sound._resampled == {22050: sound.data}
+
+def test_uploaded_texture_invalidates_cached_bitmaps(tmp_path):
+    setHeadless(True)
+    path = str(tmp_path / "late.png")
+    Image.new("RGBA", (8, 8)).save(path)
+    assets = AssetManager()
+    texture = assets.loadTexture(path)
+
+    scene = GameObject()
+    cached = GameObject()
+    other = GameObject()
+    for node in (cached, other):
+        node.cacheAsBitmap = True
+        scene.addChild(node)
+    cached.addChild(Sprite(path))
+    other.addChild(Sprite("assets/player.png"))
+    cached._bitmapDirty = other._bitmapDirty = False  # Baked while the texture was still loading
+
+    while not assets.isDone():
+        assets.update(scene)
+    assert texture.ready
+    assert cached._bitmapDirty
+    assert not other._bitmapDirty
+
+def test_evicted_entries_drop_their_sources(tmp_path):
+    cache = AssetCache(str(tmp_path / "cache"), maxBytes=1)  # Room for the newest entry only
+    for name, color in (("first.png", "red"), ("second.png", "blue")):
+        Image.new("RGBA", (8, 8), color).save(tmp_path / name)
+        cache.image(str(tmp_path / name))
+    sources = cache._index["sources"]
+    assert list(sources) == [os.path.abspath(tmp_path / "second.png")]
+    assert len(cache._index["entries"]) == 1
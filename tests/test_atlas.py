@@ -0,0 +1,14 @@
+import json
+import pytest
+from game import *
+
+@pytest.mark.parametrize("layout", [
+    [],
+    {"version": TextureAtlas.version, "pageSize": 1024, "padding": 1},
+    {"version": TextureAtlas.version, "pageSize": 1024, "padding": 1, "images": {"assets/tile.png": {}}, "pages": []},
+])
+def test_malformed_layout_is_rebuilt(tmp_path, layout):
+    """A saved layout missing fields is treated like any other mismatch."""
+    (tmp_path / "atlas.json").write_text(json.dumps(layout))
+    atlas = TextureAtlas(["assets/tile.png"], cachePath=str(tmp_path))
+    assert atlas._loadLayout() is None
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+import time
+import soundfile as sf
+from game import *
+
+def writeSound(tmp_path, name, frames, channels, samplerate=44100):
+    path = str(tmp_path / name)
+    sf.write(path, np.full((frames, channels), 0.25, dtype=np.float32), samplerate)
+    return path
+
+@pytest.fixture
+def mixer():
+    mixer = AudioMixer(null=True)
+    mixer.start()
+    yield mixer
+    mixer.close()
+
+def test_empty_looping_sound_finishes(tmp_path, mixer):
+    voice = mixer.play(Sound(writeSound(tmp_path, "empty.wav", 0, 2)), loop=True)
+    block = mixer.stream.pull()
+    assert not voice.active
+    assert not block.any()
+
+def test_mono_sound_plays_on_both_channels(tmp_path, mixer):
+    mixer.play(Sound(writeSound(tmp_path, "mono.wav", 2048, 1)))
+    block = mixer.stream.pull()
+    assert np.allclose(block, 0.25)
+
+def test_unsupported_channel_count_is_rejected_at_play(tmp_path, mixer):
+    with pytest.raises(ValueError, match="channels"):
+        mixer.play(Sound(writeSound(tmp_path, "surround.wav", 1024, 3)))
+    assert mixer.activeVoices() == 0
+
+def test_streaming_sound_is_resampled_to_the_mixer_rate(tmp_path, mixer):
+    frames = 5000
+    path = str(tmp_path / "ramp.wav")
+    sf.write(path, np.repeat(np.arange(frames, dtype=np.float32)[:, None] / frames, 2, axis=1), 22050)
+    sound = StreamingSound(path, blockFrames=1000)  # Blocks smaller than the file, to interpolate across them
+    voice = mixer.play(sound)
+    blocks = []
+    while voice.active:
+        while sound._endIndex is None and sound._writeIndex - sound._readIndex < mixer.blockSize:
+            time.sleep(0.001)  # Let the decoder thread catch up
+        blocks.append(mixer.stream.pull().copy())
+    sound.close()
+    played = np.concatenate(blocks)[:, 0]
+    expected = np.arange(2 * frames - 1) / 2 / frames  # Every other frame lands halfway between two of the file
+    assert sound.underruns == 0
+    assert np.allclose(played[:len(expected)], expected, atol=1e-4)  # 16-bit file
+    assert not played[len(expected):].any()
+
+def test_restart_during_a_mix_is_not_dropped(tmp_path, mixer):
+    """The audio thread finishing the old play of a voice must not end a play started meanwhile."""
+    mixer.null = False  # Treat pull() like a device callback running on its own thread
+
+    class RestartedSound(Sound):
+        restarted = None
+
+        def _mix(self, voice, out, scratch, frames):
+            if self.restarted is None:
+                # What Sound.play does on the main thread while the callback is in here
+                voice.stop()
+                self.restarted = mixer.play(self)
+                return False
+            return super()._mix(voice, out, scratch, frames)
+
+    sound = RestartedSound(writeSound(tmp_path, "effect.wav", 4096, 2))
+    first = mixer.play(sound)
+    mixer.stream.pull()
+    assert sound.restarted is not None and sound.restarted is not first
+    assert sound.restarted.isPlaying(sound) and not first.active
+    assert np.allclose(mixer.stream.pull(), 0.25)
@@ -0,0 +1,28 @@
+import pytest
+from game import *
+
+setHeadless(True)
+
+@pytest.mark.parametrize("base, args", [
+    (Sprite, ("assets/player.png",)),
+    (AnimSprite, ("assets/player.png", 1, 1)),
+    (Text, ("score",)),
+    (TileMap, ("assets/tile.png", 2, 2)),
+])
+def test_custom_draw_is_drawn_immediately(base, args):
+    """A subclass that overrides draw() is drawn by its draw(), not by the base class's batched quads."""
+    class Custom(base):
+        def draw(self):
+            pass
+
+    batch = SpriteBatch(headless=True, record=True)
+    batch.begin()
+    for obj in (base(*args), Custom(*args)):
+        if isinstance(obj, TileMap):
+            obj.setCell(0, 0, 1)
+        obj.renderBatched(batch, IDENTITY_MATRIX)
+    batch.end()
+
+    (batchedTexture, _, _), (immediateTexture, obj, _) = batch.runs
+    assert batchedTexture is not None
+    assert immediateTexture is None and isinstance(obj, Custom)
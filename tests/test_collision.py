@@ -0,0 +1,42 @@
+import random
+from game import *
+
+setHeadless(True)
+
+def test_batched_obb_matches_scalar_at_threshold(monkeypatch):
+    """At exactly batchHitTestThreshold candidates checkCollision batches, and must agree with the scalar test."""
+    monkeypatch.setattr(Sprite, "hitTest", Sprite.hitTestOBB)  # main.py switches games to AABB tests
+    rng = random.Random(3)
+    for trial in range(50):
+        collisionManager = CollisionManager()
+        probe = Sprite("assets/player.png", 100, 100, rng.uniform(0, 360), rng.uniform(0.5, 2), rng.uniform(0.5, 2))
+        sprites = []
+        for index in range(collisionManager.batchHitTestThreshold):
+            # Some sprites exactly touch the probe's edge, the rest are scattered around it
+            x = 100 + (32 if index % 4 == 0 else rng.uniform(-40, 40))
+            sprite = Sprite("assets/player.png", x, rng.uniform(60, 140), rng.choice((0, rng.uniform(0, 360))),
+                            rng.uniform(0.5, 2), rng.uniform(0.5, 2))
+            sprites.append(sprite)
+            collisionManager.add(sprite)
+
+        candidates = collisionManager.getCandidates(probe)
+        hits = collisionManager._hitTestMany(probe, candidates)
+        if len(candidates) < collisionManager.batchHitTestThreshold:
+            assert hits is None
+            continue
+        assert hits == [candidate.hitTestOBB(probe) for candidate in candidates]
+
+        batched = collisionManager.checkCollision(probe)
+        collisionManager.batchHitTestThreshold = len(sprites) + 1
+        assert collisionManager.checkCollision(probe) is batched
+
+def test_large_tile_maps_are_not_bucketed():
+    collisionManager = CollisionManager()
+    level = TileMap("assets/tile.png", 1000, 1000)
+    chunk = TileMap("assets/tile.png", 16, 16)
+    collisionManager.add(level)
+    collisionManager.add(chunk)
+    assert collisionManager._unbounded == {level}
+    assert 0 < len(collisionManager._cells) <= collisionManager.maxCellsPerObject
+    probe = Sprite("assets/player.png", 5000, 5000)
+    assert collisionManager.getCandidates(probe) == [level]
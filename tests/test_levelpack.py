@@ -0,0 +1,10 @@
+from level import *
+
+def test_levels_share_one_open_pack():
+    setHeadless(True)
+    first = Level(CollisionManager())
+    first.setup()
+    second = Level(CollisionManager())
+    second.setup()
+    assert second.levels is first.levels
+    assert sharedPack(os.path.abspath("assets/levels.lvl")) is first.levels
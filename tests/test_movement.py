@@ -0,0 +1,49 @@
+import random
+import pytest
+from main import *
+
+def scriptedInputs(ticks, seed):
+    """Keys held on each tick, changing every 7 ticks like a restless player."""
+    rng = random.Random(seed)
+    inputs = []
+    keys = []
+    for tick in range(ticks):
+        if tick % 7 == 0:
+            keys = [key for key in ("a", "d", "space") if rng.random() < 0.4]
+        inputs.append(keys)
+    return inputs
+
+def trajectory(levelIndex, inputs, sweptMovement):
+    """Positions of every body after each tick of a headless playthrough of a shipped level."""
+    class LevelGame(MyGame):
+        def setup(self):
+            super().setup()
+            self.level.loadLevel(self.level.levels[levelIndex])
+
+    Box.sweptMovement = sweptMovement
+    game = LevelGame(headless=True)
+    positions = []
+
+    def record(tick):
+        if tick > 0:
+            positions.append([(body.x, body.y) for body in game.level.updatables])
+        return inputs[tick]
+
+    try:
+        game.runHeadless(len(inputs), inputs=record)
+    finally:
+        Box.sweptMovement = True
+    positions.append([(body.x, body.y) for body in game.level.updatables])
+    return positions
+
+def shippedLevelCount():
+    levels = LevelPack("assets/levels.lvl")
+    count = len(levels)
+    levels.close()
+    return count
+
+@pytest.mark.parametrize("levelIndex", range(shippedLevelCount()))
+@pytest.mark.parametrize("seed", [1, 7])
+def test_swept_movement_matches_pixel_stepping(levelIndex, seed):
+    inputs = scriptedInputs(600, seed)
+    assert trajectory(levelIndex, inputs, True) == trajectory(levelIndex, inputs, False)
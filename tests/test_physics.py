@@ -0,0 +1,61 @@
+import random
+from level import *
+
+setHeadless(True)
+
+def randomLevel(usePhysicsWorld, seed=5, columns=40, rows=30, count=300):
+    """A level with scattered tiles and boxes dropped from random heights, some of them overlapping."""
+    game = Game(width=columns * tileSize, height=rows * tileSize, headless=True)
+    level = Level(game.collisionManager, usePhysicsWorld)
+    game.addChild(level)
+    rng = random.Random(seed)
+    level.loadLevel([[1 if row > 5 and rng.random() < 0.05 else 0 for column in range(columns)] for row in range(rows)])
+    for _ in range(count):
+        box = Box(game.collisionManager, rng.randrange(columns) * tileSize + rng.choice((0, 7, 16)),
+                  rng.randrange(rows * tileSize))
+        box.velocity.y = rng.choice((0, 3, -5, 12))
+        box.onSleepChange = level._sleepChanged
+        level.addChild(box)
+        game.collisionManager.add(box)
+        level.updatables.append(box)
+        if usePhysicsWorld:
+            level.physicsWorld.add(box)
+    return level
+
+def state(level):
+    return [(body.x, body.y, body.velocity.y, body.landed, body.sleeping) for body in level.updatables]
+
+def test_physics_world_matches_per_body_update():
+    perBody = randomLevel(False)
+    batched = randomLevel(True)
+    for _ in range(120):
+        perBody.update()
+        batched.update()
+        assert state(batched) == state(perBody)
+    assert batched.physicsWorld.batchedCount + batched.physicsWorld.fallbackCount == batched.activeCount
+    assert batched.sleepingCount > 0
+
+def test_batched_moves_update_the_spatial_hash():
+    level = randomLevel(True, count=50)
+    level.update()
+    assert level.physicsWorld.batchedCount > 0
+    manager = level.collisionManager
+    for body in level.updatables:
+        assert body.getWorldMatrix()[4:] == (body.x, body.y)
+        # A probe at the body's new position finds it through the hash
+        probe = Sprite("assets/player.png", body.x, body.y)
+        assert body in manager.getCandidates(probe)
+
+def test_world_velocity_reads_like_a_vector():
+    level = randomLevel(True, count=1)
+    box = level.updatables[-1]
+    box.velocity.set(3, 4)
+    copy = box.velocity.copy()
+    assert type(copy) is Vector2 and copy == Vector2(3, 4)
+    assert tuple(box.velocity) == (3, 4)
+    assert box.velocity * 2 == Vector2(6, 8)
+    assert box.velocity.length() == 5 and box.velocity.dot(Vector2(1, 0)) == 3
+    box.velocity += Vector2(1, 1)
+    assert tuple(level.physicsWorld.velocity[box._row]) == (4, 5)
+    copy.x = 0
+    assert box.velocity.x == 4
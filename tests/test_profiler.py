@@ -0,0 +1,33 @@
+from game import *
+
+class Outer(GameObject):
+    def update(self):
+        for child in self.children:
+            child.update()
+
+class Inner(GameObject):
+    def update(self):
+        pass
+
+def test_nested_instrumented_calls_are_not_counted_twice():
+    outer = Outer()
+    for _ in range(3):
+        outer.addChild(Inner())
+    profiler = FrameProfiler()
+    profiler.enabled = True
+    profiler.instrumentClasses()
+    try:
+        profiler.beginFrame()
+        start = profiler.clock()
+        outer.update()
+        profiler.record("update", start)
+        profiler.endFrame()
+    finally:
+        profiler.removeInstrumentation()
+
+    loop = profiler.phaseTimes()
+    assert set(loop) == {"update", "frame"}
+    assert set(profiler.phaseTimes(1)) == {"Outer.update"}
+    assert set(profiler.phaseTimes(2)) == {"Inner.update"}
+    assert profiler.phaseTimes(1)["Outer.update"] <= loop["update"] <= loop["frame"]
+    assert "Inner" not in profiler.summary()
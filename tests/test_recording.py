@@ -0,0 +1,26 @@
+import pytest
+from main import *
+
+class CrashingGame(MyGame):
+    def update(self):
+        super().update()
+        if self.updates == 50:
+            raise RuntimeError("crash")
+        self.updates += 1
+
+def test_recording_is_finished_when_the_game_crashes(tmp_path):
+    path = str(tmp_path / "session.inp")
+    game = CrashingGame(headless=True)
+    game.updates = 0
+    game.recordInput(path)
+    with pytest.raises(RuntimeError):
+        game.runHeadless(inputs=lambda tick: ["d"] if tick % 2 else [])
+    assert game.inputRecorder is None
+
+    player = InputPlayer(path)
+    ticks = 0
+    while player.beginTick():
+        player.endTick()
+        ticks += 1
+    player.file.close()
+    assert ticks == 50  # Every tick before the one that crashed
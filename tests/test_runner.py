@@ -0,0 +1,42 @@
+import pytest
+import game as game_module
+from runner import *
+
+def holding(keys, ticks):
+    return [keys] * ticks
+
+def test_too_many_bodies_for_the_buffers_is_an_error():
+    with pytest.raises(ValueError, match="maxBodies"):
+        SimulationRunner(processes=1, maxBodies=1).run([holding(["d"], 10)])
+
+def test_simulations_sharing_a_process_do_not_see_each_other():
+    """A simulation ends with keys held; the next one in the same process starts from nothing held."""
+    Input.reset()
+    alone = SimulationRunner(processes=1).run([holding([], 60)])
+    after = SimulationRunner(processes=1).run([holding(["a", "space"], 60), holding([], 60)])
+    assert (after.positions[1] == alone.positions[0]).all()
+    assert after.eventCount[1] == alone.eventCount[0]
+
+def test_each_simulation_starts_with_clean_engine_state(monkeypatch):
+    seen = []
+    setup = MyGame.setup
+
+    def recordingSetup(self):
+        seen.append((sum(Input._current_keys) + sum(Input._previous_keys), scratchVectors._next))
+        setup(self)
+
+    monkeypatch.setattr(MyGame, "setup", recordingSetup)
+    Input.setKeys(["d"])
+    scratchVectors.get()
+    SimulationRunner(processes=1).run([holding(["a", "space"], 5), holding([], 5)])
+    assert seen == [(0, 0), (0, 0)]
+
+def test_headless_mode_does_not_outlive_the_game():
+    SimulationRunner(processes=1).run([holding([], 5)])
+    assert loadTexture("assets/tile.png").texture_id == 0
+    try:
+        Game()
+        assert not game_module._headless
+        assert "assets/tile.png" not in game_module._texture_cache  # Headless textures have no GL texture
+    finally:
+        setHeadless(True)
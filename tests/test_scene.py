@@ -0,0 +1,56 @@
+import game
+from game import *
+
+class FakeRenderTexture:
+    def __init__(self):
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+def cachedSubtree():
+    root = GameObject()
+    cached = GameObject()
+    cached.cacheAsBitmap = True
+    cached._renderTexture = FakeRenderTexture()
+    cached._bitmap = Texture(None, 1, 1)
+    cached._bitmapDirty = False
+    root.addChild(cached)
+    return root, cached
+
+def test_remove_child_releases_cached_bitmaps():
+    parent = GameObject()
+    root, cached = cachedSubtree()
+    parent.addChild(root)
+    renderTexture = cached._renderTexture
+    parent.removeChild(root)
+    assert renderTexture.deleted
+    assert cached._bitmap is None and cached._bitmapDirty
+
+def test_remove_all_children_releases_cached_bitmaps():
+    parent = GameObject()
+    root, cached = cachedSubtree()
+    parent.addChild(root)
+    renderTexture = cached._renderTexture
+    parent.removeAllChildren()
+    assert renderTexture.deleted
+    assert cached._bitmap is None and cached._bitmapDirty
+
+def test_render_texture_restores_the_state_it_found(monkeypatch):
+    calls = []
+    state = {GL_VIEWPORT: (0, 0, 640, 480), GL_FRAMEBUFFER_BINDING: 7}
+    monkeypatch.setattr(game, "glGetIntegerv", lambda name: state[name])
+    monkeypatch.setattr(game, "glGetFloatv", lambda name: (0.2, 0.3, 0.4, 1.0))
+    for name in ("glBindFramebuffer", "glViewport", "glClearColor"):
+        monkeypatch.setattr(game, name, lambda *args, name=name: calls.append((name, args)))
+    for name in ("glMatrixMode", "glPushMatrix", "glPopMatrix", "glLoadIdentity", "gluOrtho2D", "glClear"):
+        monkeypatch.setattr(game, name, lambda *args: None)
+
+    renderTexture = RenderTexture.__new__(RenderTexture)  # Without the GL objects
+    renderTexture.framebuffer = 3
+    renderTexture.texture = Texture(1, 64, 64)
+    renderTexture.begin(0, 0, 64, 64)
+    calls.clear()
+    renderTexture.end()
+    assert calls == [("glBindFramebuffer", (GL_FRAMEBUFFER, 7)), ("glViewport", (0, 0, 640, 480)),
+                     ("glClearColor", (0.2, 0.3, 0.4, 1.0))]
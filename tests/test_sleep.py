@@ -0,0 +1,25 @@
+import pytest
+from level import *
+
+setHeadless(True)
+
+def makeLevel(cells, usePhysicsWorld=False):
+    Input.setKeys([])  # No keys held over from other tests
+    game = Game(width=len(cells[0]) * tileSize, height=len(cells) * tileSize, headless=True)
+    level = Level(game.collisionManager, usePhysicsWorld)
+    game.addChild(level)
+    level.loadLevel(cells)
+    return level
+
+@pytest.mark.parametrize("usePhysicsWorld", [False, True])
+def test_box_sleeps_on_a_body_that_only_tries_to_move(usePhysicsWorld):
+    """The player below never sleeps; its blocked attempts to fall must not keep waking the box on top."""
+    level = makeLevel([[0, 2, 0],
+                       [0, 3, 0],
+                       [1, 1, 1],
+                       [0, 0, 0]], usePhysicsWorld)
+    box = next(body for body in level.updatables if type(body) is Box)
+    for _ in range(4 * Box.sleepAfter):
+        level.update()
+    assert box.sleeping
+    assert box.y == 0
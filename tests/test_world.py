@@ -0,0 +1,45 @@
+from level import *
+
+def platformLevel():
+    """100x40 tiles: the player on top, a box on row 31 resting on a platform on row 32, in the third chunk row."""
+    cells = [[CELL_EMPTY] * 100 for _ in range(40)]
+    cells[1][2] = CELL_PLAYER
+    cells[2][2] = CELL_TILE
+    cells[31][20] = CELL_BOX
+    cells[32][15:21] = [CELL_TILE] * 6
+    return cells
+
+def makeLevel():
+    Input.reset()
+    game = Game(width=640, height=480, headless=True)
+    level = Level(game.collisionManager, chunkSize=16)
+    game.addChild(level)
+    level.loadLevel(platformLevel())
+    return level
+
+def test_chunks_load_around_the_view_only():
+    level = makeLevel()
+    world = level.world
+    assert world.chunksX == 7 and world.chunksY == 3
+    assert set(world.chunks) == {(chunkX, chunkY) for chunkX in range(3) for chunkY in range(2)}
+    world.stream(0, 0, world.width, world.height)
+    assert len(world.chunks) == 21
+    world.stream(0, 0, 640, 480)
+    assert len(world.chunks) == 6 and world.drops == 15
+
+def test_body_next_to_an_unloaded_chunk_is_parked_until_it_loads():
+    level = makeLevel()
+    world = level.world
+    box = next(body for body in world._bodyParents if type(body) is Box)
+    assert box not in world.bodies  # Its chunk is loaded, but not the one holding its tile
+    startY = box.y
+    for _ in range(30):
+        level.update()
+    assert box.y == startY and box.parent is None
+
+    level.player.x, level.player.y = 16 * tileSize, 31 * tileSize  # The camera follows it down to the box
+    for _ in range(30):
+        level.update()
+    assert (0, 2) in world.chunks
+    assert box in world.bodies and box.parent is level
+    assert box.y == startY  # Still on its platform
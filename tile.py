@@ -13,3 +13,15 @@ class Tile(AnimSprite):
             return True
         return False
 
+class TileLayer(TileMap):
+    """All tiles of a level in one collidable grid. Cells are one-way platforms, like Tile."""
+    def __init__(self, columns, rows, tileSize=32, x=0, y=0):
+        super().__init__("assets/tile.png", columns, rows, tileSize, x, y)
+
+    def shouldCollideCell(self, column, row, cellType, other, impact):
+        # Same rule as Tile.shouldCollide, with the y a Tile in this cell would have
+        tileY = self.y + row * self.tileSize
+        if (tileY >= other.y + other.height - 1 and impact.y > 0):
+            return True
+        return False
+
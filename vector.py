@@ -0,0 +1,276 @@
+import math
+import numpy as np
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           2D affine matrices
+#---------------------------------------------------------------------------------------------------------------------
+# A matrix is a tuple (a, b, c, d, tx, ty) mapping (x, y) to (a * x + c * y + tx, b * x + d * y + ty)
+IDENTITY_MATRIX = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+def makeMatrix(x, y, rotation, scaleX, scaleY):
+    """Return the matrix for scale, then rotation (degrees), then translation; the same order as GameObject.render."""
+    if rotation == 0:
+        return (scaleX, 0.0, 0.0, scaleY, x, y)  # Skip the trig for the common unrotated case
+    angle_rad = math.radians(rotation)
+    cos_a = math.cos(angle_rad)
+    sin_a = math.sin(angle_rad)
+    return (cos_a * scaleX, sin_a * scaleX, -sin_a * scaleY, cos_a * scaleY, x, y)
+
+def multiplyMatrix(parent, local):
+    """Return parent * local: the matrix that applies local first, then parent."""
+    pa, pb, pc, pd, ptx, pty = parent
+    la, lb, lc, ld, ltx, lty = local
+    return (pa * la + pc * lb, pb * la + pd * lb,
+            pa * lc + pc * ld, pb * lc + pd * ld,
+            pa * ltx + pc * lty + ptx, pb * ltx + pd * lty + pty)
+
+def invertMatrix(matrix):
+    """Return the inverse matrix, or None if the matrix is singular (scaled to zero)."""
+    a, b, c, d, tx, ty = matrix
+    determinant = a * d - b * c
+    if determinant == 0:
+        return None
+    ia = d / determinant
+    ib = -b / determinant
+    ic = -c / determinant
+    id = a / determinant
+    return (ia, ib, ic, id, -(ia * tx + ic * ty), -(ib * tx + id * ty))
+
+def transformPoints(matrix, points):
+    """Return the (n, 2) array of points transformed by the matrix."""
+    a, b, c, d, tx, ty = matrix
+    points = np.asarray(points, dtype=np.float64)
+    return points @ np.array([[a, b], [c, d]]) + (tx, ty)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Vector2 ***
+#---------------------------------------------------------------------------------------------------------------------
+class Vector2:
+    """A mutable 2D vector. Operators return new vectors; the in-place operators and set() reuse this one."""
+    __slots__ = ("x", "y")
+
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def set(self, x, y):
+        """Set both components and return self."""
+        self.x = x
+        self.y = y
+        return self
+
+    def copy(self):
+        return Vector2(self.x, self.y)
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def __neg__(self):
+        """Negate the vector."""
+        return Vector2(-self.x, -self.y)
+
+    def __add__(self, other):
+        return Vector2(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        return Vector2(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, scalar):
+        return Vector2(self.x * scalar, self.y * scalar)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, scalar):
+        return Vector2(self.x / scalar, self.y / scalar)
+
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        return self
+
+    def __imul__(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        return self
+
+    def __itruediv__(self, scalar):
+        self.x /= scalar
+        self.y /= scalar
+        return self
+
+    def __eq__(self, other):
+        if not isinstance(other, Vector2):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    __hash__ = None  # Mutable, so not usable as a dict key
+
+    def __iter__(self):
+        yield self.x
+        yield self.y
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def dot(self, other):
+        return self.x * other.x + self.y * other.y
+
+    def lengthSquared(self):
+        return self.x * self.x + self.y * self.y
+
+    def length(self):
+        return math.hypot(self.x, self.y)
+
+    def normalize(self):
+        """Scale this vector to length 1 in place and return it. A zero vector stays zero."""
+        length = math.hypot(self.x, self.y)
+        if length > 0:
+            self.x /= length
+            self.y /= length
+        return self
+
+    def normalized(self):
+        """Return a new vector of length 1 in the same direction."""
+        return self.copy().normalize()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def __repr__(self):
+        """String representation for debugging."""
+        return f"Vector2(x={self.x}, y={self.y})"    
+        
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Vector2Pool ***
+#---------------------------------------------------------------------------------------------------------------------
+class Vector2Pool:
+    """
+    Preallocated scratch vectors for hot loops. get() hands out the next free vector, and reset() makes them
+    all free again; Game does that once per tick. A scratch vector is only valid until the next reset, so
+    never keep one. When the pool runs out, get() allocates a normal Vector2 and counts a miss.
+    """
+    def __init__(self, capacity=256):
+        self._vectors = [Vector2() for _ in range(capacity)]
+        self._next = 0
+        self.misses = 0
+
+    def get(self, x=0, y=0):
+        """Return a scratch vector set to (x, y)."""
+        index = self._next
+        if index < len(self._vectors):
+            self._next = index + 1
+            vector = self._vectors[index]
+            vector.x = x
+            vector.y = y
+            return vector
+        self.misses += 1
+        return Vector2(x, y)
+
+    def reset(self):
+        """Make all scratch vectors free again."""
+        self._next = 0
+
+# Shared by the engine's collision code
+scratchVectors = Vector2Pool()
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class Vector2Array ***
+#---------------------------------------------------------------------------------------------------------------------
+class Vector2Array:
+    """
+    Many vectors in one (n, 2) float64 NumPy array, for bulk operations. x and y are views on the columns,
+    and the arithmetic operators work on all rows at once with a Vector2, another Vector2Array or a scalar.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data=0):
+        if isinstance(data, int):
+            self.data = np.zeros((data, 2))
+        else:
+            self.data = np.array([tuple(vector) for vector in data] if not isinstance(data, np.ndarray) else data,
+                                 dtype=np.float64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        """Return a copy of one row as a Vector2."""
+        x, y = self.data[index].tolist()
+        return Vector2(x, y)
+
+    def __setitem__(self, index, vector):
+        self.data[index] = tuple(vector)
+
+    @property
+    def x(self):
+        return self.data[:, 0]
+
+    @property
+    def y(self):
+        return self.data[:, 1]
+
+    @staticmethod
+    def _operand(other):
+        if isinstance(other, Vector2):
+            return (other.x, other.y)
+        if isinstance(other, Vector2Array):
+            return other.data
+        return other
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def __add__(self, other):
+        return Vector2Array(self.data + self._operand(other))
+
+    def __sub__(self, other):
+        return Vector2Array(self.data - self._operand(other))
+
+    def __mul__(self, scalar):
+        return Vector2Array(self.data * self._operand(scalar))
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Vector2Array(-self.data)
+
+    def __iadd__(self, other):
+        self.data += self._operand(other)
+        return self
+
+    def __isub__(self, other):
+        self.data -= self._operand(other)
+        return self
+
+    def __imul__(self, scalar):
+        self.data *= self._operand(scalar)
+        return self
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           
+#---------------------------------------------------------------------------------------------------------------------
+    def dot(self, other):
+        """Return the dot product of every row with a Vector2, or row by row with another Vector2Array."""
+        return (self.data * self._operand(other)).sum(axis=1)
+
+    def lengths(self):
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+
+    def normalize(self):
+        """Scale every row to length 1 in place and return self. Zero rows stay zero."""
+        lengths = self.lengths()
+        nonzero = lengths > 0
+        self.data[nonzero] /= lengths[nonzero, None]
+        return self
+
+    def transform(self, matrix):
+        """Return the rows transformed as points by an affine matrix."""
+        return Vector2Array(transformPoints(matrix, self.data))
+
+    def __repr__(self):
+        return f"Vector2Array({self.data.tolist()})"
@@ -0,0 +1,209 @@
+from game import *
+from tile import *
+from levelpack import *
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                      *** class ChunkedWorld ***
+#---------------------------------------------------------------------------------------------------------------------
+class ChunkedWorld(GameObject):
+    """
+    A level of any size split into square chunks of chunkSize tiles. Only the chunks within margin chunks of the
+    view exist: each is a TileLayer registered with the CollisionManager, created by stream() when the view comes
+    near and dropped when it moves away, so the cost of a frame depends on the view and not on the level.
+    Bodies are made by spawn(kind, column, row) when their chunk first loads. While their bounds, grown by a tile,
+    reach an unloaded chunk they are parked: out of the scene, the CollisionManager and bodies, and frozen until
+    those chunks load again, so a body never loses the tiles it rests on.
+    The world is expected at the scene origin, so world and scene coordinates are the same.
+    """
+    def __init__(self, collisionManager, levelData, spawn, chunkSize=16, tileSize=32, margin=1):
+        super().__init__()
+        self.collisionManager = collisionManager
+        self.grid = levelData.grid  # May be a view of a mapped LevelPack; only loaded chunks are read
+        self.spawn = spawn
+        self.chunkSize = chunkSize
+        self.tileSize = tileSize
+        self.margin = margin
+        self.chunksX = -(-levelData.columns // chunkSize)
+        self.chunksY = -(-levelData.rows // chunkSize)
+        self.chunks = {}  # (chunkX, chunkY) -> TileLayer of a loaded chunk, None if it has no tiles
+        self.bodies = []  # Bodies in loaded chunks, in spawn order
+        self._bodyParents = {}  # Body -> the object it was added to by spawn
+        self._parked = {}  # (chunkX, chunkY) -> bodies waiting for the chunk to load
+        self._spawned = set()  # Chunks whose entities have been spawned
+        self._view = None  # (left, top, right, bottom) of the last stream(), for culling
+        self.loads = 0  # Chunks created and dropped so far
+        self.drops = 0
+
+        # Entities sorted by chunk, so a chunk finds its own with two binary searches
+        entities = levelData.entities
+        keys = (entities["row"] // chunkSize).astype(np.int64) * self.chunksX + entities["column"] // chunkSize
+        order = np.argsort(keys, kind="stable")  # Stable keeps row-major order inside a chunk
+        self._entities = entities[order]
+        self._entityKeys = keys[order]
+
+    @property
+    def width(self):
+        return self.grid.shape[1] * self.tileSize
+
+    @property
+    def height(self):
+        return self.grid.shape[0] * self.tileSize
+
+#---------------------------------------------------------------------------------------------------------------------
+#                                                           stream()
+#---------------------------------------------------------------------------------------------------------------------
+    def stream(self, left, top, right, bottom):
+        """Load the chunks around the view rectangle and drop the others."""
+        self._view = (left, top, right, bottom)
+        span = self.chunkSize * self.tileSize
+        margin = self.margin
+        firstX = max(0, int(left // span) - margin)
+        lastX = min(self.chunksX - 1, int((right - 1) // span) + margin)
+        firstY = max(0, int(top // span) - margin)
+        lastY = min(self.chunksY - 1, int((bottom - 1) // span) + margin)
+
+        for key in list(self.chunks):
+            chunkX, chunkY = key
+            if not (firstX <= chunkX <= lastX and firstY <= chunkY <= lastY):
+                self._dropChunk(key)
+        loads = self.loads
+        for chunkY in range(firstY, lastY + 1):
+            for chunkX in range(firstX, lastX + 1):
+                if (chunkX, chunkY) not in self.chunks:
+                    self._loadChunk((chunkX, chunkY))
+
+        # Bodies next to an unloaded chunk stop until it loads
+        for body in [body for body in self.bodies if self._nearUnloaded(body)]:
+            self._park(body)
+        if self.loads != loads:
+            for key in list(self.chunks):
+                parked = self._parked.get(key)
+                if parked:
+                    waiting = []
+                    for body in parked:
+                        if self._nearUnloaded(body):
+                            waiting.append(body)
+                        else:
+                            self._unpark(body)
+                    if waiting:
+                        self._parked[key] = waiting
+                    else:
+                        del self._parked[key]
+
+    def chunkAt(self, x, y):
+        """Return the (chunkX, chunkY) holding the world position, clamped to the level."""
+        span = self.chunkSize * self.tileSize
+        return (min(max(int(x // span), 0), self.chunksX - 1), min(max(int(y // span), 0), self.chunksY - 1))
+
+    def findEntity(self, kind):
+        """Return the (column, row) of the first entity of kind in the level, or None."""
+        rows = np.flatnonzero(self._entities["kind"] == kind)
+        if len(rows) == 0:
+            return None
+        entity = self._entities[rows[0]]
+        return int(entity["column"]), int(entity["row"])
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def _loadChunk(self, key):
+        chunkX, chunkY = key
+        size = self.chunkSize
+        cells = self.grid[chunkY * size:(chunkY + 1) * size, chunkX * size:(chunkX + 1) * size]
+        layer = None
+        if cells.any():
+            rows, columns = cells.shape
+            layer = TileLayer(columns, rows, self.tileSize, chunkX * size * self.tileSize, chunkY * size * self.tileSize)
+            layer.cacheAsBitmap = True  # Tiles never move, so draw them from a single texture
+            layer.setCells(cells)
+            self.addChild(layer)
+            self.collisionManager.add(layer)
+        self.chunks[key] = layer
+        self.loads += 1
+
+        if key not in self._spawned:
+            self._spawned.add(key)
+            chunkIndex = chunkY * self.chunksX + chunkX
+            first, last = np.searchsorted(self._entityKeys, (chunkIndex, chunkIndex + 1))
+            for kind, column, row in self._entities[first:last].tolist():
+                body = self.spawn(kind, column, row)
+                if body is not None:
+                    self._bodyParents[body] = body.parent
+                    self.bodies.append(body)
+
+    def _dropChunk(self, key):
+        layer = self.chunks.pop(key)
+        if layer is not None:
+            self.collisionManager.remove(layer)
+            self.removeChild(layer)
+        self.drops += 1
+
+    def _nearUnloaded(self, body):
+        """True if the body's bounds, grown by a tile, reach a chunk that isn't loaded."""
+        bounds = body.getBounds() or (body.x, body.y, body.x, body.y)
+        left, top, right, bottom = bounds
+        tileSize = self.tileSize
+        firstX, firstY = self.chunkAt(left - tileSize, top - tileSize)
+        lastX, lastY = self.chunkAt(right + tileSize, bottom + tileSize)
+        chunks = self.chunks
+        for chunkY in range(firstY, lastY + 1):
+            for chunkX in range(firstX, lastX + 1):
+                if (chunkX, chunkY) not in chunks:
+                    return True
+        return False
+
+    def _park(self, body):
+        self.bodies.remove(body)
+        self.collisionManager.remove(body)
+        body.parent.removeChild(body)
+        self._parked.setdefault(self.chunkAt(body.x, body.y), []).append(body)
+
+    def _unpark(self, body):
+        self._bodyParents[body].addChild(body)
+        self.collisionManager.add(body)
+        self.bodies.append(body)
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def clear(self):
+        """Drop every chunk and forget the bodies."""
+        for key in list(self.chunks):
+            self._dropChunk(key)
+        for body in self.bodies:
+            self.collisionManager.remove(body)
+            if body.parent is not None:
+                body.parent.removeChild(body)
+        self.bodies.clear()
+        self._parked = {}
+        self._bodyParents = {}
+        self._spawned = set()
+
+    def visibleLayers(self):
+        """Loaded chunk layers that overlap the view of the last stream(), or all of them before the first one."""
+        if self._view is None:
+            return [layer for layer in self.chunks.values() if layer is not None]
+        left, top, right, bottom = self._view
+        span = self.chunkSize * self.tileSize
+        half = self.tileSize // 2  # TileLayer cells are centered on their positions
+        return [layer for (chunkX, chunkY), layer in self.chunks.items()
+                if layer is not None and chunkX * span - half < right and (chunkX + 1) * span - half > left
+                and chunkY * span - half < bottom and (chunkY + 1) * span - half > top]
+
+#---------------------------------------------------------------------------------------------------------------------
+#
+#---------------------------------------------------------------------------------------------------------------------
+    def render(self):
+        """Render the chunks in view only."""
+        glPushMatrix()
+        a, b, c, d, tx, ty = self.getLocalMatrix()
+        glMultMatrixf((a, b, 0, 0, c, d, 0, 0, 0, 0, 1, 0, tx, ty, 0, 1))
+        for layer in self.visibleLayers():
+            layer.render()
+        glPopMatrix()
+
+    def renderBatched(self, batch, parentMatrix=None):
+        """Render the chunks in view only into a SpriteBatch."""
+        childMatrix = None if parentMatrix is None else multiplyMatrix(parentMatrix, self.getLocalMatrix())
+        for layer in self.visibleLayers():
+            layer.renderBatched(batch, childMatrix)